@@ -0,0 +1,264 @@
+"""
+image_utils 합성 프리미티브 마이크로벤치마크 + 회귀 게이트
+
+사용법:
+  uv run python benchmarks/bench_image_utils.py            # 측정 후 기준선과 비교 (표 출력)
+  uv run python benchmarks/bench_image_utils.py --check    # 기준선 대비 회귀가 있으면 종료 코드 1
+  uv run python benchmarks/bench_image_utils.py --update   # 기준선 갱신 (benchmarks/baselines/)
+  uv run python benchmarks/bench_image_utils.py --check --skip-time   # 할당만 게이트 (다른 머신)
+
+DA 캔버스 크기(1000×1000, 1660×260, 1080×1920)마다 실제 한글 카피로 각 프리미티브를 호출해
+호출당 다음을 기록합니다.
+
+- ms:      워밍업 후 repeats회 중앙값 (측정 함수는 호출마다 _text_width / measure_text_height
+           캐시를 비움 — 새 카피를 처음 측정하는 파이프라인 경로 기준)
+- py_kib:  tracemalloc 피크 (Python 힙)
+- pil_kib: Pillow 이미지 메모리 할당량 (블록 캐시 비활성화 · 64 KiB 블록 단위 — 픽셀 버퍼는
+           C malloc이라 tracemalloc에 잡히지 않음)
+
+네트워크·폰트 파일 없이 실행됩니다. 기본값(--font default)은 assets/fonts 유무와 관계없이
+Pillow 기본 폰트로 고정해 머신 간 결과를 비교할 수 있게 하고, --font installed는 NanumGothic을
+사용합니다 (폰트별로 기준선 파일이 따로 저장됨). 제품 마스크는 합성 타원 마스크라 rembg 모델이
+필요 없습니다.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+import PIL
+from PIL import Image, ImageDraw
+
+from da_agent.utils import image_utils
+from da_agent.utils.image_utils import (
+    _wrap_text,
+    draw_text_zone_background,
+    fit_canvas,
+    fit_text_block,
+    image_to_bytes,
+    measure_text_height,
+    overlay_cta_button,
+    overlay_logo,
+    overlay_product,
+    overlay_text,
+)
+
+_ROOT = Path(__file__).parent.parent
+_BASELINE_DIR = Path(__file__).parent / "baselines"
+_BACKGROUND = _ROOT / "example/img/ad_1.jpg"
+_PRODUCT = _ROOT / "example/img/product.jpg"
+_CANVAS_SIZES = [(1000, 1000), (1660, 260), (1080, 1920)]
+
+_HEADLINE = "매일 아침 나를 깨우는 한 잔, 신선하게 볶은 원두로 시작하는 하루"
+_SUBHEADLINE = "첫 구매 고객 한정 30% 할인과 무료 배송 혜택을 지금 바로 만나보세요. 오늘 자정까지 진행됩니다."
+_CTA = "지금 구매하기"
+
+_PIL_BLOCK_SIZE = 64 * 1024
+
+# 회귀 판정 — 상대 허용치와 함께 잡음 바닥(절대값)을 넘을 때만 회귀로 봄
+_MIN_MS_DELTA = 0.2
+_MIN_KIB_DELTA = 8.0
+
+
+def _use_font(mode: str) -> None:
+    if mode == "default":
+        missing = Path("/nonexistent/font.ttf")
+        image_utils._FONT_REGULAR = image_utils._FONT_BOLD = missing
+    image_utils._load_korean_font.cache_clear()
+
+
+def _clear_text_caches() -> None:
+    image_utils._text_width.cache_clear()
+    measure_text_height.cache_clear()
+
+
+def _logo() -> Image.Image:
+    logo = Image.new("RGBA", (480, 160), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(logo)
+    draw.ellipse([8, 8, 152, 152], fill=(255, 80, 0, 255))
+    draw.rounded_rectangle([176, 48, 472, 112], radius=24, fill=(30, 30, 30, 230))
+    return logo
+
+
+def _product_mask(size: tuple[int, int]) -> Image.Image:
+    mask = Image.new("L", size, 0)
+    w, h = size
+    ImageDraw.Draw(mask).ellipse([w * 0.1, h * 0.05, w * 0.9, h * 0.95], fill=255)
+    return mask
+
+
+def _cases(size: tuple[int, int]) -> dict[str, Callable[[], object]]:
+    """캔버스 하나에 대한 프리미티브별 호출 (레이아웃은 캔버스 비율에서 유도)."""
+    width, height = size
+    canvas = fit_canvas(Image.open(_BACKGROUND).convert("RGB"), width, height)
+    product = Image.open(_PRODUCT).convert("RGB")
+    mask = _product_mask(product.size)
+    logo = _logo()
+
+    banner = width / height > 2
+    margin = round(min(width, height) * 0.06)
+    if banner:   # 가로 배너: 좌측 텍스트, 우측 제품
+        text = (margin, margin, width // 2 - margin, height - 2 * margin)
+        product_box = (width * 2 // 3, margin, width // 3 - margin, height - 2 * margin)
+    else:        # 정사각·세로: 하단 텍스트 존, 상단 제품
+        text = (margin, height * 3 // 5, width - 2 * margin, height * 2 // 5 - margin)
+        product_box = (width // 4, margin * 2, width // 2, height // 2 - margin)
+    tx, ty, tw, th = text
+    fitted = fit_text_block(_HEADLINE, _SUBHEADLINE, _CTA, tw, th, cta_max_width=tw // 2)
+    font = image_utils._load_korean_font(fitted.headline_size, bold=True)
+    cta_w, cta_h = min(tw // 2, fitted.cta_size * 9), fitted.cta_height
+    logo_h = max(16, margin)
+    logo_w = logo_h * 3
+
+    def wrap():
+        _clear_text_caches()
+        return _wrap_text(_HEADLINE, font, tw)
+
+    def measure():
+        _clear_text_caches()
+        return measure_text_height(_SUBHEADLINE, tw, fitted.sub_size)
+
+    return {
+        "_wrap_text": wrap,
+        "measure_text_height": measure,
+        "overlay_text": lambda: overlay_text(
+            canvas, _HEADLINE, tx, ty, tw, font_size=fitted.headline_size, bold=True
+        ),
+        "draw_text_zone_background": lambda: draw_text_zone_background(canvas, *text),
+        "overlay_cta_button": lambda: overlay_cta_button(
+            canvas, _CTA, tx, ty + th - cta_h, cta_w, cta_h,
+            radius=cta_h // 2, font_size=fitted.cta_size,
+        ),
+        "overlay_logo": lambda: overlay_logo(canvas, logo, margin, margin, logo_w, logo_h),
+        "overlay_product": lambda: overlay_product(canvas, product, *product_box, mask=mask),
+        "image_to_bytes": lambda: image_to_bytes(canvas),
+    }
+
+
+def _time_ms(fn: Callable[[], object], repeats: int) -> float:
+    fn()   # 워밍업 (폰트 로드·지연 import)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _allocations(fn: Callable[[], object]) -> tuple[float, float]:
+    """(Python 힙 피크 KiB, Pillow 이미지 할당 KiB) — 호출 1회 기준."""
+    before = Image.core.get_stats()["allocated_blocks"]
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    blocks = Image.core.get_stats()["allocated_blocks"] - before
+    return peak / 1024, blocks * _PIL_BLOCK_SIZE / 1024
+
+
+def run(repeats: int) -> dict[str, dict[str, float]]:
+    Image.core.set_block_size(_PIL_BLOCK_SIZE)
+    Image.core.set_blocks_max(0)   # 블록 재사용 없음 → 모든 할당이 allocated_blocks에 잡힘
+    results: dict[str, dict[str, float]] = {}
+    for size in _CANVAS_SIZES:
+        for name, fn in _cases(size).items():
+            ms = _time_ms(fn, repeats)
+            py_kib, pil_kib = _allocations(fn)
+            results[f"{size[0]}x{size[1]}/{name}"] = {
+                "ms": round(ms, 3), "py_kib": round(py_kib, 1), "pil_kib": round(pil_kib, 1),
+            }
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    time_tolerance: float,
+    alloc_tolerance: float,
+    skip_time: bool = False,
+) -> list[str]:
+    """기준선 대비 회귀 목록 (상대 허용치와 잡음 바닥을 모두 넘는 항목만)."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        checks = [
+            ("py_kib", alloc_tolerance, _MIN_KIB_DELTA),
+            ("pil_kib", alloc_tolerance, _MIN_KIB_DELTA),
+        ]
+        if not skip_time:
+            checks.insert(0, ("ms", time_tolerance, _MIN_MS_DELTA))
+        for metric, tolerance, floor in checks:
+            before, after = base[metric], current[metric]
+            if after > before * (1 + tolerance) and after - before > floor:
+                growth = (after / max(before, 1e-9) - 1) * 100
+                regressions.append(f"{key} {metric}: {before} → {after} (+{growth:.0f}%)")
+    return regressions
+
+
+def _baseline_path(font: str) -> Path:
+    return _BASELINE_DIR / f"image_utils.{font}.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--font", choices=["default", "installed"], default="default")
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--check", action="store_true", help="회귀가 있으면 종료 코드 1")
+    parser.add_argument("--update", action="store_true", help="현재 결과로 기준선 갱신")
+    parser.add_argument("--skip-time", action="store_true", help="시간은 게이트하지 않음 (기준선과 다른 머신)")
+    parser.add_argument("--time-tolerance", type=float, default=0.3)
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    _use_font(args.font)
+    results = run(args.repeats)
+
+    path = _baseline_path(args.font)
+    stored = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    baseline = stored.get("results", {})
+    if stored and stored.get("pillow") != PIL.__version__:
+        print(f"warning: baseline recorded with Pillow {stored.get('pillow')}, running {PIL.__version__}")
+
+    print(f"{'case':<42}{'ms':>10}{'base ms':>10}{'py KiB':>10}{'pil KiB':>10}{'base pil':>10}")
+    for key, current in results.items():
+        base = baseline.get(key, {})
+        print(
+            f"{key:<42}{current['ms']:>10.2f}{base.get('ms', float('nan')):>10.2f}"
+            f"{current['py_kib']:>10.1f}{current['pil_kib']:>10.1f}{base.get('pil_kib', float('nan')):>10.1f}"
+        )
+
+    if args.update:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "font": args.font,
+            "pillow": PIL.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeats": args.repeats,
+            "results": results,
+        }
+        path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"baseline written: {path.relative_to(_ROOT)}")
+        return 0
+
+    regressions = compare(results, baseline, args.time_tolerance, args.alloc_tolerance, args.skip_time)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not baseline:
+        print(f"no baseline at {path.relative_to(_ROOT)} — run with --update")
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Stage 3b 레이아웃 엔진 지연 시간 비교
+
+사용법:
+  uv run python benchmarks/bench_layout.py            # 로컬 엔진만
+  uv run python benchmarks/bench_layout.py --vision   # Vision 호출 포함 (OPENAI_API_KEY 필요)
+
+example/img 의 이미지를 DA 캔버스 크기로 리사이즈해 엔진별 지연 시간을 측정합니다.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from da_agent.agents.layout_analyzer import analyze_ad_layout
+from da_agent.agents.layout_engine import analyze_layout_local
+
+_EXAMPLE_DIR = Path(__file__).parent.parent / "example/img"
+_CANVAS_SIZES = [(1000, 1000), (1660, 260), (1080, 1920)]
+
+
+def _bench_local(image: Image.Image, repeats: int) -> tuple[float, float]:
+    timings = []
+    confidence = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        confidence = analyze_layout_local(image).confidence
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), confidence
+
+
+async def _bench_vision(image: Image.Image) -> float:
+    start = time.perf_counter()
+    await analyze_ad_layout(image)
+    return (time.perf_counter() - start) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vision", action="store_true", help="Vision 호출 지연 시간도 측정")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'image':<18}{'canvas':<12}{'local p50 (ms)':>16}{'confidence':>12}{'vision (ms)':>14}")
+    for path in sorted(_EXAMPLE_DIR.glob("*.jpg")):
+        source = Image.open(path).convert("RGB")
+        for size in _CANVAS_SIZES:
+            image = source.resize(size)
+            local_ms, confidence = _bench_local(image, args.repeats)
+            vision_ms = f"{await _bench_vision(image):.0f}" if args.vision else "-"
+            print(
+                f"{path.name:<18}{f'{size[0]}x{size[1]}':<12}"
+                f"{local_ms:>16.1f}{confidence:>12.2f}{vision_ms:>14}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+Stage 3a 스타일 변환 경로 비교 — img2img vs 색 변환 고속 경로 (3D LUT / Lab 통계)
+
+사용법:
+  uv run python benchmarks/bench_style_transfer.py             # 고속 경로 + 로컬 백엔드
+  uv run python benchmarks/bench_style_transfer.py --img2img    # IMAGE_BACKENDS img2img 포함 (FAL_KEY 등 필요)
+
+example/img/product_da.jpg 를 DA 캔버스 크기별로 변환해 경로별 지연 시간과
+팔레트 평균 색까지의 Lab 거리(ΔE_ab, 낮을수록 팔레트에 가까움)를 출력합니다.
+--img2img이면 img2img 결과와 각 고속 경로 결과의 평균 ΔE(Lab)도 함께 출력합니다.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils.color_transfer import palette_lab, srgb_to_lab, transfer_style_colors
+from da_agent.utils.image_backends import (
+    LocalBackend,
+    StyleTransferRequest,
+    get_image_backend_router,
+)
+from da_agent.utils.image_utils import fit_canvas
+
+_SOURCE = Path(__file__).parent.parent / "example/img/product_da.jpg"
+_CANVAS_SIZES = [(1000, 1000), (1660, 260), (1080, 1920)]
+_STYLE = ImageStyle(
+    mood="따뜻한 감성 라이프스타일",
+    lighting="소프트 자연광",
+    color_palette=["#E8742A", "#F4B183", "#6B4226"],
+    aesthetic=["warm lifestyle", "film"],
+)
+_PROMPT = (
+    "Transform this product advertisement. Warm film-like tones, soft natural light, "
+    "shift color palette towards #E8742A, #F4B183. Preserve the main product shape, position, "
+    "and overall composition structure. Professional Korean display advertising, 8K, "
+    "ultra-sharp, no text or UI elements."
+)
+
+
+def _lab(image: Image.Image) -> np.ndarray:
+    return srgb_to_lab(np.asarray(image.convert("RGB"), dtype=np.float32) / 255)
+
+
+def _palette_distance(image: Image.Image) -> float:
+    target = palette_lab(_STYLE.color_palette)[:, 1:].mean(axis=0)
+    return float(np.linalg.norm(_lab(image)[..., 1:].mean(axis=(0, 1)) - target))
+
+
+def _delta_e(a: Image.Image, b: Image.Image) -> float:
+    return float(np.linalg.norm(_lab(a) - _lab(b), axis=-1).mean())
+
+
+def _bench_fast(canvas: Image.Image, method: str, repeats: int) -> tuple[float, Image.Image]:
+    timings = []
+    styled = canvas
+    for _ in range(repeats):
+        start = time.perf_counter()
+        styled = transfer_style_colors(canvas, _STYLE, method=method)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), styled
+
+
+async def _bench_backend(backend, size: tuple[int, int]) -> tuple[float, Image.Image]:
+    request = StyleTransferRequest(str(_SOURCE), _PROMPT, width=size[0], height=size[1])
+    start = time.perf_counter()
+    styled = await backend.transform(request)
+    return (time.perf_counter() - start) * 1000, styled
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--img2img", action="store_true", help="img2img 백엔드 결과와도 비교")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    source = Image.open(_SOURCE).convert("RGB")
+    print(f"{'canvas':<12}{'path':<10}{'p50 (ms)':>12}{'ΔE palette':>12}{'ΔE vs img2img':>16}")
+    for size in _CANVAS_SIZES:
+        canvas = fit_canvas(source, *size)
+        results: dict[str, tuple[float, Image.Image]] = {
+            "source": (0.0, canvas),
+            "lut": _bench_fast(canvas, "lut", args.repeats),
+            "stats": _bench_fast(canvas, "stats", args.repeats),
+            "local": await _bench_backend(LocalBackend(), size),
+        }
+        reference = None
+        if args.img2img:
+            results["img2img"] = await _bench_backend(get_image_backend_router(), size)
+            reference = results["img2img"][1]
+
+        for name, (ms, styled) in results.items():
+            vs = f"{_delta_e(styled, reference):.1f}" if reference is not None else "-"
+            print(
+                f"{f'{size[0]}x{size[1]}':<12}{name:<10}{ms:>12.1f}"
+                f"{_palette_distance(styled):>12.1f}{vs:>16}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
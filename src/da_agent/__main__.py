@@ -1,23 +1,27 @@
 """
 사용법:
   uv run python -m da_agent
+  uv run python -m da_agent --jobs jobs.jsonl --concurrency 4
+  uv run python -m da_agent --profile [--profile-dir .cache/profiles]
+  uv run python -m da_agent --jobs jobs.jsonl --monitor-loop   # 이벤트 루프 정지 감시
 
 예시 입력값으로 파이프라인을 실행하는 CLI 진입점.
-실제 운영 시에는 아래 example_* 변수를 교체하여 사용.
+실제 운영 시에는 아래 example_* 변수를 교체하거나 --jobs로 작업 파일(JSONL)을 지정.
+결과는 OUTPUT_DIR 아래 콘텐츠 주소 경로에 저장되고 manifest.jsonl에 기록됩니다.
 """
+import argparse
 import asyncio
-import datetime
 import logging
-import os
-import urllib.request
-from datetime import datetime
 
 from da_agent.utils.http_client import configure_ssl_globally
 
 # SSL 전역 패치 — 반드시 다른 import보다 먼저 실행 (fal_client 포함 모든 라이브러리에 적용)
 configure_ssl_globally()
 
-from da_agent.pipeline import run_pipeline  # noqa: E402
+from da_agent.batch import iter_jobs, run_batch, run_job  # noqa: E402
+from da_agent.config import get_settings  # noqa: E402
+from da_agent.store.output_sink import get_output_sink  # noqa: E402
+from da_agent.utils.loop_monitor import monitor_event_loop  # noqa: E402
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
 
@@ -42,60 +46,64 @@ example_guidelines = {
 }
 
 async def main() -> None:
-    result = await run_pipeline(
-        user_clicked_ad_image=example_clicked_ad,
-        existing_product_da=example_existing_da,
-        product_info=example_product_info,
-        brand_identity=example_brand,
-        guidelines=example_guidelines,
+    parser = argparse.ArgumentParser(prog="python -m da_agent")
+    parser.add_argument("--jobs", help="작업 파일 (JSONL, 한 줄에 작업 하나) — 생략 시 예시 입력 1건 실행")
+    parser.add_argument("--concurrency", type=int, default=4, help="배치 동시 실행 수")
+    parser.add_argument("--profile", action="store_true", help="스테이지별 프로파일 저장 (PROFILE_ENABLED)")
+    parser.add_argument("--profile-dir", help="프로파일 저장 디렉터리 (기본 PROFILE_DIR)")
+    parser.add_argument(
+        "--monitor-loop", action="store_true",
+        help="이벤트 루프 지연 측정 및 정지 시 스택 로그 (LOOP_MONITOR_ENABLED)",
     )
+    parser.add_argument(
+        "--deadline", type=float,
+        help="작업당 실행 시간 예산 (초) — 초과 시 최고 점수 결과 반환 (RUN_DEADLINE_SECONDS)",
+    )
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if args.profile:
+        settings.profile_enabled = True
+    if args.profile_dir:
+        settings.profile_dir = args.profile_dir
+    if args.monitor_loop:
+        settings.loop_monitor_enabled = True
+    if args.deadline is not None:
+        settings.run_deadline_seconds = args.deadline
+
+    async with monitor_event_loop():
+        await _run(args, settings)
 
-    print(f"\n✓ 완료: {result.iterations_used}회 시도, 최종 점수 {result.eval_result.score}/100")
-    print(f"  Pass: {result.eval_result.passed}")
-    if result.eval_result.issues:
-        print("  남은 이슈:")
-        for issue in result.eval_result.issues:
-            print(f"    [{issue.severity.value}] {issue.item}: {issue.detail}")
 
-# ── 이미지 저장 로직 수정 ───────────────────────────────
-    # output 디렉토리 생성
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 파일명 생성 (타임스탬프 기반)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = os.path.join(output_dir, f"final_da_{timestamp}.png")
+async def _run(args: argparse.Namespace, settings) -> None:
+    sink = get_output_sink()
+
+    if args.jobs:
+        summary = await run_batch(iter_jobs(args.jobs), sink, concurrency=args.concurrency)
+        print(f"\n✓ 배치 완료: {summary.completed}건 (통과 {summary.passed}건), 실패 {summary.failed}건")
+        for error in summary.errors:
+            print(f"    {error}")
+        print(f"  매니페스트: {sink.manifest_path}")
+        if settings.profile_enabled:
+            print(f"  프로파일: {settings.profile_dir}/<run_id>/")
+        return
+
+    outcome = await run_job(
+        {
+            "user_clicked_ad_image": example_clicked_ad,
+            "existing_product_da": example_existing_da,
+            "product_info": example_product_info,
+            "brand_identity": example_brand,
+            "guidelines": example_guidelines,
+        },
+        sink,
+    )
+    print(f"\n✓ 완료: 최종 점수 {outcome['score']}/100 (Pass: {outcome['passed']})")
+    print(f"\n💾 최종 이미지가 저장되었습니다: {outcome['uri']}")
+    print(f"  매니페스트: {sink.manifest_path} (run_id={outcome['run_id']})")
+    if settings.profile_enabled:
+        print(f"  프로파일: {settings.profile_dir}/{outcome['run_id']}/")
 
-    # 1. 바이트(bytes) 데이터가 있는 경우 가장 깔끔하게 저장 가능
-    if hasattr(result, 'final_image_bytes') and result.final_image_bytes:
-        try:
-            with open(output_filename, "wb") as f:
-                f.write(result.final_image_bytes)
-            print(f"\n💾 최종 이미지가 저장되었습니다: {output_filename}")
-        except Exception as e:
-            print(f"\n❌ 이미지 바이트 저장 중 오류 발생: {e}")
-            
-    # 2. final_image가 URL 문자열이거나 Pillow(PIL) 객체인 경우
-    elif hasattr(result, 'final_image') and result.final_image:
-        image_data = result.final_image
-        try:
-            if isinstance(image_data, str) and image_data.startswith("http"):
-                # URL인 경우 다운로드
-                urllib.request.urlretrieve(image_data, output_filename)
-                print(f"\n💾 최종 이미지가 저장되었습니다: {output_filename}")
-            
-            elif hasattr(image_data, 'save'):
-                # Pillow Image 객체인 경우
-                image_data.save(output_filename)
-                print(f"\n💾 최종 이미지가 저장되었습니다: {output_filename}")
-            
-            else:
-                print(f"\n⚠️ 이미지를 저장할 수 없는 형식입니다. (타입: {type(image_data)})")
-        except Exception as e:
-            print(f"\n❌ 이미지 저장 중 오류 발생: {e}")
-            
-    else:
-        print("\n⚠️ 파이프라인 결과에 저장할 이미지가 없습니다.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
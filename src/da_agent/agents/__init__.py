@@ -1,5 +1,5 @@
 from .architect import create_blueprint
-from .evaluator import evaluate_ad
+from .evaluator import evaluate_ad, evaluate_ad_cascade
 from .extractor import extract_style_dna
 from .generator import generate_ad_image
 
@@ -8,4 +8,5 @@ __all__ = [
     "create_blueprint",
     "generate_ad_image",
     "evaluate_ad",
+    "evaluate_ad_cascade",
 ]
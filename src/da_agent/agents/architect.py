@@ -1,11 +1,12 @@
-import json
 from pathlib import Path
 
 from da_agent.config import get_settings
-from da_agent.models.blueprint import Blueprint
+from da_agent.models.blueprint import Blueprint, BlueprintVariants
 from da_agent.models.evaluation import EvaluationResult
 from da_agent.models.style_dna import StyleDNA
 from da_agent.utils.http_client import create_openai_client
+from da_agent.utils.llm import call_structured, json_schema_format
+from da_agent.utils.prompts import read_prompt
 
 _TEMPLATE_PATH = (
     Path(__file__).parent.parent / "utils/prompt_templates/architect.txt"
@@ -41,21 +42,55 @@ IMPORTANT: Address ALL issues above in this regeneration.
 """
 
 
+def _build_variant_section(n_variants: int) -> str:
+    if n_variants <= 1:
+        return ""
+
+    return f"""### 1-B. A/B Copy Variants
+
+Write exactly {n_variants} DISTINCT Korean copy variants in "ad_copies" (instead of a single "ad_copy").
+- Every variant must follow ALL copy rules above (tone, length, emphasis, forbidden/required elements)
+- Vary the angle: lead with a different product feature or benefit in each variant
+- All variants are composited onto the SAME styled image — write one shared "transformation_prompt"
+"""
+
+
 async def create_blueprint(
     style_dna: StyleDNA,
     product_info: dict,
     brand_identity: dict,
     guidelines: dict,
     feedback: list[EvaluationResult] | None = None,
+    n_variants: int | None = None,
 ) -> Blueprint:
-    """Stage 2: Style DNA + 광고주 데이터 → 생성 설계도(Blueprint) 작성."""
+    """Stage 2: Style DNA + 광고주 데이터 → 생성 설계도(Blueprint) 작성.
+
+    n_variants(기본 COPY_VARIANTS)가 2 이상이면 하나의 transformation_prompt를 공유하는
+    카피 변형 N개를 한 번의 호출로 받아 Blueprint.variants에 담습니다 (ad_copy는 첫 변형).
+    """
     settings = get_settings()
+    n_variants = settings.copy_variants if n_variants is None else n_variants
     client = create_openai_client()
 
-    template = _TEMPLATE_PATH.read_text(encoding="utf-8")
-    feedback_section = _build_feedback_section(feedback or [])
-
-    prompt = template.format(
+    template = await read_prompt(_TEMPLATE_PATH)
+    # 캠페인 고정 필드 → system 접두사 (프롬프트 캐시 재사용), 사용자별 필드 → user 접미사
+    static = dict(
+        # Product
+        product_name=product_info.get("name", ""),
+        product_description=product_info.get("description", ""),
+        product_features=", ".join(product_info.get("features", [])),
+        # Brand
+        brand_primary_colors=", ".join(brand_identity.get("primary_colors", [])),
+        brand_secondary_colors=", ".join(brand_identity.get("secondary_colors", [])),
+        brand_logo_url=brand_identity.get("logo_url", ""),
+        # Guidelines
+        guidelines_required=", ".join(guidelines.get("required_elements", [])),
+        guidelines_forbidden=", ".join(guidelines.get("forbidden_elements", [])),
+        guidelines_tone=", ".join(guidelines.get("tone_constraints", [])),
+        guidelines_media_specs=str(guidelines.get("media_specs", {})),
+        variant_section=_build_variant_section(n_variants),
+    )
+    per_user = dict(
         # Image style
         image_mood=style_dna.image_style.mood,
         image_lighting=style_dna.image_style.lighting,
@@ -72,28 +107,41 @@ async def create_blueprint(
         copy_length=style_dna.copy_style.length,
         copy_emphasis=style_dna.copy_style.emphasis_type,
         copy_keywords=", ".join(style_dna.copy_style.keywords),
-        # Product
-        product_name=product_info.get("name", ""),
-        product_description=product_info.get("description", ""),
-        product_features=", ".join(product_info.get("features", [])),
-        # Brand
-        brand_primary_colors=", ".join(brand_identity.get("primary_colors", [])),
-        brand_secondary_colors=", ".join(brand_identity.get("secondary_colors", [])),
-        brand_logo_url=brand_identity.get("logo_url", ""),
-        # Guidelines
-        guidelines_required=", ".join(guidelines.get("required_elements", [])),
-        guidelines_forbidden=", ".join(guidelines.get("forbidden_elements", [])),
-        guidelines_tone=", ".join(guidelines.get("tone_constraints", [])),
         # Feedback loop
-        feedback_section=feedback_section,
+        feedback_section=_build_feedback_section(feedback or []),
     )
-
-    response = await client.chat.completions.create(
-        model=settings.stage2_model,
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_object"},
-        max_tokens=2048,
+    messages = template.messages(static, per_user)
+
+    if n_variants > 1:
+        response, _ = await call_structured(
+            client,
+            {
+                "model": settings.stage2_model,
+                "messages": messages,
+                "response_format": json_schema_format(BlueprintVariants),
+                "max_tokens": 2048 + 256 * n_variants,
+            },
+            BlueprintVariants,
+            stage="architect",
+        )
+        copies = response.ad_copies[:n_variants]
+        if not copies:
+            raise ValueError("Architect returned no copy variants")
+        return Blueprint(
+            ad_copy=copies[0],
+            transformation_prompt=response.transformation_prompt,
+            variants=copies,
+        )
+
+    blueprint, _ = await call_structured(
+        client,
+        {
+            "model": settings.stage2_model,
+            "messages": messages,
+            "response_format": json_schema_format(Blueprint, exclude=("variants",)),
+            "max_tokens": 2048,
+        },
+        Blueprint,
+        stage="architect",
     )
-
-    raw = json.loads(response.choices[0].message.content)
-    return Blueprint(**raw)
+    return blueprint
@@ -1,19 +1,58 @@
+import asyncio
 import base64
-import json
+import logging
 from pathlib import Path
 
 from PIL import Image
 
 from da_agent.config import get_settings
+from da_agent.models.ad_layout import AdLayout, BBox
 from da_agent.models.blueprint import AdCopy
-from da_agent.models.evaluation import EvaluationResult
+from da_agent.models.evaluation import BatchEvaluation, EvaluationResult
+from da_agent.utils import metrics
 from da_agent.utils.http_client import create_openai_client
 from da_agent.utils.image_utils import image_to_bytes
+from da_agent.utils.llm import (
+    StructuredOutputError,
+    cached_prompt_tokens,
+    call_structured,
+    json_schema_format,
+)
+from da_agent.utils.prompts import read_prompt
+
+logger = logging.getLogger(__name__)
 
 _TEMPLATE_PATH = (
     Path(__file__).parent.parent / "utils/prompt_templates/evaluator.txt"
 )
 
+_BATCH_TEMPLATE_PATH = (
+    Path(__file__).parent.parent / "utils/prompt_templates/evaluator_batch.txt"
+)
+
+# tier는 로컬에서 채우는 필드이므로 응답 스키마에서 제외
+_EVAL_RESPONSE_FORMAT = json_schema_format(EvaluationResult, exclude=("tier",))
+
+
+def _batch_response_format() -> dict:
+    fmt = json_schema_format(BatchEvaluation)
+    candidate = fmt["json_schema"]["schema"]["$defs"]["CandidateEvaluation"]
+    candidate["properties"].pop("tier")
+    candidate["required"].remove("tier")
+    return fmt
+
+
+_BATCH_RESPONSE_FORMAT = _batch_response_format()
+
+_LOW_DETAIL_MAX_SIDE = 512  # detail=low는 512px로 처리되므로 미리 축소해 업로드 크기 절감
+
+_CROPS_NOTE = """
+## Attached Images
+Image 1: the full ad (low detail) — use it for overall composition and product prominence.
+Image 2: high-detail crop of the text zone — use it for text readability and CTA.
+Image 3: high-detail crop of the logo zone — use it for logo presence and sizing.
+"""
+
 
 def _image_to_data_url(image: Image.Image) -> str:
     """PIL Image를 base64 data URL로 변환합니다."""
@@ -22,6 +61,112 @@ def _image_to_data_url(image: Image.Image) -> str:
     return f"data:image/jpeg;base64,{b64}"
 
 
+def _image_part(image: Image.Image, detail: str) -> dict:
+    if detail == "low":
+        image = image.copy()
+        image.thumbnail((_LOW_DETAIL_MAX_SIDE, _LOW_DETAIL_MAX_SIDE))
+    return {
+        "type": "image_url",
+        "image_url": {"url": _image_to_data_url(image), "detail": detail},
+    }
+
+
+def _crop_zone(image: Image.Image, bbox: BBox) -> Image.Image:
+    return image.crop((bbox.x, bbox.y, bbox.x + bbox.width, bbox.y + bbox.height))
+
+
+async def _image_parts(*specs: tuple[Image.Image, str]) -> list[dict]:
+    """(이미지, detail) 목록을 이미지 파트로 — 축소·JPEG 인코딩은 이벤트 루프 밖에서."""
+    return await asyncio.to_thread(lambda: [_image_part(image, detail) for image, detail in specs])
+
+
+def _guideline_fields(brand_identity: dict, guidelines: dict) -> dict:
+    return {
+        "guidelines_required": ", ".join(guidelines.get("required_elements", [])),
+        "guidelines_forbidden": ", ".join(guidelines.get("forbidden_elements", [])),
+        "guidelines_tone": ", ".join(guidelines.get("tone_constraints", [])),
+        "brand_colors": ", ".join(brand_identity.get("primary_colors", [])),
+        "guidelines_media_specs": str(guidelines.get("media_specs", {})),
+        "pass_score": get_settings().eval_pass_score,
+    }
+
+
+async def _build_messages(
+    ad_copy: AdCopy,
+    brand_identity: dict,
+    guidelines: dict,
+    image_parts: list[dict],
+    note: str = "",
+) -> list[dict]:
+    """[system: 가이드라인·평가 지시 (캠페인 고정), user: 이미지 + 카피 (후보별)]."""
+    template = await read_prompt(_TEMPLATE_PATH)
+    messages = template.messages(
+        _guideline_fields(brand_identity, guidelines),
+        dict(
+            copy_headline=ad_copy.headline,
+            copy_subheadline=ad_copy.subheadline,
+            copy_cta=ad_copy.cta,
+        ),
+        image_parts,
+    )
+    if note:
+        messages[-1]["content"][-1]["text"] += note
+    return messages
+
+
+async def _build_batch_messages(
+    copies: list[AdCopy],
+    brand_identity: dict,
+    guidelines: dict,
+    image_parts: list[dict],
+) -> list[dict]:
+    """[system: 단건 평가와 같은 접두사, user: 라벨·이미지 + 묶음 지시·후보별 카피].
+
+    가이드라인·평가 기준은 evaluator.txt 접두사 하나만 유지 — 단건·묶음 요청이 같은
+    system 메시지를 보내므로 프롬프트 캐시도 공유됩니다. evaluator_batch.txt는 접미사만 가짐.
+    """
+    single = await read_prompt(_TEMPLATE_PATH)
+    batch = await read_prompt(_BATCH_TEMPLATE_PATH)
+    candidate_copies = "\n\n".join(
+        f"Candidate {i}:\nHeadline: {c.headline}\nSubheadline: {c.subheadline}\nCTA: {c.cta}"
+        for i, c in enumerate(copies, start=1)
+    )
+    prefix = single.render_prefix(**_guideline_fields(brand_identity, guidelines))
+    suffix = batch.render_suffix(candidate_count=len(copies), candidate_copies=candidate_copies)
+    return [
+        {"role": "system", "content": prefix},
+        {"role": "user", "content": [*image_parts, {"type": "text", "text": suffix}]},
+    ]
+
+
+async def _request_evaluation(
+    messages: list[dict],
+    model: str,
+    tier: str,
+) -> EvaluationResult:
+    client = create_openai_client()
+    request = {
+        "model": model,
+        "messages": messages,
+        "response_format": _EVAL_RESPONSE_FORMAT,
+        "max_tokens": 1024,
+    }
+    result, response = await call_structured(
+        client, request, EvaluationResult, stage=f"evaluator.{tier}"
+    )
+    result.tier = tier
+    if response.usage is not None:
+        logger.info(
+            "Evaluation tier=%s model=%s score=%d tokens=%d cached=%d",
+            tier,
+            model,
+            result.score,
+            response.usage.total_tokens,
+            cached_prompt_tokens(response),
+        )
+    return result
+
+
 async def evaluate_ad(
     generated_image: Image.Image,
     ad_copy: AdCopy,
@@ -35,40 +180,154 @@ async def evaluate_ad(
     - 텍스트 직접 검사: 금지어·필수 문구·법적 요소 (ad_copy 문자열)
     """
     settings = get_settings()
-    client = create_openai_client()
-
-    template = _TEMPLATE_PATH.read_text(encoding="utf-8")
-    prompt = template.format(
-        guidelines_required=", ".join(guidelines.get("required_elements", [])),
-        guidelines_forbidden=", ".join(guidelines.get("forbidden_elements", [])),
-        guidelines_tone=", ".join(guidelines.get("tone_constraints", [])),
-        brand_colors=", ".join(brand_identity.get("primary_colors", [])),
-        guidelines_media_specs=str(guidelines.get("media_specs", {})),
-        copy_headline=ad_copy.headline,
-        copy_subheadline=ad_copy.subheadline,
-        copy_cta=ad_copy.cta,
-        pass_score=settings.eval_pass_score,
+    messages = await _build_messages(
+        ad_copy, brand_identity, guidelines, await _image_parts((generated_image, "high"))
     )
+    return await _request_evaluation(messages, model=settings.stage4_model, tier="high")
 
-    image_data_url = _image_to_data_url(generated_image)
 
-    response = await client.chat.completions.create(
+async def evaluate_ad_cascade(
+    generated_image: Image.Image,
+    ad_copy: AdCopy,
+    brand_identity: dict,
+    guidelines: dict,
+    layout: AdLayout | None = None,
+) -> EvaluationResult:
+    """Stage 4 (캐스케이드): low detail 1차 평가 후 애매한 점수만 승급 평가합니다.
+
+    - 1차: detail=low 전체 이미지 → 점수가 eval_pass_score ± eval_cascade_band
+      밖이면 그대로 확정 (tier="low")
+    - 2차: 밴드 안이면 eval_escalation_model(기본 stage4_model)로 재평가
+      - eval_zone_crops + layout: 전체 low + 텍스트·로고 존 high 크롭 (tier="crops")
+      - 그 외: 전체 이미지 detail=high (tier="escalated")
+    """
+    settings = get_settings()
+
+    low = await _request_evaluation(
+        await _build_messages(
+            ad_copy, brand_identity, guidelines, await _image_parts((generated_image, "low"))
+        ),
         model=settings.stage4_model,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": image_data_url, "detail": "high"},
-                    },
-                    {"type": "text", "text": prompt},
-                ],
-            }
-        ],
-        response_format={"type": "json_object"},
-        max_tokens=1024,
+        tier="low",
+    )
+    if abs(low.score - settings.eval_pass_score) > settings.eval_cascade_band:
+        return low
+
+    escalation_model = settings.eval_escalation_model or settings.stage4_model
+    logger.info(
+        "Low-detail score %d within ±%d of pass score %d — escalating to %s",
+        low.score,
+        settings.eval_cascade_band,
+        settings.eval_pass_score,
+        escalation_model,
+    )
+
+    if settings.eval_zone_crops and layout is not None:
+        image_parts = await _image_parts(
+            (generated_image, "low"),
+            (_crop_zone(generated_image, layout.text_zone), "high"),
+            (_crop_zone(generated_image, layout.logo_zone), "high"),
+        )
+        return await _request_evaluation(
+            await _build_messages(ad_copy, brand_identity, guidelines, image_parts, note=_CROPS_NOTE),
+            model=escalation_model,
+            tier="crops",
+        )
+
+    return await _request_evaluation(
+        await _build_messages(
+            ad_copy, brand_identity, guidelines, await _image_parts((generated_image, "high"))
+        ),
+        model=escalation_model,
+        tier="escalated",
     )
 
-    raw = json.loads(response.choices[0].message.content)
-    return EvaluationResult(**raw)
+
+async def _evaluate_batch_chunk(
+    candidates: list[tuple[Image.Image, AdCopy]],
+    brand_identity: dict,
+    guidelines: dict,
+) -> list[EvaluationResult | None]:
+    """후보 묶음을 한 요청으로 평가합니다. 응답에서 빠졌거나 검증에 실패한 후보는 None."""
+    settings = get_settings()
+    encoded = await _image_parts(*((image, "high") for image, _ in candidates))
+    image_parts: list[dict] = []
+    for i, part in enumerate(encoded, start=1):
+        image_parts.append({"type": "text", "text": f"Candidate {i}"})
+        image_parts.append(part)
+    messages = await _build_batch_messages(
+        [c for _, c in candidates], brand_identity, guidelines, image_parts
+    )
+
+    request = {
+        "model": settings.stage4_model,
+        "messages": messages,
+        "response_format": _BATCH_RESPONSE_FORMAT,
+        "max_tokens": 1024 * len(candidates),
+    }
+    try:
+        # 재시도는 묶음 전체를 다시 보내므로 하지 않고 곧바로 단건 평가로 폴백
+        batch, response = await call_structured(
+            create_openai_client(), request, BatchEvaluation, stage="evaluator.batch", max_retries=0
+        )
+    except StructuredOutputError as exc:
+        logger.warning("Batch evaluation of %d candidates failed: %s", len(candidates), exc)
+        return [None] * len(candidates)
+
+    results: list[EvaluationResult | None] = [None] * len(candidates)
+    for item in batch.evaluations:
+        index = item.candidate - 1
+        if 0 <= index < len(results) and results[index] is None:
+            results[index] = EvaluationResult.model_validate(
+                item.model_dump(exclude={"candidate"}) | {"tier": "batch"}
+            )
+    if response.usage is not None:
+        logger.info(
+            "Batch evaluation model=%s candidates=%d scores=%s tokens=%d cached=%d",
+            settings.stage4_model,
+            len(candidates),
+            [r.score if r is not None else None for r in results],
+            response.usage.total_tokens,
+            cached_prompt_tokens(response),
+        )
+    return results
+
+
+async def evaluate_ads_batch(
+    candidates: list[tuple[Image.Image, AdCopy]],
+    brand_identity: dict,
+    guidelines: dict,
+    batch_size: int | None = None,
+) -> list[EvaluationResult]:
+    """Stage 4 (묶음 평가): 같은 작업의 후보 여러 개를 한 Vision 요청으로 평가합니다.
+
+    가이드라인·브랜드 컨텍스트는 요청당 한 번만 보내고, 후보별로 "Candidate N" 라벨·이미지·
+    카피만 추가합니다. 최대 batch_size(기본 EVAL_BATCH_SIZE)개씩 묶어 동시에 요청하며,
+    응답 파싱에 실패하거나 빠진 후보는 evaluate_ad 단건 호출로 폴백합니다.
+
+    Returns:
+        candidates 순서의 EvaluationResult 목록 (묶음 판정은 tier="batch")
+    """
+    batch_size = batch_size or get_settings().eval_batch_size
+    if batch_size <= 1 or len(candidates) <= 1:
+        return list(await asyncio.gather(*(
+            evaluate_ad(image, ad_copy, brand_identity, guidelines)
+            for image, ad_copy in candidates
+        )))
+
+    chunks = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+    chunk_results = await asyncio.gather(*(
+        _evaluate_batch_chunk(chunk, brand_identity, guidelines) for chunk in chunks
+    ))
+    results = [result for chunk in chunk_results for result in chunk]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        metrics.increment("evaluator.batch_fallbacks", len(missing))
+        fallbacks = await asyncio.gather(*(
+            evaluate_ad(candidates[i][0], candidates[i][1], brand_identity, guidelines)
+            for i in missing
+        ))
+        for i, result in zip(missing, fallbacks):
+            results[i] = result
+    return results
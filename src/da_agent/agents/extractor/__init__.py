@@ -1,34 +1,115 @@
 import asyncio
+import logging
+from collections import Counter
 
 from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+from da_agent.store.near_duplicates import get_near_duplicate_index, group_near_duplicates
+from da_agent.store.profile_store import ProfileStore
+from da_agent.store.style_dna_cache import get_style_dna_cache, image_cache_key
+from da_agent.utils import metrics
+from da_agent.utils.image_hash import ImageFingerprint, fingerprint
+from da_agent.utils.image_utils import load_image_scaled
+from da_agent.utils.single_flight import coalesce
 
 from .copy_style import extract_copy_style
 from .image_style import extract_image_style
 from .layout_style import extract_layout_style
 
+logger = logging.getLogger(__name__)
+
+_FINGERPRINT_DECODE_SIZE = (64, 64)   # 지각 해시 입력(32×32) 이상으로만 디코드
+
+
+async def _fingerprint(image_url: str) -> ImageFingerprint | None:
+    """클릭 이미지의 지각 해시 지문 (로드 실패 시 None → 중복 판정에서 제외)."""
+    try:
+        scaled = await load_image_scaled(image_url, _FINGERPRINT_DECODE_SIZE)
+    except Exception as exc:  # noqa: BLE001 — 지문은 최적화일 뿐, 추출은 계속 진행
+        logger.warning("Fingerprint failed for %s: %r", image_url, exc)
+        return None
+    return await asyncio.to_thread(fingerprint, scaled.image)
+
+
+async def _group_clicks(urls: list[str]) -> tuple[list[int], list[ImageFingerprint | None]]:
+    """근접 중복 클릭 그룹 — (입력별 대표 인덱스, 입력별 지문).
+
+    CLICK_DEDUPE_ENABLED가 꺼져 있으면 모든 입력이 각자 대표 (지문 없음).
+    """
+    index = get_near_duplicate_index()
+    if index is None or not urls:
+        return list(range(len(urls))), [None] * len(urls)
+
+    fingerprints = list(await asyncio.gather(*[_fingerprint(url) for url in urls]))
+    groups = group_near_duplicates(fingerprints, index.max_distance)
+    duplicates = len(urls) - len(set(groups))
+    if duplicates:
+        metrics.increment("stage1.duplicate_clicks", duplicates)
+    return groups, fingerprints
+
+
+async def _extract_single(image_url: str, fp: ImageFingerprint | None = None) -> StyleDNA:
+    """단일 이미지에서 3개 추출기를 병렬 실행합니다.
+
+    Style DNA 캐시(STYLE_DNA_CACHE_DIR)가 설정되어 있으면 먼저 조회하고,
+    미스일 때만 추출 후 캐시에 저장합니다 (배치 사전 계산 결과 재사용).
+    지문(fp)이 있으면 근접 중복 인덱스로 이전에 추출한 같은 소재의 캐시를 찾습니다.
+    같은 콘텐츠의 동시 추출은 하나로 합칩니다 (SINGLE_FLIGHT_ENABLED).
+    """
+    # 캐시·인덱스는 파일 기반 — 해시 계산과 읽기·쓰기는 이벤트 루프 밖에서
+    key = await asyncio.to_thread(image_cache_key, image_url)
+    return await coalesce("extract", key, lambda: _extract_uncoalesced(image_url, key, fp))
+
+
+async def _extract_uncoalesced(image_url: str, key: str, fp: ImageFingerprint | None) -> StyleDNA:
+    cache = get_style_dna_cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+
+    index = get_near_duplicate_index() if fp is not None and cache is not None else None
+    if index is not None:
+        canonical = index.lookup(fp)
+        cached = await asyncio.to_thread(cache.get, canonical) if canonical is not None else None
+        if cached is not None:
+            metrics.increment("stage1.near_duplicate_hits")
+            await asyncio.to_thread(cache.put, key, cached)  # 다음 조회는 정확 키로 적중
+            return cached
 
-async def _extract_single(image_url: str) -> StyleDNA:
-    """단일 이미지에서 3개 추출기를 병렬 실행합니다."""
     image_style, layout_style, copy_style = await asyncio.gather(
         extract_image_style(image_url),   # 1a: 독립 Vision 호출
         extract_layout_style(image_url),  # 1b: 독립 Vision 호출
         extract_copy_style(image_url),    # 1c: 독립 Vision 호출
     )
-    return StyleDNA(
+    dna = StyleDNA(
         image_style=image_style,
         layout_style=layout_style,
         copy_style=copy_style,
     )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, dna)
+        if index is not None:
+            await asyncio.to_thread(index.add, fp, key)
+    return dna
 
 
-def _merge_style_dnas(dnas: list[StyleDNA]) -> StyleDNA:
+def _merge_style_dnas(dnas: list[StyleDNA], weights: list[int] | None = None) -> StyleDNA:
     """여러 StyleDNA를 병합하여 종합적인 사용자 선호 스타일을 추출합니다.
 
     - 색상 팔레트 / 미학 키워드 / 카피 키워드: 합산 (중복 제거)
     - 분위기 / 조명 / 톤: " / "로 연결 (Architect가 최종 해석)
     - 레이아웃: 첫 번째 이미지 기준 (가장 강한 클릭 신호)
+    - weights(중복 클릭 수)가 주어지면 가중치 내림차순(동률은 클릭 순)으로 정렬하고,
+      2 이상인 소재의 분위기·조명·톤에 "×N"을 붙여 반복 추출 없이 선호 강도를 전달
     """
-    if len(dnas) == 1:
+    if weights is not None:
+        order = sorted(range(len(dnas)), key=lambda i: -weights[i])
+        dnas = [dnas[i] for i in order]
+        marks = [f" ×{weights[i]}" if weights[i] > 1 else "" for i in order]
+    else:
+        marks = [""] * len(dnas)
+
+    if len(dnas) == 1 and not marks[0]:
         return dnas[0]
 
     # 색상 팔레트: 중복 제거 후 합산 (최대 8개)
@@ -54,14 +135,14 @@ def _merge_style_dnas(dnas: list[StyleDNA]) -> StyleDNA:
 
     return StyleDNA(
         image_style=ImageStyle(
-            mood=" / ".join(dna.image_style.mood for dna in dnas),
-            lighting=" / ".join(dna.image_style.lighting for dna in dnas),
+            mood=" / ".join(dna.image_style.mood + m for dna, m in zip(dnas, marks)),
+            lighting=" / ".join(dna.image_style.lighting + m for dna, m in zip(dnas, marks)),
             color_palette=merged_palette,
             aesthetic=merged_aesthetic,
         ),
         layout_style=dnas[0].layout_style,  # 첫 번째 이미지 레이아웃 기준
         copy_style=CopyStyle(
-            tone=" / ".join(dna.copy_style.tone for dna in dnas),
+            tone=" / ".join(dna.copy_style.tone + m for dna, m in zip(dnas, marks)),
             length=dnas[0].copy_style.length,
             emphasis_type=dnas[0].copy_style.emphasis_type,
             keywords=merged_keywords,
@@ -74,17 +155,62 @@ async def extract_style_dna(image_url: str | list[str]) -> StyleDNA:
 
     - 단일 str: 해당 이미지에서 추출
     - list[str]: 각 이미지에서 병렬 추출 후 StyleDNA 병합
+    - CLICK_DEDUPE_ENABLED: 근접 중복 클릭은 대표 하나만 추출하고 클릭 수를 가중치로 병합
     """
     urls = [image_url] if isinstance(image_url, str) else list(image_url)
+    groups, fingerprints = await _group_clicks(urls)
+    representatives = list(dict.fromkeys(groups))   # 첫 등장 순서 유지
 
     # 이미지별로 3개 추출기 병렬 실행 (N images × 3 extractors 전체 동시)
-    dnas = await asyncio.gather(*[_extract_single(url) for url in urls])
-
-    return _merge_style_dnas(list(dnas))
+    dnas = await asyncio.gather(*[
+        _extract_single(urls[i], fingerprints[i]) for i in representatives
+    ])
+
+    if len(representatives) == len(urls):
+        return _merge_style_dnas(list(dnas))
+    counts = Counter(groups)
+    return _merge_style_dnas(list(dnas), [counts[i] for i in representatives])
+
+
+async def extract_user_style_dna(
+    user_id: str,
+    image_url: str | list[str],
+    store: ProfileStore,
+) -> StyleDNA:
+    """Stage 1 (프로필): 사용자 프로필에 새 클릭만 증분 반영하고 요약을 반환합니다.
+
+    - 이미 반영된 클릭은 재추출하지 않음 (ProfileStore.unseen — 클릭 이력 전체를 넘겨도 됨)
+    - 동시에 도는 같은 사용자의 실행이 같은 클릭을 추출해도 프로필에는 한 번만 반영
+    - 목록 순서대로 반영 — 뒤쪽 클릭이 더 최근 신호
+    - 반환값은 고정 크기 요약이므로 클릭 이력이 늘어도 Architect 프롬프트가 커지지 않음
+    - CLICK_DEDUPE_ENABLED: 근접 중복 클릭은 한 번만 추출하되, 클릭마다 프로필에 반영
+
+    Raises:
+        ValueError: 클릭이 없고 기존 프로필도 없는 사용자
+    """
+    urls = [image_url] if isinstance(image_url, str) else list(image_url)
+    keys = await asyncio.gather(*(asyncio.to_thread(image_cache_key, url) for url in urls))
+    # 저장소 접근은 모두 스레드에서 (저장소 락 대기·디스크 I/O가 이벤트 루프를 막지 않도록)
+    unseen = set(await asyncio.to_thread(store.unseen, user_id, list(keys)))
+    new_clicks = [(url, key) for url, key in zip(urls, keys) if key in unseen]
+
+    groups, fingerprints = await _group_clicks([url for url, _ in new_clicks])
+    representatives = list(dict.fromkeys(groups))
+    extracted = await asyncio.gather(*[
+        _extract_single(new_clicks[i][0], fingerprints[i]) for i in representatives
+    ])
+    dna_by_group = dict(zip(representatives, extracted))
+    clicks = [(dna_by_group[group], key) for (_, key), group in zip(new_clicks, groups)]
+    # 갱신·flush·요약을 한 번의 락 안에서 — 동시에 도는 다른 파이프라인의 갱신과 섞이지 않음
+    summary = await asyncio.to_thread(store.apply, user_id, clicks)
+    if summary is None:
+        raise ValueError(f"No clicks to build a Style DNA for user {user_id!r}")
+    return summary
 
 
 __all__ = [
     "extract_style_dna",
+    "extract_user_style_dna",
     "extract_image_style",
     "extract_layout_style",
     "extract_copy_style",
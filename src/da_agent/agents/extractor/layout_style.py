@@ -1,10 +1,12 @@
-import json
+import asyncio
 from pathlib import Path
 
 from da_agent.config import get_settings
 from da_agent.models.style_dna import LayoutStyle
+from da_agent.utils.async_files import load_template
 from da_agent.utils.http_client import create_openai_client
 from da_agent.utils.image_utils import prepare_image_for_api
+from da_agent.utils.llm import call_structured, json_schema_format, parse_structured
 
 _TEMPLATE_PATH = (
     Path(__file__).parent.parent.parent
@@ -12,16 +14,15 @@ _TEMPLATE_PATH = (
 )
 
 
-async def extract_layout_style(image_url: str) -> LayoutStyle:
-    """Stage 1b: 광고 이미지에서 레이아웃 구도(배치·시선흐름·여백)를 추출합니다."""
+def build_layout_style_request(image_url: str) -> dict:
+    """Stage 1b 요청 본문 (chat.completions.create 인자) — 인라인 호출·배치 제출 공용."""
     settings = get_settings()
-    client = create_openai_client()
-    system_prompt = _TEMPLATE_PATH.read_text(encoding="utf-8")
+    system_prompt = load_template(_TEMPLATE_PATH)
     api_image_url = prepare_image_for_api(image_url)
 
-    response = await client.chat.completions.create(
-        model=settings.stage1_model,
-        messages=[
+    return {
+        "model": settings.stage1_model,
+        "messages": [
             {"role": "system", "content": system_prompt},
             {
                 "role": "user",
@@ -37,9 +38,20 @@ async def extract_layout_style(image_url: str) -> LayoutStyle:
                 ],
             },
         ],
-        response_format={"type": "json_object"},
-        max_tokens=512,
-    )
+        "response_format": json_schema_format(LayoutStyle),
+        "max_tokens": 512,
+    }
+
+
+def parse_layout_style(content: str) -> LayoutStyle:
+    """모델 응답 본문(JSON 문자열)을 LayoutStyle로 변환합니다."""
+    return parse_structured(LayoutStyle, content, stage="layout_style")
 
-    raw = json.loads(response.choices[0].message.content)
-    return LayoutStyle(**raw)
+
+async def extract_layout_style(image_url: str) -> LayoutStyle:
+    """Stage 1b: 광고 이미지에서 레이아웃 구도(배치·시선흐름·여백)를 추출합니다."""
+    client = create_openai_client()
+    # 템플릿·이미지 파일 읽기와 재인코딩은 이벤트 루프 밖에서
+    request = await asyncio.to_thread(build_layout_style_request, image_url)
+    result, _ = await call_structured(client, request, LayoutStyle, stage="layout_style")
+    return result
@@ -1,24 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import os
 import re
+from dataclasses import dataclass
 
-import fal_client
 from PIL import Image
 
-from da_agent.agents.layout_analyzer import analyze_ad_layout
+from da_agent.agents.layout_engine import select_ad_layout
 from da_agent.config import get_settings
-from da_agent.models.blueprint import Blueprint
+from da_agent.models.ad_layout import AdLayout
+from da_agent.models.blueprint import AdCopy, Blueprint
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils import metrics
+from da_agent.utils.color_transfer import transfer_style_colors
+from da_agent.utils.deadline import remaining_seconds, within_deadline
+from da_agent.utils.image_backends import StyleTransferRequest, get_image_backend_router
 from da_agent.utils.image_utils import (
     draw_text_zone_background,
-    image_to_bytes,
-    load_image,
-    measure_text_height,
+    fit_canvas,
+    fit_text_block,
+    load_image_scaled,
     overlay_cta_button,
-    overlay_logo,
     overlay_text,
 )
+from da_agent.utils.output_encoder import OutputEncoder, get_output_encoder
+
+logger = logging.getLogger(__name__)
 
 _IMG2IMG_STRENGTH = 0.6   # 스타일 변환 강도 (0=원본 유지, 1=완전 변환)
 
@@ -27,8 +36,14 @@ _CTA_GAP = 16    # 서브카피와 CTA 버튼 사이 추가 간격 (px)
 _TEXT_ZONE_PADDING_TOP = 24    # 텍스트 존 배경 상단 내부 패딩 (px)
 _TEXT_ZONE_PADDING_SIDE = 32   # 텍스트 존 좌우 내부 패딩 (px)
 
-_CTA_BTN_HEIGHT = 52    # CTA 버튼 높이 (px)
+_TEXT_ZONE_PADDING_BOTTOM = 16  # 텍스트 존 배경 하단 내부 패딩 (px)
+
 _CTA_BTN_MAX_WIDTH = 300  # CTA 버튼 최대 너비 (px)
+_CTA_BTN_PADDING = 16     # CTA 버튼 좌우 내부 여백 (px)
+
+# 폰트 크기 상한 (헤드라인, 서브카피, CTA) — 자동 맞춤은 이 비율을 유지하며 축소
+_FONT_SIZES = (52, 30, 26)
+_BANNER_FONT_SIZES = (32, 20, 18)
 
 # 가로형 배너 판정 기준: 너비가 높이의 2.5배 이상이면 배너
 _BANNER_ASPECT_THRESHOLD = 2.5
@@ -77,55 +92,102 @@ def _brand_cta_color(brand_identity: dict) -> tuple[int, int, int, int]:
     return (r, g, b, 255)
 
 
-async def _get_fal_image_url(path_or_url: str) -> str:
-    """로컬 파일 경로면 fal.ai에 업로드하고 URL을 반환합니다."""
-    if path_or_url.startswith(("http://", "https://")):
-        return path_or_url
-    return await asyncio.to_thread(fal_client.upload_file, path_or_url)
+def _fast_path_reason(
+    settings,
+    router,
+    image_style: ImageStyle | None,
+) -> str | None:
+    """색 변환 고속 경로를 쓸 이유 (없으면 None → img2img).
+
+    auto는 측정값(img2img 예상 대기, 데드라인 남은 시간)으로만 판단합니다 — Stage 2는
+    기존 DA 이미지를 보지 않으므로 "색감만 바꾸면 된다"는 판단을 LLM에 맡기지 않습니다.
+    """
+    mode = settings.fast_style_transfer
+    if mode == "off" or image_style is None or not image_style.color_palette:
+        return None
+    if mode == "always":
+        return "forced"
+    remaining = remaining_seconds()
+    if settings.style_latency_budget > 0 or remaining is not None:
+        expected = router.expected_img2img_seconds()
+        if settings.style_latency_budget > 0 and (
+            expected is None or expected > settings.style_latency_budget
+        ):
+            return "latency_budget"
+        if remaining is not None and (
+            expected is None or expected + settings.deadline_eval_reserve_seconds > remaining
+        ):
+            # 실행 데드라인 안에 img2img와 Stage 4 평가를 함께 끝내지 못할 것으로 예상
+            return "deadline"
+    return None
+
+
+async def _transfer_colors(existing_da: str, image_style: ImageStyle, settings) -> Image.Image:
+    """Stage 3a 고속 경로: img2img 없이 팔레트·조명만 NumPy 색 변환으로 적용합니다."""
+    width, height = settings.image_width, settings.image_height
+    scaled = await load_image_scaled(existing_da, (width, height))
+
+    def _render() -> Image.Image:
+        canvas = fit_canvas(scaled.image.convert("RGB"), width, height)
+        return transfer_style_colors(
+            canvas, image_style, method=settings.fast_style_method, strength=_IMG2IMG_STRENGTH
+        )
+
+    return await asyncio.to_thread(_render)
 
 
 async def _transform_style(
     existing_da: str,
     transformation_prompt: str,
     settings,
+    job_group: str | None = None,
+    image_style: ImageStyle | None = None,
 ) -> Image.Image:
-    """Stage 3a: FLUX.1 img2img로 기존 DA를 사용자 선호 스타일로 변환합니다.
+    """Stage 3a: img2img로 기존 DA를 사용자 선호 스타일로 변환합니다.
 
     strength=0.6 → 제품·구도는 유지하면서 분위기·색감·조명을 변환합니다.
+    IMAGE_BACKENDS의 백엔드(fal / replicate / local) 중 측정 지연·대기열 깊이·비용으로
+    라우터가 고르며, 실패 시 다음 순위로 넘어갑니다. fal은 같은 job_group의 새 요청이
+    들어오거나 FAL_JOB_TIMEOUT을 넘기면 작업을 취소합니다.
+
+    img2img 예상 대기가 STYLE_LATENCY_BUDGET을 넘거나, 실행 데드라인의
+    남은 시간에 평가 몫(DEADLINE_EVAL_RESERVE_SECONDS)까지 넣을 수 없으면 image_style의
+    팔레트·조명으로 색 변환 고속 경로(FAST_STYLE_METHOD)를 사용합니다.
+    img2img 호출은 데드라인까지 남은 시간을 타임아웃으로 합니다 (초과 시 작업 취소).
     """
-    fal_url = await _get_fal_image_url(existing_da)
-
-    result = await fal_client.run_async(
-        "fal-ai/flux/dev/image-to-image",
-        arguments={
-            "image_url": fal_url,
-            "prompt": transformation_prompt,
-            "strength": _IMG2IMG_STRENGTH,
-            "image_size": {
-                "width": settings.image_width,
-                "height": settings.image_height,
-            },
-            "num_inference_steps": 28,
-            "guidance_scale": 3.5,
-            "num_images": 1,
-            "enable_safety_checker": True,
-        },
+    router = get_image_backend_router()
+    reason = _fast_path_reason(settings, router, image_style)
+    if reason is not None:
+        logger.info("Stage 3a: colour-transfer fast path (%s)", reason)
+        metrics.increment(f"style_transfer.fast.{reason}")
+        return await _transfer_colors(existing_da, image_style, settings)
+
+    metrics.increment("style_transfer.img2img")
+    request = StyleTransferRequest(
+        image=existing_da,
+        prompt=transformation_prompt,
+        width=settings.image_width,
+        height=settings.image_height,
+        strength=_IMG2IMG_STRENGTH,
+        group=job_group,
     )
-
-    image_url = result["images"][0]["url"]
-    return await load_image(image_url)
+    return await within_deadline(router.transform(request), "img2img")
 
 
 async def generate_ad_image(
     blueprint: Blueprint,
     brand_identity: dict,
     existing_product_da: str,
+    job_group: str | None = None,
+    image_style: ImageStyle | None = None,
+    encoder: OutputEncoder | None = None,
 ) -> tuple[Image.Image, bytes]:
     """Stage 3: 기존 제품 DA를 스타일 변환하고 카피·로고를 합성합니다.
 
     레이어 순서:
       1) FLUX.1 img2img — 기존 DA를 사용자 선호 스타일로 변환
-      2) Vision LLM — 변환된 이미지를 분석해 최적 텍스트·로고 배치 좌표 결정
+      2) 레이아웃 분석 — 변환된 이미지에서 최적 텍스트·로고 배치 좌표 결정
+         (Vision LLM / 로컬 saliency 엔진 / hybrid, settings.layout_engine)
       3) Pillow 합성
          a) 텍스트 존 반투명 컬러 밴드
          b) 헤드라인 + 서브카피
@@ -136,40 +198,95 @@ async def generate_ad_image(
         blueprint: 설계도 (카피, img2img 변환 프롬프트)
         brand_identity: 브랜드 아이덴티티 (로고 URL, 컬러)
         existing_product_da: 카피 제거된 기존 제품 DA 경로/URL
+        job_group: fal 작업 그룹 (예: 사용자 ID + 캠페인 키) — 같은 그룹의 이전 작업은 취소
+        image_style: 사용자 Style DNA 이미지 스타일 — 색 변환 고속 경로의 팔레트·조명
+        encoder: 출력 인코더 (없으면 기본 PNG) — media_specs 포맷·크기 상한
 
     Returns:
-        (PIL Image, PNG bytes)
+        (PIL Image, 인코딩된 bytes) — 이미지의 info["encoding"]에 인코딩 요약 첨부
     """
+    styled, layout = await prepare_ad_canvas(blueprint, existing_product_da, job_group, image_style)
+    composed, image_bytes = await compose_ad(
+        styled, layout, blueprint.ad_copy, brand_identity, encoder
+    )
+
+    if get_settings().ad_reuse_enabled:
+        # 유사 사용자 재사용(adapt) 시 카피만 다시 합성할 수 있도록 스타일 변환 결과 첨부
+        composed.info["styled_canvas"] = styled
+    return composed, image_bytes
+
+
+async def generate_ad_variants(
+    blueprint: Blueprint,
+    brand_identity: dict,
+    existing_product_da: str,
+    job_group: str | None = None,
+    image_style: ImageStyle | None = None,
+    encoder: OutputEncoder | None = None,
+) -> list[tuple[Image.Image, bytes]]:
+    """Stage 3 (카피 변형): 스타일 변환·레이아웃 분석은 한 번, 카피 변형마다 합성만 수행합니다.
+
+    Returns:
+        blueprint.copies() 순서의 (PIL Image, 인코딩된 bytes) 목록
+    """
+    styled, layout = await prepare_ad_canvas(blueprint, existing_product_da, job_group, image_style)
+    composed = await compose_ad_variants(
+        styled, layout, blueprint.copies(), brand_identity, encoder
+    )
+
+    if get_settings().ad_reuse_enabled:
+        for image, _ in composed:
+            image.info["styled_canvas"] = styled
+    return composed
+
+
+async def prepare_ad_canvas(
+    blueprint: Blueprint,
+    existing_product_da: str,
+    job_group: str | None = None,
+    image_style: ImageStyle | None = None,
+) -> tuple[Image.Image, AdLayout]:
+    """Stage 3a + 3b: img2img 스타일 변환 후 텍스트·로고 배치 좌표를 결정합니다."""
     settings = get_settings()
     if settings.fal_key:
         os.environ["FAL_KEY"] = settings.fal_key
 
-    # Stage 3a: img2img 스타일 변환
+    # Stage 3a: img2img 스타일 변환 (지연 예산·데드라인 초과 시 색 변환 고속 경로)
     styled = await _transform_style(
         existing_product_da,
         blueprint.transformation_prompt,
         settings,
+        job_group=job_group,
+        image_style=image_style,
     )
-    canvas_w, canvas_h = styled.size
-    banner = _is_horizontal_banner(canvas_w, canvas_h)
 
-    # Stage 3b: Vision LLM으로 텍스트·로고 배치 좌표 결정
-    layout = await analyze_ad_layout(styled)
+    # Stage 3b: 텍스트·로고 배치 좌표 결정 (vision / local / hybrid)
+    layout = await select_ad_layout(styled)
+    return styled, layout
+
+
+@dataclass
+class AdLayers:
+    """카피와 무관한 합성 레이어 — 카피 변형마다 재사용합니다."""
+
+    background: Image.Image              # 스타일 캔버스 + 텍스트 존 밴드 (RGBA)
+    logo: Image.Image | None             # 로고 존 크기로 리사이즈된 로고 (RGBA)
+    layout: AdLayout
+    cta_color: tuple[int, int, int, int]
+
+
+async def prepare_ad_layers(
+    styled: Image.Image,
+    layout: AdLayout,
+    brand_identity: dict,
+) -> AdLayers:
+    """Stage 3c 공통 레이어: 텍스트 존 반투명 밴드와 리사이즈된 브랜드 로고."""
     tz = layout.text_zone
     lz = layout.logo_zone
 
-    # Stage 3c: Pillow 합성
-    # 텍스트 색상 결정 (Vision이 배경 밝기를 분석해 결정)
-    if layout.text_color == "white":
-        text_fg_color = (255, 255, 255, 255)
-        sub_fg_color = (210, 210, 210, 220)
-    else:
-        text_fg_color = (20, 20, 20, 255)
-        sub_fg_color = (60, 60, 60, 220)
-
     # 3c-1. 텍스트 존 반투명 배경 밴드
     zone_color = _brand_zone_color(brand_identity)
-    composed = draw_text_zone_background(
+    background = draw_text_zone_background(
         styled,
         x=tz.x,
         y=tz.y,
@@ -179,6 +296,40 @@ async def generate_ad_image(
         alpha=215,
     )
 
+    logo = None
+    logo_url = brand_identity.get("logo_url")
+    if logo_url:
+        logo_img = (await load_image_scaled(logo_url, (lz.width, lz.height), need_alpha=True)).image
+        logo = logo_img.resize((lz.width, lz.height), Image.LANCZOS).convert("RGBA")
+
+    return AdLayers(
+        background=background,
+        logo=logo,
+        layout=layout,
+        cta_color=_brand_cta_color(brand_identity),
+    )
+
+
+def compose_copy(
+    layers: AdLayers,
+    ad_copy: AdCopy,
+    encoder: OutputEncoder | None = None,
+) -> tuple[Image.Image, bytes]:
+    """공통 레이어 위에 카피·CTA를 그리고 로고를 얹은 뒤 인코딩합니다 (동기 — 스레드에서 호출 가능)."""
+    layout = layers.layout
+    canvas_w, canvas_h = layers.background.size
+    banner = _is_horizontal_banner(canvas_w, canvas_h)
+    tz = layout.text_zone
+    lz = layout.logo_zone
+
+    # 텍스트 색상 결정 (Vision 또는 로컬 엔진이 배경 밝기를 분석해 결정)
+    if layout.text_color == "white":
+        text_fg_color = (255, 255, 255, 255)
+        sub_fg_color = (210, 210, 210, 220)
+    else:
+        text_fg_color = (20, 20, 20, 255)
+        sub_fg_color = (60, 60, 60, 220)
+
     # 3c-2. 헤드라인 + 서브카피
     text_x = tz.x + _TEXT_ZONE_PADDING_SIDE
     text_y = tz.y + _TEXT_ZONE_PADDING_TOP
@@ -192,76 +343,115 @@ async def generate_ad_image(
         ),
     )
 
-    # 가로형 배너에서는 폰트를 줄여서 좁은 높이에 맞춤
-    headline_size = 32 if banner else 52
-    sub_size = 20 if banner else 30
-    cta_size = 18 if banner else 26
-    cta_btn_h = 36 if banner else _CTA_BTN_HEIGHT
-
-    if text_y < canvas_h:
-        composed = overlay_text(
-            composed,
-            text=blueprint.ad_copy.headline,
-            x=text_x,
-            y=text_y,
-            max_width=max_w,
-            font_size=headline_size,
-            bold=True,
-            color=text_fg_color,
-            shadow=False,
+    # 폰트 크기 자동 맞춤 — 텍스트 존(캔버스 경계로 클램핑) 높이에 들어가는 최대 크기를
+    # 이진 탐색 (가로형 배너는 상한을 낮춰 위계 유지)
+    cta_btn_w = min(_CTA_BTN_MAX_WIDTH, max_w)
+    zone_bottom = min(tz.y + tz.height, canvas_h) - _TEXT_ZONE_PADDING_BOTTOM
+    fitted = fit_text_block(
+        ad_copy.headline,
+        ad_copy.subheadline,
+        ad_copy.cta,
+        max_width=max_w,
+        max_height=max(0, zone_bottom - text_y),
+        max_sizes=_BANNER_FONT_SIZES if banner else _FONT_SIZES,
+        cta_max_width=cta_btn_w - _CTA_BTN_PADDING * 2,
+        text_gap=_TEXT_GAP,
+        cta_gap=_CTA_GAP,
+    )
+    if not fitted.fits:
+        logger.warning(
+            "Copy does not fit text zone even at minimum font sizes (zone=%s)", tz
         )
-    headline_h = measure_text_height(
-        blueprint.ad_copy.headline, max_w, font_size=headline_size, bold=True
+
+    composed = overlay_text(
+        layers.background,
+        text=ad_copy.headline,
+        x=text_x,
+        y=text_y,
+        max_width=max_w,
+        font_size=fitted.headline_size,
+        bold=True,
+        color=text_fg_color,
+        shadow=False,
     )
 
-    sub_y = text_y + headline_h + _TEXT_GAP
-    if sub_y < canvas_h:
-        composed = overlay_text(
-            composed,
-            text=blueprint.ad_copy.subheadline,
-            x=text_x,
-            y=sub_y,
-            max_width=max_w,
-            font_size=sub_size,
-            bold=False,
-            color=sub_fg_color,
-            shadow=False,
-        )
-    sub_h = measure_text_height(
-        blueprint.ad_copy.subheadline, max_w, font_size=sub_size, bold=False
+    sub_y = text_y + fitted.headline_height + _TEXT_GAP
+    composed = overlay_text(
+        composed,
+        text=ad_copy.subheadline,
+        x=text_x,
+        y=sub_y,
+        max_width=max_w,
+        font_size=fitted.sub_size,
+        bold=False,
+        color=sub_fg_color,
+        shadow=False,
     )
 
-    # 3c-3. CTA 버튼 — 캔버스 하단을 넘지 않도록 y 클램핑
-    cta_btn_w = min(_CTA_BTN_MAX_WIDTH, max_w)
+    # 3c-3. CTA 버튼 — 캔버스 하단을 넘지 않도록 y 클램핑 (맞춤 실패 시 대비)
+    cta_btn_h = fitted.cta_height
     cta_btn_x = text_x
-    cta_btn_y = sub_y + sub_h + _CTA_GAP
+    cta_btn_y = sub_y + fitted.sub_height + _CTA_GAP
     cta_btn_y = min(cta_btn_y, canvas_h - cta_btn_h - 4)
 
     if cta_btn_y >= 0 and cta_btn_y + cta_btn_h <= canvas_h:
-        cta_color = _brand_cta_color(brand_identity)
         composed = overlay_cta_button(
             composed,
-            text=blueprint.ad_copy.cta,
+            text=ad_copy.cta,
             x=cta_btn_x,
             y=cta_btn_y,
             width=cta_btn_w,
             height=cta_btn_h,
-            bg_color=cta_color,
+            bg_color=layers.cta_color,
             text_color=(255, 255, 255, 255),
-            font_size=cta_size,
+            font_size=fitted.cta_size,
         )
 
     # 3c-4. 브랜드 로고 합성
-    logo_url = brand_identity.get("logo_url")
-    if logo_url:
-        logo_img = await load_image(logo_url)
-        composed = overlay_logo(
-            composed,
-            logo=logo_img,
-            x=lz.x,
-            y=lz.y,
-            width=lz.width,
-            height=lz.height,
-        )
+    if layers.logo is not None:
+        composed.paste(layers.logo, (lz.x, lz.y), mask=layers.logo.split()[3])
+
+    # Stage 4 캐스케이드가 텍스트·로고 존 크롭에 사용할 수 있도록 레이아웃 첨부
+    composed.info["ad_layout"] = layout
+
+    # 3c-5. 출력 인코딩 — media_specs 포맷·크기 상한 (결과 요약은 매니페스트용으로 첨부)
+    encoded = (encoder or get_output_encoder()).encode(composed)
+    composed.info["encoding"] = encoded.summary()
+    return composed, encoded.data
+
+
+async def compose_ad(
+    styled: Image.Image,
+    layout: AdLayout,
+    ad_copy: AdCopy,
+    brand_identity: dict,
+    encoder: OutputEncoder | None = None,
+) -> tuple[Image.Image, bytes]:
+    """Stage 3c: 스타일 변환된 이미지 위에 카피·CTA·로고를 Pillow로 합성합니다.
+
+    Returns:
+        (PIL Image, 인코딩된 bytes) — 이미지의 info["ad_layout"]에 사용된 레이아웃,
+        info["encoding"]에 인코딩 요약 첨부
+    """
+    layers = await prepare_ad_layers(styled, layout, brand_identity)
+    # 텍스트 합성 + 품질 탐색 인코딩은 수십~수백 ms CPU 작업 → 이벤트 루프 밖에서 실행
+    return await asyncio.to_thread(compose_copy, layers, ad_copy, encoder)
+
 
-    return composed, image_to_bytes(composed)
+async def compose_ad_variants(
+    styled: Image.Image,
+    layout: AdLayout,
+    copies: list[AdCopy],
+    brand_identity: dict,
+    encoder: OutputEncoder | None = None,
+) -> list[tuple[Image.Image, bytes]]:
+    """카피 변형 N개를 같은 캔버스·레이아웃에 합성합니다.
+
+    밴드·로고 레이어는 한 번만 만들고, 변형별 텍스트 합성·인코딩은 스레드에서 병렬 실행합니다.
+    """
+    layers = await prepare_ad_layers(styled, layout, brand_identity)
+    return list(
+        await asyncio.gather(
+            *(asyncio.to_thread(compose_copy, layers, c, encoder) for c in copies)
+        )
+    )
@@ -6,7 +6,6 @@ LLM이 좌표를 상상하는 대신 실제 이미지를 분석하므로 배치
 from __future__ import annotations
 
 import base64
-import json
 import logging
 from io import BytesIO
 from pathlib import Path
@@ -16,6 +15,8 @@ from PIL import Image
 from da_agent.config import get_settings
 from da_agent.models.ad_layout import AdLayout
 from da_agent.utils.http_client import create_openai_client
+from da_agent.utils.llm import call_structured, json_schema_format
+from da_agent.utils.prompts import read_prompt
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,12 @@ _TEMPLATE_PATH = (
     Path(__file__).parent.parent / "utils/prompt_templates/layout_analyzer.txt"
 )
 
+# 프롬프트가 요구하는 배치 근거 한 줄 — 스키마에만 포함하고 AdLayout 검증 시 무시됨
+_LAYOUT_RESPONSE_FORMAT = json_schema_format(
+    AdLayout,
+    extra_properties={"reasoning": {"type": "string"}},
+)
+
 
 def _image_to_data_url(image: Image.Image) -> str:
     """PIL Image를 Vision API용 base64 JPEG data URL로 변환합니다."""
@@ -61,33 +68,20 @@ async def analyze_ad_layout(image: Image.Image) -> AdLayout:
     client = create_openai_client()
     canvas_w, canvas_h = image.size
 
-    template = _TEMPLATE_PATH.read_text(encoding="utf-8")
-    prompt = template.format(width=canvas_w, height=canvas_h)
+    template = await read_prompt(_TEMPLATE_PATH)
+    image_part = {
+        "type": "image_url",
+        "image_url": {"url": _image_to_data_url(image), "detail": "high"},
+    }
 
-    response = await client.chat.completions.create(
+    request = dict(
         model=settings.stage1_model,  # gpt-4o-mini (Vision)
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": _image_to_data_url(image),
-                            "detail": "high",
-                        },
-                    },
-                    {"type": "text", "text": prompt},
-                ],
-            }
-        ],
-        response_format={"type": "json_object"},
+        # 분석 지시는 모든 호출에 공통 (system 접두사) — 이미지·캔버스 크기만 user 메시지
+        messages=template.messages({}, dict(width=canvas_w, height=canvas_h), [image_part]),
+        response_format=_LAYOUT_RESPONSE_FORMAT,
         max_tokens=512,
     )
-
-    raw = json.loads(response.choices[0].message.content)
-    raw.pop("reasoning", None)  # 모델 필드에 없는 reasoning 제거
-    layout = AdLayout(**raw)
+    layout, _ = await call_structured(client, request, AdLayout, stage="layout_analyzer")
     layout = _clamp_layout(layout, canvas_w, canvas_h)
 
     logger.info(
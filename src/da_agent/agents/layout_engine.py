@@ -0,0 +1,333 @@
+"""Stage 3b — 로컬 saliency 기반 레이아웃 엔진
+
+Vision LLM 호출 없이 엣지(복잡도) 맵과 saliency(제품) 맵을 적분 영상으로 계산하고,
+슬라이딩 윈도우로 후보 존을 채점해 카피·로고 배치 좌표를 결정합니다.
+
+엔진 선택 (settings.layout_engine):
+  - vision: 기존 Vision LLM 분석 (analyze_ad_layout)
+  - local:  로컬 엔진만 사용
+  - hybrid: 로컬 엔진 우선, 신뢰도가 낮을 때만 Vision 호출
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from da_agent.agents.layout_analyzer import _clamp_layout, analyze_ad_layout
+from da_agent.config import get_settings
+from da_agent.models.ad_layout import AdLayout, BBox
+
+logger = logging.getLogger(__name__)
+
+_ANALYSIS_MAX_SIDE = 256   # 분석용 다운스케일 최대 변 길이 (px)
+_STRIDE_DIVISIONS = 16     # 슬라이딩 윈도우 이동 간격 = 캔버스 변 / 16
+
+_SALIENCY_WEIGHT = 1.5     # 제품(saliency) 겹침 페널티 가중치 — 복잡도보다 강하게 회피
+_EDGE_ANCHOR_BONUS = 0.05  # 캔버스 가장자리에 붙은 존 선호 (DA 관례)
+_COST_CEILING = 0.6        # 이 비용 이상이면 신뢰도 0
+
+_TEXT_COLOR_LUMA_THRESHOLD = 140  # 존 평균 휘도가 이보다 밝으면 dark 텍스트
+_LUMA_CONFIDENCE_MARGIN = 40      # 임계값에서 이만큼 떨어져야 텍스트 색 판정 신뢰도 1
+
+# 텍스트 존 후보 형태 (캔버스 대비 너비·높이 비율)
+# 최소 크기는 Vision 프롬프트와 동일: 너비 35% 이상, 높이 30% 이상
+_SQUARE_ZONE_SHAPES = [
+    (1.0, 0.35), (1.0, 0.45),   # 상·하단 스트립
+    (0.4, 1.0), (0.5, 1.0),     # 좌·우 사이드 패널
+    (0.5, 0.4), (0.6, 0.5),     # 코너 블록
+]
+_BANNER_ZONE_SHAPES = [
+    (0.35, 1.0), (0.4, 1.0), (0.5, 1.0),  # 가로형 배너: 좌·우 패널만
+]
+
+# 로고 코너 선호 순서와 페널티 (우상단 > 우하단 > 좌상단 > 좌하단)
+_LOGO_CORNERS = [
+    ("top-right", 0.0),
+    ("bottom-right", 0.05),
+    ("top-left", 0.1),
+    ("bottom-left", 0.15),
+]
+
+# 가로형 배너 판정 기준 — generator와 동일
+_BANNER_ASPECT_THRESHOLD = 2.5
+
+_VALID_ENGINES = ("vision", "local", "hybrid")
+
+
+@dataclass
+class LocalLayoutResult:
+    layout: AdLayout
+    confidence: float          # 0~1, hybrid 모드의 Vision 폴백 판단 기준
+    text_zone_luminance: float  # 텍스트 존 평균 휘도 (0~255)
+
+
+def _to_analysis_arrays(image: Image.Image) -> tuple[np.ndarray, np.ndarray]:
+    """분석 해상도로 축소한 RGB·휘도 배열을 반환합니다."""
+    w, h = image.size
+    scale = min(1.0, _ANALYSIS_MAX_SIDE / max(w, h))
+    small_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    small = image.convert("RGB").resize(small_size, Image.BILINEAR)
+    rgb = np.asarray(small, dtype=np.float32)
+    luma = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return rgb, luma
+
+
+def _edge_map(luma: np.ndarray) -> np.ndarray:
+    """휘도 그래디언트 크기로 복잡도(clutter) 맵을 만듭니다 (0~1 정규화)."""
+    edges = np.zeros_like(luma)
+    edges[:, 1:] += np.abs(np.diff(luma, axis=1))
+    edges[1:, :] += np.abs(np.diff(luma, axis=0))
+    ceiling = float(np.percentile(edges, 95))
+    if ceiling <= 0:
+        return np.zeros_like(edges)
+    return np.clip(edges / ceiling, 0.0, 1.0)
+
+
+def _saliency_map(rgb: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """제품 위치 추정용 saliency 맵 (0~1 정규화).
+
+    - 색 대비: 블러 이미지와 중앙값 색의 거리 (frequency-tuned saliency 변형,
+      큰 제품이 평균색을 끌어당기지 않도록 평균 대신 중앙값 사용)
+    - 물체성: 엣지 맵을 크게 블러해 윤곽 내부까지 채운 맵 (단색 제품 대응)
+    - 중앙 prior: 제품 DA는 대부분 제품을 중앙에 배치
+    """
+    h, w = edges.shape
+    blurred = Image.fromarray(rgb.astype(np.uint8)).filter(ImageFilter.GaussianBlur(2))
+    blurred_arr = np.asarray(blurred, dtype=np.float32)
+    background_color = np.median(rgb.reshape(-1, 3), axis=0)
+    contrast = _normalize(np.linalg.norm(blurred_arr - background_color, axis=2))
+
+    edge_img = Image.fromarray((edges * 255).astype(np.uint8))
+    objectness = _normalize(np.asarray(
+        edge_img.filter(ImageFilter.GaussianBlur(max(h, w) / 16)), dtype=np.float32
+    ))
+
+    yy, xx = np.mgrid[0:h, 0:w]
+    r2 = ((yy - (h - 1) / 2) / (h / 2)) ** 2 + ((xx - (w - 1) / 2) / (w / 2)) ** 2
+    center_prior = np.clip(1.0 - 0.5 * r2, 0.0, 1.0)
+
+    return _normalize(np.maximum(contrast, objectness) * center_prior)
+
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    peak = float(values.max())
+    if peak <= 0:
+        return np.zeros_like(values)
+    return values / peak
+
+
+def _integral(values: np.ndarray) -> np.ndarray:
+    """(H+1, W+1) 적분 영상 — 임의 사각형 합을 O(1)로 계산합니다."""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    integral[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    return integral
+
+
+def _window_means(
+    integral: np.ndarray, ys: np.ndarray, xs: np.ndarray, win_h: int, win_w: int
+) -> np.ndarray:
+    """모든 (y, x) 위치에서 win_h × win_w 윈도우 평균을 벡터화해 계산합니다."""
+    y0 = ys[:, None]
+    x0 = xs[None, :]
+    y1 = y0 + win_h
+    x1 = x0 + win_w
+    total = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    return total / (win_h * win_w)
+
+
+def _rect_mean(integral: np.ndarray, x: int, y: int, w: int, h: int) -> float:
+    total = (
+        integral[y + h, x + w] - integral[y, x + w]
+        - integral[y + h, x] + integral[y, x]
+    )
+    return float(total / max(1, w * h))
+
+
+def _positions(extent: int, window: int, stride: int) -> np.ndarray:
+    """윈도우 시작 좌표 목록 — 마지막 위치(가장자리 정렬)를 항상 포함합니다."""
+    last = extent - window
+    positions = np.arange(0, last + 1, stride)
+    if positions[-1] != last:
+        positions = np.append(positions, last)
+    return positions
+
+
+def _overlaps(a: BBox, b: BBox) -> bool:
+    return not (
+        a.x + a.width <= b.x or b.x + b.width <= a.x
+        or a.y + a.height <= b.y or b.y + b.height <= a.y
+    )
+
+
+def _find_text_zone(
+    clutter_int: np.ndarray, saliency_int: np.ndarray, shape: tuple[int, int], banner: bool
+) -> tuple[BBox, float]:
+    """분석 해상도에서 비용이 가장 낮은 텍스트 존과 그 비용을 반환합니다."""
+    h, w = shape
+    stride_y = max(1, h // _STRIDE_DIVISIONS)
+    stride_x = max(1, w // _STRIDE_DIVISIONS)
+    best_cost = float("inf")
+    best_zone = BBox(x=0, y=0, width=w, height=h)
+
+    for w_ratio, h_ratio in _BANNER_ZONE_SHAPES if banner else _SQUARE_ZONE_SHAPES:
+        win_w = max(1, min(w, round(w * w_ratio)))
+        win_h = max(1, min(h, round(h * h_ratio)))
+        ys = _positions(h, win_h, stride_y)
+        xs = _positions(w, win_w, stride_x)
+
+        cost = (
+            _window_means(clutter_int, ys, xs, win_h, win_w)
+            + _SALIENCY_WEIGHT * _window_means(saliency_int, ys, xs, win_h, win_w)
+        )
+        # 스트립은 짧은 축 방향 가장자리에, 블록은 코너에 붙어야 앵커로 인정
+        anchored_y = (ys[:, None] == 0) | (ys[:, None] + win_h == h) | (win_h == h)
+        anchored_x = (xs[None, :] == 0) | (xs[None, :] + win_w == w) | (win_w == w)
+        cost = cost + np.where(anchored_y & anchored_x, 0.0, _EDGE_ANCHOR_BONUS)
+
+        iy, ix = np.unravel_index(int(np.argmin(cost)), cost.shape)
+        if cost[iy, ix] < best_cost:
+            best_cost = float(cost[iy, ix])
+            best_zone = BBox(x=int(xs[ix]), y=int(ys[iy]), width=win_w, height=win_h)
+
+    return best_zone, best_cost
+
+
+def _find_logo_zone(
+    clutter_int: np.ndarray,
+    saliency_int: np.ndarray,
+    shape: tuple[int, int],
+    text_zone: BBox,
+    canvas_size: tuple[int, int],
+) -> BBox:
+    """텍스트 존과 겹치지 않는 코너 중 가장 깨끗한 곳에 로고 존을 배치합니다."""
+    h, w = shape
+    canvas_w, canvas_h = canvas_size
+    scale = h / canvas_h
+    # Vision 프롬프트 기준 120×50px (1000px 캔버스) — 캔버스 크기에 비례, 높이의 1/4 이하
+    logo_h = min(50 * max(canvas_w, canvas_h) / 1000, canvas_h / 4) * scale
+    logo_h = max(1, round(logo_h))
+    logo_w = max(1, min(w, round(logo_h * 2.4)))
+    margin = round(0.03 * min(w, h))
+
+    candidates: list[tuple[float, BBox]] = []
+    for corner, penalty in _LOGO_CORNERS:
+        x = w - logo_w - margin if corner.endswith("right") else margin
+        y = margin if corner.startswith("top") else h - logo_h - margin
+        bbox = BBox(x=max(0, x), y=max(0, y), width=logo_w, height=logo_h)
+        if _overlaps(bbox, text_zone):
+            continue
+        cost = (
+            _rect_mean(clutter_int, bbox.x, bbox.y, bbox.width, bbox.height)
+            + _SALIENCY_WEIGHT * _rect_mean(saliency_int, bbox.x, bbox.y, bbox.width, bbox.height)
+            + penalty
+        )
+        candidates.append((cost, bbox))
+
+    if not candidates:
+        # 텍스트 존이 모든 코너를 덮는 경우 — 우상단 고정
+        return BBox(x=max(0, w - logo_w - margin), y=margin, width=logo_w, height=logo_h)
+    return min(candidates, key=lambda c: c[0])[1]
+
+
+def _scale_bbox(
+    bbox: BBox, shape: tuple[int, int], canvas_size: tuple[int, int]
+) -> BBox:
+    """분석 해상도 bbox를 캔버스 좌표로 변환합니다 (가장자리는 정확히 캔버스 경계로)."""
+    fy = canvas_size[1] / shape[0]
+    fx = canvas_size[0] / shape[1]
+    x0, y0 = round(bbox.x * fx), round(bbox.y * fy)
+    x1, y1 = round((bbox.x + bbox.width) * fx), round((bbox.y + bbox.height) * fy)
+    return BBox(x=x0, y=y0, width=x1 - x0, height=y1 - y0)
+
+
+def analyze_layout_local(image: Image.Image) -> LocalLayoutResult:
+    """로컬 saliency 분석으로 텍스트·로고 배치 존과 텍스트 색상을 결정합니다.
+
+    - 복잡도가 낮고 제품(saliency)과 겹치지 않는 존을 슬라이딩 윈도우로 선택
+    - text_color는 선택된 존의 실측 평균 휘도로 결정
+    - 신뢰도는 존 비용과 휘도 판정 여유 중 낮은 값
+    """
+    canvas_w, canvas_h = image.size
+    rgb, luma = _to_analysis_arrays(image)
+    edges = _edge_map(luma)
+    clutter_int = _integral(edges)
+    saliency_int = _integral(_saliency_map(rgb, edges))
+    luma_int = _integral(luma)
+    banner = canvas_w > canvas_h * _BANNER_ASPECT_THRESHOLD
+
+    text_zone, cost = _find_text_zone(clutter_int, saliency_int, luma.shape, banner)
+    logo_zone = _find_logo_zone(
+        clutter_int, saliency_int, luma.shape, text_zone, image.size
+    )
+
+    zone_luma = _rect_mean(
+        luma_int, text_zone.x, text_zone.y, text_zone.width, text_zone.height
+    )
+    text_color = "dark" if zone_luma > _TEXT_COLOR_LUMA_THRESHOLD else "white"
+
+    zone_confidence = float(np.clip(1.0 - cost / _COST_CEILING, 0.0, 1.0))
+    luma_confidence = float(np.clip(
+        abs(zone_luma - _TEXT_COLOR_LUMA_THRESHOLD) / _LUMA_CONFIDENCE_MARGIN, 0.0, 1.0
+    ))
+
+    layout = _clamp_layout(
+        AdLayout(
+            text_zone=_scale_bbox(text_zone, luma.shape, image.size),
+            logo_zone=_scale_bbox(logo_zone, luma.shape, image.size),
+            text_color=text_color,
+        ),
+        canvas_w,
+        canvas_h,
+    )
+    return LocalLayoutResult(
+        layout=layout,
+        confidence=min(zone_confidence, luma_confidence),
+        text_zone_luminance=zone_luma,
+    )
+
+
+async def select_ad_layout(image: Image.Image, engine: str | None = None) -> AdLayout:
+    """Stage 3b: 설정된 엔진(vision/local/hybrid)으로 카피·로고 배치 존을 결정합니다.
+
+    hybrid 모드에서는 로컬 엔진 신뢰도가 settings.layout_min_confidence 미만일 때만
+    Vision을 호출하며, 두 경로의 지연 시간을 함께 로깅합니다.
+    """
+    settings = get_settings()
+    engine = engine or settings.layout_engine
+    if engine not in _VALID_ENGINES:
+        raise ValueError(f"Unknown layout engine: {engine!r} (expected one of {_VALID_ENGINES})")
+
+    if engine == "vision":
+        return await analyze_ad_layout(image)
+
+    start = time.perf_counter()
+    local = await asyncio.to_thread(analyze_layout_local, image)
+    local_ms = (time.perf_counter() - start) * 1000
+
+    if engine == "local" or local.confidence >= settings.layout_min_confidence:
+        logger.info(
+            "Local layout: %.1fms, confidence=%.2f, text_zone=%s, text_color=%s",
+            local_ms,
+            local.confidence,
+            local.layout.text_zone,
+            local.layout.text_color,
+        )
+        return local.layout
+
+    start = time.perf_counter()
+    layout = await analyze_ad_layout(image)
+    vision_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        "Local layout confidence %.2f < %.2f — fell back to Vision "
+        "(local %.1fms, vision %.1fms)",
+        local.confidence,
+        settings.layout_min_confidence,
+        local_ms,
+        vision_ms,
+    )
+    return layout
@@ -0,0 +1,109 @@
+"""
+배치 실행 — 작업 목록(JSONL)을 제한된 동시성으로 처리하고 결과를 OutputSink로 스트리밍
+
+작업은 이터레이터에서 하나씩 꺼내 처리하며, 각 결과는 기록 직후 메모리에서 해제됩니다.
+진행 중 작업 수(concurrency)만큼의 결과만 메모리에 존재하므로 작업 수와 무관하게
+메모리 사용량이 일정합니다.
+
+작업 한 줄 형식:
+  {"user_clicked_ad_image": [...], "existing_product_da": "...", "product_info": {...},
+   "brand_identity": {...}, "guidelines": {...}, "user_id": "...", "deadline_seconds": 30}
+  (deadline_seconds는 선택 — 없으면 RUN_DEADLINE_SECONDS)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from da_agent.pipeline import run_pipeline
+from da_agent.store.output_sink import OutputSink, input_hashes
+
+logger = logging.getLogger(__name__)
+
+_INPUT_KEYS = (
+    "user_clicked_ad_image",
+    "existing_product_da",
+    "product_info",
+    "brand_identity",
+    "guidelines",
+)
+
+
+@dataclass
+class BatchSummary:
+    completed: int = 0
+    passed: int = 0
+    failed: int = 0
+    errors: list[str] = field(default_factory=list)   # 실패 작업 (최대 100건 보관)
+
+
+def iter_jobs(path: str | Path) -> Iterator[str]:
+    """JSONL 작업 파일을 한 줄씩 스트리밍합니다 (빈 줄 무시).
+
+    파싱은 run_batch 워커가 작업별 예외 처리 안에서 하므로, 깨진 줄은 실패 작업 하나로 집계됩니다.
+    """
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def _job_label(job: dict | str) -> str:
+    if isinstance(job, dict):
+        return str(job.get("user_id", "?"))
+    return f"line {job.strip()[:40]!r}"
+
+
+async def run_job(job: dict, sink: OutputSink) -> dict:
+    """작업 하나를 실행하고 결과를 싱크에 기록한 뒤 요약 dict를 반환합니다."""
+    inputs = {key: job[key] for key in _INPUT_KEYS}
+    user_id = job.get("user_id")
+    result = await run_pipeline(
+        **inputs, user_id=user_id, deadline_seconds=job.get("deadline_seconds")
+    )
+    hashes = await asyncio.to_thread(input_hashes, *(inputs[k] for k in _INPUT_KEYS))
+    record = await sink.write(result, inputs=hashes, user_id=user_id)
+    return {
+        "run_id": result.run_id,
+        "uri": record.uri,
+        "score": result.eval_result.score,
+        "passed": result.eval_result.passed,
+        "deadline_exceeded": result.deadline_exceeded,
+    }
+
+
+async def run_batch(
+    jobs: Iterable[dict | str], sink: OutputSink, concurrency: int = 4
+) -> BatchSummary:
+    """작업들을 최대 concurrency개씩 동시에 실행합니다 (작업은 dict 또는 JSONL 한 줄)."""
+    summary = BatchSummary()
+    job_iter = iter(jobs)
+    pull_lock = asyncio.Lock()   # 제너레이터는 동시에 next()할 수 없음
+
+    async def next_job() -> dict | str | None:
+        # 작업 파일 읽기는 이벤트 루프 밖에서 (iter_jobs는 한 줄씩 디스크에서 읽음)
+        async with pull_lock:
+            return await asyncio.to_thread(next, job_iter, None)
+
+    async def worker() -> None:
+        while (job := await next_job()) is not None:  # 공유 이터레이터 — 워커가 하나씩 가져감
+            try:
+                if isinstance(job, str):
+                    job = json.loads(job)
+                outcome = await run_job(job, sink)
+            except Exception as exc:  # noqa: BLE001 — 한 작업(깨진 줄 포함) 실패가 배치 전체를 멈추지 않도록
+                summary.failed += 1
+                if len(summary.errors) < 100:
+                    summary.errors.append(f"{_job_label(job)}: {exc!r}")
+                logger.exception("Batch job failed (%s)", _job_label(job))
+                continue
+            summary.completed += 1
+            summary.passed += int(outcome["passed"])
+            logger.info("Batch job done: %s", outcome)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summary
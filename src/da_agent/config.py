@@ -24,9 +24,146 @@ class Settings(BaseSettings):
     stage4_model: str = "gpt-4o-mini"
     image_gen_model: str = "fal-ai/flux/dev"
 
+    # fal Queue (Stage 3a)
+    fal_queue_url: str = "https://queue.fal.run"
+    fal_poll_interval: float = 0.5   # 진행 중 작업 상태 폴링 주기 (초)
+    fal_job_timeout: float = 120.0   # 초과 시 작업 취소 (초)
+
+    # Image Backends (Stage 3a)
+    # 스타일 변환 백엔드 후보 (fal | replicate | local) — 측정 지연 × (1 + 대기열 깊이) + 비용으로 선택
+    # local은 외부 호출 없는 결정적 CPU 색보정 (오프라인 실행: ["local"])
+    image_backends: list[str] = ["fal"]
+    image_backend_cost_weight: float = 100.0     # 이미지당 비용(USD) 1달러를 몇 초 지연으로 환산할지
+    image_backend_local_penalty: float = 60.0    # 로컬 백엔드 품질 저하 패널티 (초) — 원격 예상 대기가 이를 넘으면 강등
+    replicate_model: str = "black-forest-labs/flux-dev"
+    replicate_base_url: str = "https://api.replicate.com"
+    replicate_poll_interval: float = 1.0
+    replicate_job_timeout: float = 120.0
+
+    # Fast Style Transfer (Stage 3a)
+    # img2img 대신 Style DNA 팔레트·조명으로 NumPy 색 변환 (수 ms) — auto: img2img 예상 대기
+    # (지연 × (1 + 대기열))가 style_latency_budget을 넘거나 실행 데드라인 안에 끝낼 수 없을 때
+    fast_style_transfer: str = "auto"   # auto | always | off
+    fast_style_method: str = "lut"      # lut: 팔레트 3D LUT / stats: Lab 통계 전이
+    style_latency_budget: float = 0.0   # img2img 허용 예상 대기 (초, 0이면 제한 없음)
+
     # Pipeline Configuration
     max_eval_iterations: int = 3
     eval_pass_score: int = 80
+    # 구조화 출력 검증 실패(로컬 복구 불가) 시 해당 호출만 재전송하는 최대 횟수
+    structured_max_retries: int = 2
+    # A/B 카피 변형 수 — 2 이상이면 img2img·레이아웃 분석 1회 결과에 카피 N개를 합성해
+    # 함께 평가하고 점수순으로 순위를 매김 (변형당 추가 비용 ≈ 합성 + 평가)
+    copy_variants: int = 1
+
+    # Run Deadline
+    # 파이프라인 한 번의 시간 예산 — 남은 시간이 모든 모델·img2img 호출의 타임아웃이 되고,
+    # 남은 시간이 직전 반복(Stage 2~4) 소요보다 짧으면 다음 반복을 건너뛰고 최고 점수 결과 반환
+    run_deadline_seconds: float = 0.0          # 0이면 데드라인 없음 (작업별 deadline_seconds로 덮어씀)
+    # Stage 4(평가) 몫으로 남겨 둘 시간 — img2img 예상 대기 + 이 값이 남은 시간을 넘으면 색 변환 고속 경로
+    deadline_eval_reserve_seconds: float = 10.0
+
+    # Multi-Provider Routing (LLM / Vision 호출)
+    # 스테이지(또는 점 구분 접두사, "*" 기본값)별 "provider:model" 순위 목록 — 비워두면 OpenAI 직접 호출
+    # 예: {"evaluator": ["openai:gpt-4o-mini", "anthropic:claude-sonnet-4-5"], "*": ["openai"]}
+    llm_routes: dict[str, list[str]] = {}
+    llm_route_timeout: float = 60.0          # 프로바이더 호출 타임아웃 — 초과 시 다음 순위로 failover (초)
+    llm_route_max_error_rate: float = 0.5    # 최근 창의 오류율이 이를 넘으면 후순위로 강등
+    llm_route_window_seconds: float = 120.0  # 오류율 집계 시간 창 (초)
+    llm_route_min_samples: int = 5           # 지연 기반 정렬 전 최소 성공 표본 수
+    anthropic_base_url: str = "https://api.anthropic.com"
+
+    # Request Hedging (LLM / Vision 호출)
+    # 스테이지별 지연 백분위를 넘긴 호출에 복제 요청을 보내 먼저 온 응답 채택
+    llm_hedging: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_budget: float = 0.05      # 전체 호출 대비 hedge 요청 비율 상한
+    llm_hedge_min_samples: int = 20     # 백분위 학습 전 최소 표본 수 (이전에는 hedge 안 함)
+
+    # Style DNA Cache (Stage 1)
+    # 이미지 해시별 Style DNA 저장 디렉터리 — 비워두면 캐시 비활성화
+    # 배치 사전 계산(python -m da_agent.precompute)도 이 디렉터리를 채웁니다
+    style_dna_cache_dir: str = ""
+
+    # Click Dedupe (Stage 1)
+    # 클릭 광고의 지각 해시(pHash/dHash)로 같은 요청 내 중복 소재는 한 번만 추출(가중치 부여)하고,
+    # 이전 요청의 근접 중복은 대표 소재의 캐시된 Style DNA를 사용 (교차 요청은 캐시 디렉터리 필요)
+    click_dedupe_enabled: bool = False
+    click_dedupe_distance: int = 6   # pHash 해밍 거리 임계값 (0~7)
+
+    # User Profile Store (Stage 1)
+    # 사용자별 증분 Style DNA 요약 저장 디렉터리 — 비워두면 비활성화 (매 요청 전체 병합)
+    profile_store_dir: str = ""
+    profile_decay: float = 0.7   # 클릭 1건마다 기존 스타일 속성 가중치에 곱하는 감쇠율
+
+    # Evaluation Cascade (Stage 4)
+    # low detail 1차 평가 → 점수가 eval_pass_score ± band 안일 때만 high detail로 승급
+    eval_cascade: bool = False
+    eval_cascade_band: int = 10
+    eval_escalation_model: str = ""   # 승급 평가 모델 (비워두면 stage4_model)
+    eval_zone_crops: bool = False     # 승급 시 텍스트·로고 존 high detail 크롭 전송
+    # 한 Vision 요청에 묶어 평가할 최대 후보 수 (카피 변형 등) — 1이면 후보별 단건 평가
+    eval_batch_size: int = 1
+
+    # Layout Engine (Stage 3b)
+    # vision: Vision LLM 분석 / local: 로컬 saliency 엔진 / hybrid: 로컬 우선, 신뢰도 낮을 때만 Vision
+    layout_engine: str = "vision"
+    layout_min_confidence: float = 0.6
+
+    # Ad Reuse Index (Stage 1 → 2~4 생략)
+    # 같은 캠페인에서 Style DNA가 가까운 사용자에게 평가 통과 광고를 재사용
+    ad_reuse_enabled: bool = False
+    ad_reuse_serve_distance: float = 0.05   # 이 코사인 거리 이하: 그대로 제공
+    ad_reuse_adapt_distance: float = 0.15   # 이 거리 이하: 스타일 캔버스 재사용 + 카피만 재합성
+    ad_reuse_ttl_hours: float = 72
+    ad_reuse_max_per_campaign: int = 1000
+
+    # Output Sink
+    # 최종 광고를 콘텐츠 주소(sha256) 샤딩 경로에 저장하고 매니페스트(JSONL)에 기록
+    output_backend: str = "local"       # local | s3
+    output_dir: str = "output"
+    output_manifest: str = ""           # 비워두면 {output_dir}/manifest.jsonl
+    output_s3_bucket: str = ""
+    output_s3_prefix: str = ""
+    output_s3_endpoint_url: str = ""    # S3 호환 스토리지 엔드포인트 (MinIO 등)
+
+    # Output Encoding
+    # 포맷은 가이드라인 media_specs.format(PNG | JPEG | WebP), 크기 상한은 media_specs.max_bytes
+    # (또는 max_kb) — 없으면 output_max_bytes (0 = 제한 없음)
+    output_max_bytes: int = 0
+    output_png_compress_level: int = 3  # 0~9 (Pillow 기본 6: 약 7% 작지만 2.5배 느림)
+    output_png_quantize: bool = False   # true: PNG를 항상 팔레트(≤256색)로 저장
+    output_min_quality: int = 50        # JPEG/WebP 품질 탐색 범위
+    output_max_quality: int = 95
+    output_webp_method: int = 4         # 0(빠름)~6(작음)
+
+    # Profiling (CLI --profile)
+    # 스테이지별 cProfile·tracemalloc·스택 샘플링 결과를 {profile_dir}/{run_id}/에 저장
+    profile_enabled: bool = False
+    profile_dir: str = ".cache/profiles"
+    profile_sample_interval_ms: float = 5.0
+
+    # Event Loop Monitor (CLI --monitor-loop)
+    # 이벤트 루프 지연(lag)을 측정하고 threshold 넘게 막히면 막고 있는 코드의 스택을 경고 로그로 기록
+    loop_monitor_enabled: bool = False
+    loop_stall_threshold_ms: float = 100.0
+    loop_monitor_interval_ms: float = 50.0
+
+    # Single Flight
+    # 동시에 들어온 같은 요청(콘텐츠 해시 + 파라미터)은 진행 중인 호출 하나의 결과를 공유
+    # (Stage 1 추출, fal 업로드, 이미지 로드, 모델 호출)
+    single_flight_enabled: bool = True
+
+    # Background Removal (제품 누끼)
+    # 짧은 창 동안의 요청을 한 번의 ONNX 추론으로 묶고, 마스크는 픽셀 내용 해시로 캐시
+    bg_removal_model: str = "u2net"          # u2net 계열 (u2net | u2netp | u2net_human_seg | silueta)
+    bg_removal_pool_size: int = 1            # onnxruntime 세션 수 (배치 병렬 실행)
+    bg_removal_intra_op_threads: int = 0     # 세션당 연산 내부 스레드 (0 = onnxruntime 기본값)
+    bg_removal_inter_op_threads: int = 0     # 세션당 연산 간 스레드 (2 이상이면 병렬 실행 모드)
+    bg_removal_max_batch: int = 8
+    bg_removal_batch_window_ms: float = 10.0 # 배치로 묶을 요청을 기다리는 시간 (ms)
+    bg_removal_cache_size: int = 256         # 메모리 마스크 캐시 항목 수
+    bg_mask_cache_dir: str = ""              # 마스크 디스크 캐시 (비워두면 메모리만)
 
     # Image Configuration
     image_width: int = 1000
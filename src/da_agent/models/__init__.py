@@ -1,5 +1,13 @@
-from .blueprint import AdCopy, Blueprint, BoundingBox, LayoutGuide
-from .evaluation import CategoryScores, EvaluationResult, Issue, Severity
+from .ad_layout import AdLayout, BBox
+from .blueprint import AdCopy, Blueprint, BlueprintVariants
+from .evaluation import (
+    BatchEvaluation,
+    CandidateEvaluation,
+    CategoryScores,
+    EvaluationResult,
+    Issue,
+    Severity,
+)
 from .style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
 
 __all__ = [
@@ -7,12 +15,15 @@ __all__ = [
     "LayoutStyle",
     "CopyStyle",
     "StyleDNA",
-    "BoundingBox",
+    "BBox",
+    "AdLayout",
     "AdCopy",
-    "LayoutGuide",
     "Blueprint",
+    "BlueprintVariants",
     "Severity",
     "CategoryScores",
     "Issue",
     "EvaluationResult",
+    "CandidateEvaluation",
+    "BatchEvaluation",
 ]
@@ -12,3 +12,20 @@ class Blueprint(BaseModel):
     transformation_prompt: str = Field(
         description="FLUX.1 img2img 스타일 변환용 영문 프롬프트 — 제품/구도는 유지하고 분위기·색감을 사용자 선호로 변환"
     )
+    variants: list[AdCopy] = Field(
+        default_factory=list,
+        description="A/B 테스트용 카피 변형 (COPY_VARIANTS > 1일 때, ad_copy 포함) — 로컬에서 채움",
+    )
+
+    def copies(self) -> list[AdCopy]:
+        """합성할 카피 목록 — 변형이 없으면 ad_copy 하나."""
+        return self.variants or [self.ad_copy]
+
+
+class BlueprintVariants(BaseModel):
+    """COPY_VARIANTS > 1일 때의 Stage 2 응답 — 하나의 변환 프롬프트를 공유하는 카피 N개."""
+
+    ad_copies: list[AdCopy] = Field(description="서로 다른 한글 카피 변형 (요청한 개수만큼)")
+    transformation_prompt: str = Field(
+        description="모든 변형이 공유하는 FLUX.1 img2img 스타일 변환용 영문 프롬프트"
+    )
@@ -30,3 +30,17 @@ class EvaluationResult(BaseModel):
     issues: list[Issue]
     recommendations: list[str] = Field(description="구체적 수정 방향 목록")
     retry_priority: list[str] = Field(description="재생성 시 우선 반영 항목")
+    tier: str = Field(
+        default="high",
+        description="판정을 내린 평가 티어 (low / high / escalated / crops / batch)",
+    )
+
+
+class CandidateEvaluation(EvaluationResult):
+    candidate: int = Field(description="평가 대상 후보 번호 (Candidate 1 → 1)")
+
+
+class BatchEvaluation(BaseModel):
+    """여러 후보를 한 요청으로 평가한 응답 — 후보별 EvaluationResult."""
+
+    evaluations: list[CandidateEvaluation]
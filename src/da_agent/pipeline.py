@@ -3,33 +3,112 @@
 
 Stage 1 (병렬 추출) → Stage 2 (설계도 작성) → Stage 3 (이미지 생성)
 → Stage 4 (가이드라인 평가) → PASS: 완료 / FAIL: 피드백 포함 Stage 2 재진입
+실행 데드라인(RUN_DEADLINE_SECONDS)이 있으면 시간이 모자랄 때 최고 점수 결과를 반환
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass, field
 
 from PIL import Image
 
 from da_agent.agents.architect import create_blueprint
-from da_agent.agents.evaluator import evaluate_ad
-from da_agent.agents.extractor import extract_style_dna
-from da_agent.agents.generator import generate_ad_image
+from da_agent.agents.evaluator import evaluate_ad, evaluate_ad_cascade, evaluate_ads_batch
+from da_agent.agents.extractor import extract_style_dna, extract_user_style_dna
+from da_agent.agents.generator import (
+    compose_ad,
+    compose_ad_variants,
+    generate_ad_image,
+    generate_ad_variants,
+)
 from da_agent.config import get_settings
+from da_agent.models.blueprint import AdCopy
 from da_agent.models.evaluation import EvaluationResult
 from da_agent.models.style_dna import StyleDNA
+from da_agent.store.ad_index import AdMatch, campaign_key, get_ad_index
+from da_agent.store.profile_store import get_profile_store
+from da_agent.store.style_dna_cache import image_cache_key
+from da_agent.utils import metrics
+from da_agent.utils.deadline import DeadlineExceeded, current_deadline, deadline_scope
+from da_agent.utils.image_utils import decode_image
+from da_agent.utils.output_encoder import get_output_encoder
+from da_agent.utils.profiling import RunProfiler, get_run_profiler
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class CopyVariant:
+    """A/B 카피 변형 하나의 합성 결과와 평가 (COPY_VARIANTS > 1)."""
+
+    ad_copy: AdCopy
+    image_bytes: bytes | None           # OutputSink 기록 후 해제되면 None
+    eval_result: EvaluationResult
+    output_uri: str | None = None
+
+
 @dataclass
 class PipelineResult:
-    final_image: Image.Image
-    final_image_bytes: bytes
+    final_image: Image.Image | None     # OutputSink 기록 후 해제되면 None
+    final_image_bytes: bytes | None
     style_dna: StyleDNA
     eval_result: EvaluationResult
     iterations_used: int
     evaluation_history: list[EvaluationResult] = field(default_factory=list)
+    reused: str | None = None   # 재사용 인덱스 적중 시 "served" / "adapted"
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    timings: dict[str, float] = field(default_factory=dict)   # 스테이지별 누적 소요 시간 (초)
+    output_uri: str | None = None   # OutputSink에 기록된 위치
+    variants: list[CopyVariant] = field(default_factory=list)   # 최종 반복의 카피 변형 (점수 내림차순)
+    encoding: dict = field(default_factory=dict)   # 최종 이미지 인코딩 요약 (포맷·바이트·품질·시간)
+    deadline_exceeded: bool = False   # 실행 데드라인으로 반복을 중단하고 최고 점수 결과를 반환
+
+
+@contextmanager
+def _stage_timer(
+    timings: dict[str, float],
+    stage: str,
+    profiler: RunProfiler | None = None,
+    iteration: int = 0,
+):
+    """스테이지 소요 시간을 timings[stage]에 누적합니다 (반복 루프에서는 합산).
+
+    profiler가 있으면(PROFILE_ENABLED) 스테이지를 cProfile·tracemalloc·스택 샘플러로 감쌉니다.
+    """
+    started = time.perf_counter()
+    with profiler.stage(stage, iteration) if profiler is not None else nullcontext():
+        try:
+            yield
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+async def _evaluate(
+    settings,
+    generated_image: Image.Image,
+    ad_copy: AdCopy,
+    brand_identity: dict,
+    guidelines: dict,
+) -> EvaluationResult:
+    if settings.eval_cascade:
+        # low detail 1차 평가 → 애매한 점수만 high detail / 존 크롭으로 승급
+        return await evaluate_ad_cascade(
+            generated_image=generated_image,
+            ad_copy=ad_copy,
+            brand_identity=brand_identity,
+            guidelines=guidelines,
+            layout=generated_image.info.get("ad_layout"),
+        )
+    return await evaluate_ad(
+        generated_image=generated_image,
+        ad_copy=ad_copy,   # ← 카피 텍스트를 직접 전달 (OCR 우회)
+        brand_identity=brand_identity,
+        guidelines=guidelines,
+    )
 
 
 async def run_pipeline(
@@ -38,6 +117,8 @@ async def run_pipeline(
     product_info: dict,
     brand_identity: dict,
     guidelines: dict,
+    user_id: str | None = None,
+    deadline_seconds: float | None = None,
 ) -> PipelineResult:
     """
     초개인화 DA 자동 생성 파이프라인을 실행합니다.
@@ -49,98 +130,284 @@ async def run_pipeline(
         brand_identity: { logo_url, primary_colors[], secondary_colors[] }
         guidelines: { required_elements[], forbidden_elements[],
                       tone_constraints[], media_specs{} }
+        user_id: 사용자 ID — 프로필 저장소(PROFILE_STORE_DIR) 사용 시 새 클릭만
+                 추출해 누적 프로필에 반영하고, 고정 크기 요약을 Style DNA로 사용
+        deadline_seconds: 실행 시간 예산 (초, 기본 RUN_DEADLINE_SECONDS, 0이면 없음) —
+                 남은 시간이 모든 모델·img2img 호출의 타임아웃이 되며, 예산이 모자라면
+                 남은 반복을 건너뛰고 평가를 마친 최고 점수 결과를 deadline_exceeded=True로 반환
 
     Returns:
         PipelineResult (최종 이미지, 평가 결과, 반복 횟수 포함)
+
+    Raises:
+        DeadlineExceeded: 평가를 마친 결과가 하나도 없는 상태에서 데드라인 초과
     """
+    if deadline_seconds is None:
+        deadline_seconds = get_settings().run_deadline_seconds
+    with deadline_scope(deadline_seconds):
+        return await _run_pipeline(
+            user_clicked_ad_image,
+            existing_product_da,
+            product_info,
+            brand_identity,
+            guidelines,
+            user_id,
+        )
+
+
+async def _run_pipeline(
+    user_clicked_ad_image: str | list[str],
+    existing_product_da: str,
+    product_info: dict,
+    brand_identity: dict,
+    guidelines: dict,
+    user_id: str | None = None,
+) -> PipelineResult:
     settings = get_settings()
+    run_id = uuid.uuid4().hex
+    timings: dict[str, float] = {}
+    profiler = get_run_profiler(run_id)
+    # media_specs 포맷·크기 상한 — 지원하지 않는 포맷이면 모델 호출 전에 실패
+    encoder = get_output_encoder(guidelines.get("media_specs"))
 
     # ── Stage 1: 병렬 스타일 DNA 추출 ───────────────────────────────────────
-    logger.info("Stage 1: extracting style DNA from user-clicked ad...")
-    style_dna = await extract_style_dna(user_clicked_ad_image)
+    with _stage_timer(timings, "stage1", profiler):
+        logger.info("Stage 1: extracting style DNA from user-clicked ad...")
+        profile_store = get_profile_store() if user_id else None
+        if profile_store is not None:
+            style_dna = await extract_user_style_dna(
+                user_id, user_clicked_ad_image, profile_store
+            )
+        else:
+            style_dna = await extract_style_dna(user_clicked_ad_image)
     logger.info("Style DNA extracted: %s", style_dna.model_dump())
 
+    # ── 유사 사용자 재사용 인덱스 조회 (AD_REUSE_ENABLED) ───────────────────
+    ad_index = get_ad_index()
+    campaign = ""
+    match: AdMatch | None = None
+    if ad_index is not None or user_id:
+        base_da_key = await asyncio.to_thread(image_cache_key, existing_product_da)
+        campaign = campaign_key(product_info, brand_identity, guidelines, base_da_key)
+    if ad_index is not None:
+        match = ad_index.lookup(campaign, style_dna)
+    # fal 작업 그룹: 같은 사용자·같은 캠페인의 새 요청만 이전 작업을 대체 — 배치에서 한 사용자의
+    # 서로 다른 캠페인·제품 작업이 서로를 취소하지 않도록
+    job_group = f"{user_id}:{campaign[:16]}" if user_id else None
+    if match is not None and match.kind == "served":
+        metrics.observe("ad_index.score.served", match.entry.eval_result.score)
+        served = await asyncio.to_thread(decode_image, match.entry.image_bytes)
+        return PipelineResult(
+            final_image=served.image,
+            final_image_bytes=match.entry.image_bytes,
+            style_dna=style_dna,
+            eval_result=match.entry.eval_result,
+            iterations_used=0,
+            evaluation_history=[],
+            reused="served",
+            run_id=run_id,
+            timings=timings,
+            encoding={"format": served.format, "bytes": len(match.entry.image_bytes)},
+        )
+
     # ── Stage 2 → 3 → 4 평가 루프 ───────────────────────────────────────────
     evaluation_history: list[EvaluationResult] = []
     best_image: Image.Image | None = None
     best_bytes: bytes | None = None
     best_eval: EvaluationResult | None = None
     best_score = -1
+    best_variants: list[CopyVariant] = []
+    deadline = current_deadline()
+    deadline_exceeded = False
+    last_iteration_seconds = 0.0
 
     for iteration in range(1, settings.max_eval_iterations + 1):
-        logger.info("Iteration %d/%d", iteration, settings.max_eval_iterations)
+        # 데드라인: 남은 시간이 직전 반복(Stage 2~4) 소요보다 짧으면 다음 반복을 시작하지 않음
+        if deadline is not None and best_eval is not None:
+            if deadline.remaining() < last_iteration_seconds:
+                logger.warning(
+                    "Skipping iteration %d: %.1fs left, last iteration took %.1fs",
+                    iteration, deadline.remaining(), last_iteration_seconds,
+                )
+                metrics.increment("deadline.skipped_iterations")
+                deadline_exceeded = True
+                break
+        iteration_started = time.perf_counter()
+        try:
+            logger.info("Iteration %d/%d", iteration, settings.max_eval_iterations)
 
-        # Stage 2: 설계도 작성 (재생성 시 이전 피드백 포함)
-        logger.info("Stage 2: creating blueprint...")
-        blueprint = await create_blueprint(
-            style_dna=style_dna,
-            product_info=product_info,
-            brand_identity=brand_identity,
-            guidelines=guidelines,
-            feedback=evaluation_history if evaluation_history else None,
-        )
-        logger.info("Blueprint ad_copy: %s", blueprint.ad_copy.model_dump())
+            # Stage 2: 설계도 작성 (재생성 시 이전 피드백 포함)
+            with _stage_timer(timings, "stage2", profiler, iteration):
+                logger.info("Stage 2: creating blueprint...")
+                blueprint = await create_blueprint(
+                    style_dna=style_dna,
+                    product_info=product_info,
+                    brand_identity=brand_identity,
+                    guidelines=guidelines,
+                    feedback=evaluation_history if evaluation_history else None,
+                )
+            logger.info("Blueprint ad_copy: %s", blueprint.ad_copy.model_dump())
 
-        # Stage 3: img2img 스타일 변환 + Vision 레이아웃 분석 + 카피/로고 합성
-        logger.info("Stage 3: generating ad image...")
-        generated_image, image_bytes = await generate_ad_image(
-            blueprint,
-            brand_identity,
-            existing_product_da=existing_product_da,
-        )
+            # Stage 3: img2img 스타일 변환 + Vision 레이아웃 분석 + 카피/로고 합성
+            # 카피 변형이 여러 개면 스타일 변환·레이아웃은 한 번, 변형마다 합성만 수행
+            copies = blueprint.copies()
+            adapting = match is not None and iteration == 1
+            with _stage_timer(timings, "stage3", profiler, iteration):
+                if adapting:
+                    # 유사 사용자의 스타일 캔버스·레이아웃 재사용 → 카피만 재합성
+                    logger.info("Stage 3: composing new copy onto reused canvas...")
+                    canvas = match.entry.canvas()
+                    if len(copies) > 1:
+                        candidates = await compose_ad_variants(
+                            canvas, match.entry.layout, copies, brand_identity, encoder
+                        )
+                    else:
+                        candidates = [
+                            await compose_ad(
+                                canvas, match.entry.layout, copies[0], brand_identity, encoder
+                            )
+                        ]
+                    for image, _ in candidates:
+                        image.info["styled_canvas"] = canvas
+                else:
+                    logger.info("Stage 3: generating ad image (%d copy variant(s))...", len(copies))
+                    if len(copies) > 1:
+                        candidates = await generate_ad_variants(
+                            blueprint,
+                            brand_identity,
+                            existing_product_da=existing_product_da,
+                            job_group=job_group,
+                            image_style=style_dna.image_style,
+                            encoder=encoder,
+                        )
+                    else:
+                        candidates = [
+                            await generate_ad_image(
+                                blueprint,
+                                brand_identity,
+                                existing_product_da=existing_product_da,
+                                job_group=job_group,
+                                image_style=style_dna.image_style,
+                                encoder=encoder,
+                            )
+                        ]
 
-        # Stage 4: 가이드라인 적합성 평가 (이중 검증: Vision + 텍스트 직접)
-        logger.info("Stage 4: evaluating ad against guidelines...")
-        eval_result = await evaluate_ad(
-            generated_image=generated_image,
-            ad_copy=blueprint.ad_copy,   # ← 카피 텍스트를 직접 전달 (OCR 우회)
-            brand_identity=brand_identity,
-            guidelines=guidelines,
-        )
-        evaluation_history.append(eval_result)
-        logger.info(
-            "Evaluation score: %d/100 — %s",
-            eval_result.score,
-            "PASS" if eval_result.passed else "FAIL",
-        )
+            # Stage 4: 가이드라인 적합성 평가 (이중 검증: Vision + 텍스트 직접) — 변형은 동시에 평가
+            with _stage_timer(timings, "stage4", profiler, iteration):
+                logger.info("Stage 4: evaluating ad against guidelines...")
+                if len(candidates) > 1 and settings.eval_batch_size > 1 and not settings.eval_cascade:
+                    # 변형들을 가이드라인 프롬프트 하나로 묶어 평가 (실패 시 단건 폴백)
+                    evals = await evaluate_ads_batch(
+                        [(image, ad_copy) for (image, _), ad_copy in zip(candidates, copies)],
+                        brand_identity,
+                        guidelines,
+                    )
+                else:
+                    evals = await asyncio.gather(*(
+                        _evaluate(settings, image, ad_copy, brand_identity, guidelines)
+                        for (image, _), ad_copy in zip(candidates, copies)
+                    ))
 
-        # 최고 점수 이미지 보관
-        if eval_result.score > best_score:
-            best_score = eval_result.score
-            best_image = generated_image
-            best_bytes = image_bytes
-            best_eval = eval_result
-
-        if eval_result.passed:
-            logger.info("Passed on iteration %d", iteration)
-            return PipelineResult(
-                final_image=generated_image,
-                final_image_bytes=image_bytes,
-                style_dna=style_dna,
-                eval_result=eval_result,
-                iterations_used=iteration,
-                evaluation_history=evaluation_history,
+            # 점수 내림차순 순위 — 1위 변형이 이번 반복의 대표 결과
+            ranking = sorted(range(len(candidates)), key=lambda i: evals[i].score, reverse=True)
+            generated_image, image_bytes = candidates[ranking[0]]
+            eval_result = evals[ranking[0]]
+            encoding = generated_image.info.get("encoding", {})
+            logger.info(
+                "Encoded %s: %d bytes in %.1f ms (quality=%s, attempts=%s)",
+                encoding.get("format"), len(image_bytes), encoding.get("encode_ms", 0.0),
+                encoding.get("quality"), encoding.get("attempts"),
+            )
+            variants = (
+                [CopyVariant(copies[i], candidates[i][1], evals[i]) for i in ranking]
+                if len(copies) > 1 else []
+            )
+            if variants:
+                logger.info("Copy variant scores: %s", [v.eval_result.score for v in variants])
+            evaluation_history.append(eval_result)
+            logger.info(
+                "Evaluation score: %d/100 — %s (tier=%s)",
+                eval_result.score,
+                "PASS" if eval_result.passed else "FAIL",
+                eval_result.tier,
             )
 
+            # 최고 점수 이미지 보관
+            if eval_result.score > best_score:
+                best_score = eval_result.score
+                best_image = generated_image
+                best_bytes = image_bytes
+                best_eval = eval_result
+                best_variants = variants
+
+            if ad_index is not None:
+                metrics.observe(
+                    f"ad_index.score.{'adapted' if adapting else 'fresh'}", eval_result.score
+                )
+
+            if eval_result.passed:
+                logger.info("Passed on iteration %d", iteration)
+                if ad_index is not None:
+                    ad_index.add(
+                        campaign,
+                        style_dna,
+                        image_bytes,
+                        eval_result,
+                        canvas=generated_image.info.get("styled_canvas"),
+                        layout=generated_image.info.get("ad_layout"),
+                    )
+                return PipelineResult(
+                    final_image=generated_image,
+                    final_image_bytes=image_bytes,
+                    style_dna=style_dna,
+                    eval_result=eval_result,
+                    iterations_used=iteration,
+                    evaluation_history=evaluation_history,
+                    reused="adapted" if adapting else None,
+                    run_id=run_id,
+                    timings=timings,
+                    variants=variants,
+                    encoding=encoding,
+                )
+
+            logger.warning(
+                "Iteration %d failed (score=%d). Issues: %s",
+                iteration,
+                eval_result.score,
+                [i.item for i in eval_result.issues],
+            )
+        except DeadlineExceeded as exc:
+            if best_eval is None:
+                raise
+            logger.warning("Run deadline exceeded during %s on iteration %d", exc.stage, iteration)
+            deadline_exceeded = True
+            break
+        last_iteration_seconds = time.perf_counter() - iteration_started
+
+    # max_iterations 도달 또는 데드라인 초과: 최고 점수 이미지 반환 + 경고
+    if deadline_exceeded:
         logger.warning(
-            "Iteration %d failed (score=%d). Issues: %s",
-            iteration,
-            eval_result.score,
-            [i.item for i in eval_result.issues],
+            "Run deadline exceeded after %d iteration(s). Returning best result (score=%d).",
+            len(evaluation_history),
+            best_score,
+        )
+    else:
+        logger.warning(
+            "Max iterations (%d) reached without passing. "
+            "Returning best result (score=%d).",
+            settings.max_eval_iterations,
+            best_score,
         )
-
-    # max_iterations 도달: 최고 점수 이미지 반환 + 경고
-    logger.warning(
-        "Max iterations (%d) reached without passing. "
-        "Returning best result (score=%d).",
-        settings.max_eval_iterations,
-        best_score,
-    )
     return PipelineResult(
         final_image=best_image,
         final_image_bytes=best_bytes,
         style_dna=style_dna,
         eval_result=best_eval,
-        iterations_used=settings.max_eval_iterations,
+        iterations_used=len(evaluation_history),
         evaluation_history=evaluation_history,
+        run_id=run_id,
+        timings=timings,
+        variants=best_variants,
+        encoding=best_image.info.get("encoding", {}) if best_image is not None else {},
+        deadline_exceeded=deadline_exceeded,
     )
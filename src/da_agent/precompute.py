@@ -0,0 +1,408 @@
+"""
+Style DNA 오프라인 배치 사전 계산
+
+사용법:
+  uv run python -m da_agent.precompute ads.txt
+  uv run python -m da_agent.precompute ./ads/a.jpg ./ads/b.jpg --no-wait
+
+다음 날 클릭될 것으로 예상되는 광고 소재의 Stage 1 추출 요청을 배치 백엔드로 제출하고,
+결과를 Style DNA 캐시(STYLE_DNA_CACHE_DIR)에 채워 라이브 파이프라인이 캐시만 조회하도록 합니다.
+
+흐름: 요청 파일(JSONL) 작성 → 제출 → 폴링 → 수집(ingest)
+- 재개 가능: 작업 상태를 work_dir/state.json에 기록 — 재실행 시 이미 제출된 요청은
+  다시 제출하지 않고 기존 배치를 이어서 폴링합니다.
+- 부분 수집: 축(image/layout/copy)별 성공 결과를 보관하고, 실패한 축만 다음 실행에서
+  재제출합니다. 3개 축이 모두 모인 이미지부터 캐시에 기록됩니다.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from da_agent.agents.extractor.copy_style import build_copy_style_request, parse_copy_style
+from da_agent.agents.extractor.image_style import build_image_style_request, parse_image_style
+from da_agent.agents.extractor.layout_style import (
+    build_layout_style_request,
+    parse_layout_style,
+)
+from da_agent.config import get_settings
+from da_agent.models.style_dna import StyleDNA
+from da_agent.store.style_dna_cache import StyleDNACache, image_cache_key
+from da_agent.utils.http_client import create_openai_client
+
+logger = logging.getLogger(__name__)
+
+_CHAT_ENDPOINT = "/v1/chat/completions"
+_MAX_BATCH_REQUESTS = 50_000  # OpenAI Batch API 배치당 최대 요청 수
+
+# 축 이름 → (요청 본문 빌더, 응답 파서)
+_AXES = {
+    "image": (build_image_style_request, parse_image_style),
+    "layout": (build_layout_style_request, parse_layout_style),
+    "copy": (build_copy_style_request, parse_copy_style),
+}
+
+_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class BatchStatus:
+    state: str  # validating / in_progress / finalizing / completed / failed / expired / cancelled
+    completed: int = 0
+    failed: int = 0
+    total: int = 0
+
+    @property
+    def terminal(self) -> bool:
+        return self.state in _TERMINAL_STATES
+
+
+class BatchBackend(ABC):
+    """배치 제출 백엔드 — OpenAI Batch API 형식의 요청/결과 JSONL을 다룹니다."""
+
+    @abstractmethod
+    async def submit(self, request_file: Path) -> str:
+        """요청 파일을 제출하고 배치 ID를 반환합니다."""
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> BatchStatus:
+        """배치 진행 상태를 조회합니다."""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> list[dict]:
+        """완료(또는 만료·취소)된 배치의 결과·오류 라인을 반환합니다."""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API (files + batches, 24h completion window)."""
+
+    def __init__(self, client=None):
+        self.client = client or create_openai_client()
+
+    async def submit(self, request_file: Path) -> str:
+        uploaded = await self.client.files.create(
+            file=(request_file.name, request_file.read_bytes()),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=_CHAT_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return BatchStatus(
+            state=batch.status,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0,
+            total=counts.total if counts else 0,
+        )
+
+    async def results(self, batch_id: str) -> list[dict]:
+        # 만료·취소된 배치도 처리된 요청의 output_file은 남아 있음 → 부분 수집
+        batch = await self.client.batches.retrieve(batch_id)
+        lines: list[dict] = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            lines.extend(json.loads(line) for line in content.text.splitlines() if line.strip())
+        return lines
+
+
+Responder = Callable[[dict], Awaitable[str]]
+
+
+async def _chat_responder(body: dict) -> str:
+    client = create_openai_client()
+    response = await client.chat.completions.create(**body)
+    return response.choices[0].message.content
+
+
+class LocalBatchBackend(BatchBackend):
+    """배치 엔드포인트의 로컬 대역 — 테스트·오프라인 개발용.
+
+    제출된 요청을 폴링할 때마다 requests_per_poll개씩 responder로 처리합니다.
+    responder 미지정 시 일반 chat API로 요청을 하나씩 실행합니다 (배치 할인 없음).
+    배치는 프로세스 메모리에만 있으므로 재개(--no-wait 후 재실행)를 지원하지 않습니다.
+    """
+
+    def __init__(
+        self,
+        responder: Responder | None = None,
+        requests_per_poll: int | None = None,
+    ):
+        self.responder = responder or _chat_responder
+        self.requests_per_poll = requests_per_poll
+        self._batches: dict[str, dict] = {}
+
+    async def submit(self, request_file: Path) -> str:
+        requests = [
+            json.loads(line)
+            for line in request_file.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        self._batches[batch_id] = {"pending": requests, "lines": [], "failed": 0}
+        return batch_id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = self._batches[batch_id]
+        limit = self.requests_per_poll or len(batch["pending"])
+        for request in batch["pending"][:limit]:
+            batch["lines"].append(await self._run(request, batch))
+        del batch["pending"][:limit]
+
+        done = len(batch["lines"])
+        return BatchStatus(
+            state="in_progress" if batch["pending"] else "completed",
+            completed=done - batch["failed"],
+            failed=batch["failed"],
+            total=done + len(batch["pending"]),
+        )
+
+    async def results(self, batch_id: str) -> list[dict]:
+        return list(self._batches[batch_id]["lines"])
+
+    async def _run(self, request: dict, batch: dict) -> dict:
+        try:
+            content = await self.responder(request["body"])
+        except Exception as e:  # noqa: BLE001 — 요청 단위 오류는 결과 라인으로 기록
+            batch["failed"] += 1
+            return {
+                "custom_id": request["custom_id"],
+                "response": None,
+                "error": {"message": str(e)},
+            }
+        return {
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": content}}]},
+            },
+            "error": None,
+        }
+
+
+@dataclass
+class PrecomputeReport:
+    total_images: int
+    already_cached: int = 0
+    submitted_requests: int = 0
+    ingested_images: int = 0
+    failed_requests: int = 0
+    pending_batches: int = 0
+
+
+def _load_state(work_dir: Path) -> dict:
+    path = work_dir / "state.json"
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"batches": {}, "partial": {}}
+
+
+def _save_state(work_dir: Path, state: dict) -> None:
+    tmp = work_dir / "state.json.tmp"
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(work_dir / "state.json")
+
+
+def _response_content(line: dict) -> str | None:
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        return None
+    return response["body"]["choices"][0]["message"]["content"]
+
+
+def _ingest(lines: list[dict], state: dict, cache: StyleDNACache, report: PrecomputeReport) -> None:
+    """결과 라인을 축별로 보관하고, 3개 축이 모인 이미지를 캐시에 기록합니다."""
+    touched: set[str] = set()
+    for line in lines:
+        key, axis = line["custom_id"].rsplit(":", 1)
+        content = _response_content(line)
+        if content is None:
+            report.failed_requests += 1
+            continue
+        try:
+            _AXES[axis][1](content)
+        except (ValueError, ValidationError):
+            report.failed_requests += 1
+            continue
+        state["partial"].setdefault(key, {})[axis] = content
+        touched.add(key)
+
+    for key in touched:
+        parts = state["partial"][key]
+        if set(parts) != set(_AXES):
+            continue
+        cache.put(
+            key,
+            StyleDNA(
+                image_style=parse_image_style(parts["image"]),
+                layout_style=parse_layout_style(parts["layout"]),
+                copy_style=parse_copy_style(parts["copy"]),
+            ),
+        )
+        del state["partial"][key]
+        report.ingested_images += 1
+
+
+async def precompute_style_dna(
+    images: list[str],
+    backend: BatchBackend,
+    cache: StyleDNACache,
+    work_dir: str | Path,
+    *,
+    wait: bool = True,
+    poll_interval: float = 60.0,
+    max_batch_requests: int = _MAX_BATCH_REQUESTS,
+) -> PrecomputeReport:
+    """광고 이미지 목록의 Style DNA를 배치 백엔드로 사전 계산해 캐시에 채웁니다.
+
+    Args:
+        images: 광고 이미지 경로/URL 목록
+        backend: 배치 제출 백엔드 (OpenAIBatchBackend / LocalBatchBackend)
+        cache: 결과를 기록할 Style DNA 캐시
+        work_dir: 요청 파일과 재개용 상태(state.json)를 저장할 디렉터리
+        wait: False면 제출 및 1회 상태 확인 후 반환 (다음 실행에서 이어서 수집)
+        poll_interval: 폴링 간격 (초)
+        max_batch_requests: 배치당 최대 요청 수
+
+    Returns:
+        PrecomputeReport
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    state = _load_state(work_dir)
+    report = PrecomputeReport(total_images=len(images))
+
+    # 1. 제출 대상 선정 — 캐시 히트, 이미 수집된 축, 진행 중인 배치의 요청은 제외
+    in_flight = {
+        custom_id
+        for batch in state["batches"].values()
+        if not batch["ingested"]
+        for custom_id in batch["custom_ids"]
+    }
+    requests: list[dict] = []
+    for path in dict.fromkeys(images):
+        key = image_cache_key(path)
+        if key in cache:
+            report.already_cached += 1
+            continue
+        done_axes = state["partial"].get(key, {})
+        for axis, (build_request, _) in _AXES.items():
+            custom_id = f"{key}:{axis}"
+            if axis in done_axes or custom_id in in_flight:
+                continue
+            requests.append({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": _CHAT_ENDPOINT,
+                "body": build_request(path),
+            })
+
+    # 2. 청크별 요청 파일 작성 → 제출 → 즉시 상태 저장 (중단돼도 중복 제출 없음)
+    for start in range(0, len(requests), max_batch_requests):
+        chunk = requests[start:start + max_batch_requests]
+        request_file = work_dir / f"requests_{uuid.uuid4().hex[:12]}.jsonl"
+        request_file.write_text(
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk),
+            encoding="utf-8",
+        )
+        batch_id = await backend.submit(request_file)
+        state["batches"][batch_id] = {
+            "request_file": str(request_file),
+            "custom_ids": [r["custom_id"] for r in chunk],
+            "ingested": False,
+        }
+        _save_state(work_dir, state)
+        report.submitted_requests += len(chunk)
+        logger.info("Submitted batch %s (%d requests)", batch_id, len(chunk))
+
+    # 3. 폴링 → 종료된 배치부터 수집
+    while True:
+        open_batches = [bid for bid, b in state["batches"].items() if not b["ingested"]]
+        for batch_id in open_batches:
+            status = await backend.status(batch_id)
+            logger.info(
+                "Batch %s: %s (%d/%d done, %d failed)",
+                batch_id, status.state, status.completed, status.total, status.failed,
+            )
+            if not status.terminal:
+                continue
+            _ingest(await backend.results(batch_id), state, cache, report)
+            state["batches"][batch_id]["ingested"] = True
+            _save_state(work_dir, state)
+
+        report.pending_batches = sum(not b["ingested"] for b in state["batches"].values())
+        if not wait or report.pending_batches == 0:
+            return report
+        await asyncio.sleep(poll_interval)
+
+
+def _read_inputs(inputs: list[str]) -> list[str]:
+    """인자 목록을 이미지 경로/URL 목록으로 펼칩니다 (.txt는 한 줄에 하나씩)."""
+    images: list[str] = []
+    for item in inputs:
+        if item.endswith(".txt"):
+            lines = Path(item).read_text(encoding="utf-8").splitlines()
+            images.extend(line.strip() for line in lines if line.strip())
+        else:
+            images.append(item)
+    return images
+
+
+def main() -> None:
+    from da_agent.utils.http_client import configure_ssl_globally
+
+    configure_ssl_globally()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    parser = argparse.ArgumentParser(description="Style DNA 오프라인 배치 사전 계산")
+    parser.add_argument("inputs", nargs="+", help="광고 이미지 경로/URL 또는 목록 .txt 파일")
+    parser.add_argument("--work-dir", default=".cache/precompute", help="요청 파일·재개 상태 디렉터리")
+    parser.add_argument("--cache-dir", default=None, help="Style DNA 캐시 (기본: STYLE_DNA_CACHE_DIR)")
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai")
+    parser.add_argument("--poll-interval", type=float, default=60.0)
+    parser.add_argument("--no-wait", action="store_true", help="제출만 하고 종료 (재실행 시 수집 재개)")
+    args = parser.parse_args()
+
+    if args.backend == "local" and args.no_wait:
+        parser.error("--no-wait는 local 백엔드와 함께 쓸 수 없습니다 (배치가 프로세스 메모리에만 있음).")
+
+    cache_dir = args.cache_dir or get_settings().style_dna_cache_dir
+    if not cache_dir:
+        parser.error("--cache-dir 또는 STYLE_DNA_CACHE_DIR 설정이 필요합니다.")
+
+    backend = OpenAIBatchBackend() if args.backend == "openai" else LocalBatchBackend()
+    report = asyncio.run(
+        precompute_style_dna(
+            _read_inputs(args.inputs),
+            backend,
+            StyleDNACache(cache_dir),
+            args.work_dir,
+            wait=not args.no_wait,
+            poll_interval=args.poll_interval,
+        )
+    )
+    print(
+        f"✓ 이미지 {report.total_images}개: 캐시 히트 {report.already_cached}, "
+        f"요청 제출 {report.submitted_requests}, 수집 {report.ingested_images}, "
+        f"실패 {report.failed_requests}, 대기 중 배치 {report.pending_batches}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from .ad_index import AdIndex, campaign_key, embed_style_dna, get_ad_index
+from .output_sink import OutputSink, get_output_sink
+from .profile_store import ProfileStore, get_profile_store
+from .style_dna_cache import StyleDNACache, get_style_dna_cache, image_cache_key
+
+__all__ = [
+    "StyleDNACache",
+    "get_style_dna_cache",
+    "image_cache_key",
+    "ProfileStore",
+    "get_profile_store",
+    "AdIndex",
+    "get_ad_index",
+    "campaign_key",
+    "embed_style_dna",
+    "OutputSink",
+    "get_output_sink",
+]
@@ -0,0 +1,300 @@
+"""
+유사 사용자 광고 재사용 인덱스 — Style DNA 임베딩 → 평가 통과 광고
+
+캠페인(제품·브랜드·가이드라인 조합)별로 평가를 통과한 PipelineResult를 보관하고,
+새 사용자의 Style DNA가 충분히 가까우면 Stage 2–4를 건너뛰고 그대로 제공(serve)하거나
+스타일 변환 캔버스만 재사용해 카피를 다시 합성(adapt)합니다.
+
+- 임베딩: 팔레트 RGB 히스토그램 + 스타일 속성·키워드의 부호 있는 feature hashing (L2 정규화)
+- 근사 최근접 탐색: 무작위 초평면 LSH (여러 테이블 + 1비트 multi-probe) 후 코사인 거리로 재정렬
+- 제거: 캠페인 종료(end_campaign), TTL 만료, 캠페인당 최대 개수 초과 시 오래된 항목부터
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from da_agent.config import get_settings
+from da_agent.models.ad_layout import AdLayout
+from da_agent.models.evaluation import EvaluationResult
+from da_agent.models.style_dna import StyleDNA
+from da_agent.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_PALETTE_BINS = 3            # 채널당 구간 수 → 27차원 색상 히스토그램
+_HASH_DIM = 101              # feature hashing 차원
+EMBEDDING_DIM = _PALETTE_BINS ** 3 + _HASH_DIM
+
+
+def _hash_feature(token: str) -> tuple[int, float]:
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % _HASH_DIM, 1.0 if (value >> 63) else -1.0
+
+
+def _hex_to_rgb(value: str) -> tuple[int, int, int] | None:
+    value = value.strip().lstrip("#")
+    if len(value) != 6:
+        return None
+    try:
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return None
+
+
+def embed_style_dna(dna: StyleDNA) -> np.ndarray:
+    """Style DNA를 고정 차원 단위 벡터로 임베딩합니다."""
+    palette = np.zeros(_PALETTE_BINS ** 3, dtype=np.float32)
+    for color in dna.image_style.color_palette:
+        rgb = _hex_to_rgb(color)
+        if rgb is None:
+            continue
+        r, g, b = (min(c * _PALETTE_BINS // 256, _PALETTE_BINS - 1) for c in rgb)
+        palette[(r * _PALETTE_BINS + g) * _PALETTE_BINS + b] += 1.0
+    if palette.any():
+        palette /= np.linalg.norm(palette)
+
+    hashed = np.zeros(_HASH_DIM, dtype=np.float32)
+    image, layout, copy = dna.image_style, dna.layout_style, dna.copy_style
+    weighted_tokens = [
+        (f"mood:{image.mood}", 2.0),
+        (f"lighting:{image.lighting}", 1.0),
+        (f"layout:{layout.type}", 1.0),
+        (f"text_position:{layout.text_position}", 1.0),
+        (f"whitespace:{layout.whitespace}", 1.0),
+        (f"tone:{copy.tone}", 2.0),
+        (f"length:{copy.length}", 1.0),
+        (f"emphasis:{copy.emphasis_type}", 1.0),
+    ]
+    weighted_tokens += [(f"aesthetic:{a}", 1.0) for a in image.aesthetic]
+    weighted_tokens += [(f"keyword:{k}", 0.5) for k in copy.keywords]
+    for token, weight in weighted_tokens:
+        index, sign = _hash_feature(token.strip().lower())
+        hashed[index] += sign * weight
+    if hashed.any():
+        hashed /= np.linalg.norm(hashed)
+
+    vector = np.concatenate([palette, hashed])
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def campaign_key(
+    product_info: dict,
+    brand_identity: dict,
+    guidelines: dict,
+    base_da_key: str,
+) -> str:
+    """캠페인 키 — 제품·브랜드·가이드라인 입력과 기존 제품 DA 콘텐츠 키의 정규화 JSON sha256.
+
+    base_da_key는 existing_product_da의 image_cache_key — 같은 제품이라도 기반 소재가 다르면
+    스타일 캔버스가 달라지므로 다른 캠페인으로 취급합니다.
+    """
+    canonical = json.dumps(
+        {
+            "product": product_info,
+            "brand": brand_identity,
+            "guidelines": guidelines,
+            "base_da": base_da_key,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class AdIndexEntry:
+    vector: np.ndarray
+    image_bytes: bytes
+    eval_result: EvaluationResult
+    canvas_bytes: bytes | None
+    layout: AdLayout | None
+    created_at: float
+
+    def canvas(self) -> Image.Image | None:
+        """재합성용 스타일 변환 캔버스를 디코드합니다 (없으면 None)."""
+        if self.canvas_bytes is None:
+            return None
+        return Image.open(io.BytesIO(self.canvas_bytes)).convert("RGB")
+
+
+@dataclass
+class AdMatch:
+    kind: str             # "served" | "adapted"
+    entry: AdIndexEntry
+    distance: float
+
+
+class _CampaignIndex:
+    def __init__(self, planes: np.ndarray):
+        self.planes = planes                      # (tables, bits, dim)
+        self.entries: list[AdIndexEntry] = []
+        self.buckets: list[dict[int, list[int]]] = [{} for _ in range(planes.shape[0])]
+
+    def _codes(self, vector: np.ndarray) -> list[int]:
+        bits = (self.planes @ vector) > 0         # (tables, bits)
+        weights = 1 << np.arange(bits.shape[1])
+        return [int(code) for code in (bits * weights).sum(axis=1)]
+
+    def add(self, entry: AdIndexEntry) -> None:
+        position = len(self.entries)
+        self.entries.append(entry)
+        for table, code in enumerate(self._codes(entry.vector)):
+            self.buckets[table].setdefault(code, []).append(position)
+
+    def rebuild(self, entries: list[AdIndexEntry]) -> None:
+        self.entries = []
+        self.buckets = [{} for _ in range(self.planes.shape[0])]
+        for entry in entries:
+            self.add(entry)
+
+    def candidates(self, vector: np.ndarray) -> set[int]:
+        n_bits = self.planes.shape[1]
+        found: set[int] = set()
+        for table, code in enumerate(self._codes(vector)):
+            bucket = self.buckets[table]
+            for probe in [code] + [code ^ (1 << b) for b in range(n_bits)]:
+                found.update(bucket.get(probe, ()))
+        return found
+
+
+class AdIndex:
+    """캠페인별 평가 통과 광고의 근사 최근접 인덱스 (프로세스 메모리)."""
+
+    def __init__(
+        self,
+        serve_distance: float = 0.05,
+        adapt_distance: float = 0.15,
+        ttl_seconds: float = 72 * 3600,
+        max_per_campaign: int = 1000,
+        n_tables: int = 6,
+        n_bits: int = 6,
+        seed: int = 0,
+    ):
+        self.serve_distance = serve_distance
+        self.adapt_distance = adapt_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_per_campaign = max_per_campaign
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_tables, n_bits, EMBEDDING_DIM)).astype(np.float32)
+        self._campaigns: dict[str, _CampaignIndex] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self, index: _CampaignIndex, now: float, reserve: int = 0) -> None:
+        entries = [e for e in index.entries if now - e.created_at < self.ttl_seconds]
+        overflow = len(entries) + reserve - self.max_per_campaign
+        if overflow > 0:
+            entries = entries[overflow:]          # 오래된 항목부터 제거
+        if len(entries) != len(index.entries):
+            metrics.increment("ad_index.evicted", len(index.entries) - len(entries))
+            index.rebuild(entries)
+
+    def lookup(self, campaign: str, dna: StyleDNA) -> AdMatch | None:
+        """가장 가까운 통과 광고를 찾아 serve / adapt 판정과 함께 반환합니다."""
+        metrics.increment("ad_index.lookups")
+        vector = embed_style_dna(dna)
+        with self._lock:
+            index = self._campaigns.get(campaign)
+            best: tuple[float, AdIndexEntry] | None = None
+            if index is not None:
+                self._evict(index, time.time())
+                for position in index.candidates(vector):
+                    entry = index.entries[position]
+                    distance = 1.0 - float(entry.vector @ vector)
+                    if best is None or distance < best[0]:
+                        best = (distance, entry)
+
+        if best is None or best[0] > self.adapt_distance:
+            metrics.increment("ad_index.misses")
+            return None
+        distance, entry = best
+        if distance <= self.serve_distance:
+            kind = "served"
+        elif entry.canvas_bytes is not None and entry.layout is not None:
+            kind = "adapted"
+        else:
+            metrics.increment("ad_index.misses")
+            return None
+        metrics.increment(f"ad_index.{kind}")
+        metrics.observe("ad_index.match_distance", distance)
+        logger.info("Ad index %s (distance=%.3f, campaign=%s)", kind, distance, campaign[:12])
+        return AdMatch(kind=kind, entry=entry, distance=distance)
+
+    def add(
+        self,
+        campaign: str,
+        dna: StyleDNA,
+        image_bytes: bytes,
+        eval_result: EvaluationResult,
+        canvas: Image.Image | None = None,
+        layout: AdLayout | None = None,
+    ) -> None:
+        """평가를 통과한 광고를 캠페인 인덱스에 추가합니다."""
+        canvas_bytes = None
+        if canvas is not None:
+            buffer = io.BytesIO()
+            canvas.convert("RGB").save(buffer, format="PNG")
+            canvas_bytes = buffer.getvalue()
+        entry = AdIndexEntry(
+            vector=embed_style_dna(dna),
+            image_bytes=image_bytes,
+            eval_result=eval_result,
+            canvas_bytes=canvas_bytes,
+            layout=layout,
+            created_at=time.time(),
+        )
+        with self._lock:
+            index = self._campaigns.setdefault(campaign, _CampaignIndex(self._planes))
+            self._evict(index, entry.created_at, reserve=1)
+            index.add(entry)
+
+    def end_campaign(self, campaign: str) -> int:
+        """캠페인 종료 — 해당 캠페인의 모든 항목을 제거하고 제거 개수를 반환합니다."""
+        with self._lock:
+            index = self._campaigns.pop(campaign, None)
+        removed = len(index.entries) if index else 0
+        metrics.increment("ad_index.evicted", removed)
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(index.entries) for index in self._campaigns.values())
+
+    @staticmethod
+    def stats() -> dict[str, float]:
+        """재사용 적중률과 재사용 종류별 평균 평가 점수를 반환합니다."""
+        snap = metrics.snapshot()
+        counters, observations = snap["counters"], snap["observations"]
+        lookups = counters.get("ad_index.lookups", 0)
+        hits = counters.get("ad_index.served", 0) + counters.get("ad_index.adapted", 0)
+        stats = {"lookups": lookups, "hit_rate": hits / lookups if lookups else 0.0}
+        for kind in ("fresh", "served", "adapted"):
+            observed = observations.get(f"ad_index.score.{kind}")
+            if observed:
+                stats[f"mean_score_{kind}"] = observed["mean"]
+        return stats
+
+
+@lru_cache
+def get_ad_index() -> AdIndex | None:
+    """설정된 재사용 인덱스를 반환합니다 (AD_REUSE_ENABLED=false면 None)."""
+    settings = get_settings()
+    if not settings.ad_reuse_enabled:
+        return None
+    return AdIndex(
+        serve_distance=settings.ad_reuse_serve_distance,
+        adapt_distance=settings.ad_reuse_adapt_distance,
+        ttl_seconds=settings.ad_reuse_ttl_hours * 3600,
+        max_per_campaign=settings.ad_reuse_max_per_campaign,
+    )
@@ -0,0 +1,133 @@
+"""
+클릭 광고 근접 중복 인덱스 — 지각 해시 → 대표(canonical) Style DNA 캐시 키
+
+같은 광고 소재의 리사이즈·재압축본은 URL·바이트 해시가 달라 Style DNA 캐시를 빗나갑니다.
+pHash/dHash 지문으로 이미 추출한 소재를 찾아 그 캐시 키로 연결합니다.
+
+- 후보 검색: pHash 64비트를 8비트 밴드 8개로 나눈 정확 일치 버킷 — 해밍 거리 ≤ 7이면
+  비둘기집 원리로 최소 한 밴드가 일치하므로 누락 없음
+- 판정: pHash·dHash 해밍 거리가 모두 임계값 이하
+- 영속화: STYLE_DNA_CACHE_DIR/near_duplicates.jsonl 추가 기록 (프로세스 재시작 후 재적재)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from da_agent.config import get_settings
+from da_agent.utils.image_hash import ImageFingerprint
+
+logger = logging.getLogger(__name__)
+
+_BANDS = 8
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+MAX_INDEXED_DISTANCE = _BANDS - 1
+
+_DHASH_DISTANCE_MARGIN = 4   # dHash는 pHash보다 재압축 잡음에 민감 — 임계값에 여유
+
+
+def is_near_duplicate(a: ImageFingerprint, b: ImageFingerprint, max_distance: int) -> bool:
+    p, d = a.distance(b)
+    return p <= max_distance and d <= max_distance + _DHASH_DISTANCE_MARGIN
+
+
+def group_near_duplicates(
+    fingerprints: list[ImageFingerprint | None],
+    max_distance: int,
+) -> list[int]:
+    """각 입력이 속한 그룹의 대표 인덱스(그룹 첫 입력)를 반환합니다. 지문이 없으면 자기 자신."""
+    representatives: list[int] = []
+    groups: list[int] = []
+    for i, fp in enumerate(fingerprints):
+        owner = i
+        if fp is not None:
+            for rep in representatives:
+                if is_near_duplicate(fp, fingerprints[rep], max_distance):
+                    owner = rep
+                    break
+            else:
+                representatives.append(i)
+        groups.append(owner)
+    return groups
+
+
+class NearDuplicateIndex:
+    """지문 → Style DNA 캐시 키 근접 중복 인덱스 (스레드 안전)."""
+
+    def __init__(self, max_distance: int = 6, path: str | Path | None = None):
+        if max_distance > MAX_INDEXED_DISTANCE:
+            raise ValueError(f"max_distance must be <= {MAX_INDEXED_DISTANCE}")
+        self.max_distance = max_distance
+        self.path = Path(path) if path else None
+        self._entries: list[tuple[ImageFingerprint, str]] = []
+        self._buckets: dict[tuple[int, int], list[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    @staticmethod
+    def _bands(fp: ImageFingerprint):
+        for band in range(_BANDS):
+            yield band, (fp.phash >> (band * _BAND_BITS)) & _BAND_MASK
+
+    def _insert(self, fp: ImageFingerprint, key: str) -> None:
+        index = len(self._entries)
+        self._entries.append((fp, key))
+        for bucket in self._bands(fp):
+            self._buckets[bucket].append(index)
+
+    def _load(self) -> None:
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                fp = ImageFingerprint(int(row["phash"], 16), int(row["dhash"], 16))
+                self._insert(fp, row["key"])
+        logger.info("Near-duplicate index loaded: %d entries", len(self._entries))
+
+    def lookup(self, fp: ImageFingerprint) -> str | None:
+        """가장 가까운 근접 중복의 캐시 키 (없으면 None)."""
+        with self._lock:
+            candidates = {i for bucket in self._bands(fp) for i in self._buckets.get(bucket, ())}
+            best: tuple[int, int, str] | None = None
+            for i in candidates:
+                other, key = self._entries[i]
+                if is_near_duplicate(fp, other, self.max_distance):
+                    p, d = fp.distance(other)
+                    if best is None or (p, d) < best[:2]:
+                        best = (p, d, key)
+        return best[2] if best is not None else None
+
+    def add(self, fp: ImageFingerprint, key: str) -> None:
+        """지문을 등록합니다 — 이미 근접 중복이 있으면 대표를 유지하고 무시."""
+        if self.lookup(fp) is not None:
+            return
+        with self._lock:
+            self._insert(fp, key)
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                row = {"phash": f"{fp.phash:016x}", "dhash": f"{fp.dhash:016x}", "key": key}
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(row) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache
+def get_near_duplicate_index() -> NearDuplicateIndex | None:
+    """CLICK_DEDUPE_ENABLED일 때의 근접 중복 인덱스 (Style DNA 캐시 디렉터리에 영속화)."""
+    settings = get_settings()
+    if not settings.click_dedupe_enabled:
+        return None
+    path = (
+        Path(settings.style_dna_cache_dir) / "near_duplicates.jsonl"
+        if settings.style_dna_cache_dir else None
+    )
+    return NearDuplicateIndex(settings.click_dedupe_distance, path)
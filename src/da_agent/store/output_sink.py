@@ -0,0 +1,237 @@
+"""
+최종 광고 출력 싱크 — 콘텐츠 주소 저장 + 매니페스트
+
+최종 이미지 바이트를 sha256 기반 샤딩 경로(ab/cd/<sha256>.<ext>)에 저장하고, 광고마다
+매니페스트(JSONL) 한 줄(점수·스테이지 소요 시간·입력 해시)을 추가합니다. 기록 직후
+PipelineResult의 이미지·바이트·평가 이력을 해제하므로 배치 실행에서도 메모리가
+작업 수와 무관하게 일정합니다.
+
+백엔드:
+- LocalOutputBackend: 로컬 디렉터리 (원자적 쓰기, 동일 콘텐츠는 재기록 생략)
+- S3OutputBackend: S3 호환 오브젝트 스토리지 (boto3 호환 클라이언트, 선택 의존성)
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from da_agent.config import get_settings
+from da_agent.store.style_dna_cache import image_cache_key
+
+if TYPE_CHECKING:
+    from da_agent.pipeline import PipelineResult
+
+_FORMATS = {
+    b"\x89PNG": ("png", "image/png"),
+    b"\xff\xd8\xff": ("jpg", "image/jpeg"),
+    b"RIFF": ("webp", "image/webp"),
+}
+
+
+def _sniff_format(data: bytes) -> tuple[str, str]:
+    for magic, fmt in _FORMATS.items():
+        if data.startswith(magic):
+            return fmt
+    return "bin", "application/octet-stream"
+
+
+def content_key(data: bytes) -> tuple[str, str]:
+    """(sha256, 샤딩 키) — 키 예: ab/cd/abcd….png"""
+    digest = hashlib.sha256(data).hexdigest()
+    ext, _ = _sniff_format(data)
+    return digest, f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+class OutputBackend(ABC):
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        """객체를 저장하고 URI를 반환합니다 (동기 — 스레드에서 호출됨)."""
+
+
+class LocalOutputBackend(OutputBackend):
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = self.root / key
+        if not path.exists():  # 콘텐츠 주소 — 같은 키면 같은 바이트
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return str(path)
+
+
+class S3OutputBackend(OutputBackend):
+    """S3 호환 스토리지 백엔드 — put_object / head_object를 제공하는 boto3 호환 클라이언트."""
+
+    def __init__(self, bucket: str, client, prefix: str = ""):
+        self.bucket = bucket
+        self.client = client
+        self.prefix = prefix.strip("/")
+
+    @classmethod
+    def from_settings(cls, settings) -> "S3OutputBackend":
+        try:
+            import boto3
+        except ImportError as exc:  # 선택 의존성
+            raise ImportError("OUTPUT_BACKEND=s3 requires boto3 (pip install boto3)") from exc
+        client = boto3.client("s3", endpoint_url=settings.output_s3_endpoint_url or None)
+        return cls(settings.output_s3_bucket, client, prefix=settings.output_s3_prefix)
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        object_key = f"{self.prefix}/{key}" if self.prefix else key
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=object_key)
+        except Exception:  # noqa: BLE001 — 미존재(404)는 클라이언트마다 예외 타입이 다름
+            self.client.put_object(
+                Bucket=self.bucket, Key=object_key, Body=data, ContentType=content_type
+            )
+        return f"s3://{self.bucket}/{object_key}"
+
+
+def input_hashes(
+    user_clicked_ad_image: str | list[str],
+    existing_product_da: str,
+    product_info: dict,
+    brand_identity: dict,
+    guidelines: dict,
+) -> dict:
+    """매니페스트용 입력 해시 (이미지: Style DNA 캐시와 같은 키, dict: 정규화 JSON sha256)."""
+    def _json_hash(value: dict) -> str:
+        canonical = json.dumps(value, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    clicked = (
+        [user_clicked_ad_image] if isinstance(user_clicked_ad_image, str) else user_clicked_ad_image
+    )
+    return {
+        "clicked_ads": [image_cache_key(url) for url in clicked],
+        "existing_product_da": image_cache_key(existing_product_da),
+        "product_info": _json_hash(product_info),
+        "brand_identity": _json_hash(brand_identity),
+        "guidelines": _json_hash(guidelines),
+    }
+
+
+@dataclass
+class OutputRecord:
+    uri: str
+    sha256: str
+    size: int
+
+
+class OutputSink:
+    """최종 광고를 백엔드에 저장하고 매니페스트에 한 줄씩 추가합니다."""
+
+    def __init__(self, backend: OutputBackend, manifest_path: str | Path):
+        self.backend = backend
+        self.manifest_path = Path(manifest_path)
+        self._lock = threading.Lock()
+
+    def _append_manifest(self, row: dict) -> None:
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.manifest_path.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _put(self, data: bytes) -> OutputRecord:
+        digest, key = content_key(data)
+        _, content_type = _sniff_format(data)
+        uri = self.backend.put(key, data, content_type)
+        return OutputRecord(uri=uri, sha256=digest, size=len(data))
+
+    def _write_sync(self, data: bytes, row: dict, variants: list) -> OutputRecord:
+        record = self._put(data)
+        variant_rows = []
+        for rank, variant in enumerate(variants, start=1):   # 카피 변형 (점수 내림차순)
+            stored = self._put(variant.image_bytes)
+            variant.output_uri = stored.uri
+            variant_rows.append({
+                "rank": rank,
+                "uri": stored.uri,
+                "score": variant.eval_result.score,
+                "passed": variant.eval_result.passed,
+                "ad_copy": variant.ad_copy.model_dump(),
+            })
+        if variant_rows:
+            row = {**row, "variants": variant_rows}
+        self._append_manifest(
+            {**row, "uri": record.uri, "sha256": record.sha256, "bytes": record.size}
+        )
+        return record
+
+    async def write(
+        self,
+        result: PipelineResult,
+        inputs: dict | None = None,
+        user_id: str | None = None,
+        release: bool = True,
+    ) -> OutputRecord:
+        """결과를 저장·기록하고, release=True면 결과의 이미지·바이트·이력을 해제합니다.
+
+        카피 변형이 있으면 변형별 이미지도 저장하고 매니페스트 행에 순위·점수·URI를 기록합니다.
+
+        Args:
+            result: 파이프라인 결과
+            inputs: input_hashes() 결과 (매니페스트 입력 해시)
+            user_id: 매니페스트에 기록할 사용자 ID
+            release: 기록 후 메모리 해제 여부
+        """
+        ev = result.eval_result
+        row = {
+            "run_id": result.run_id,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "user_id": user_id,
+            "score": ev.score,
+            "passed": ev.passed,
+            "tier": ev.tier,
+            "category_scores": ev.category_scores.model_dump(),
+            "iterations_used": result.iterations_used,
+            "history_scores": [h.score for h in result.evaluation_history],
+            "reused": result.reused,
+            "timings": {k: round(v, 4) for k, v in result.timings.items()},
+            "encoding": result.encoding,
+            "deadline_exceeded": result.deadline_exceeded,
+            "inputs": inputs or {},
+        }
+        record = await asyncio.to_thread(
+            self._write_sync, result.final_image_bytes, row, result.variants
+        )
+        result.output_uri = record.uri
+
+        if release:
+            if result.final_image is not None:
+                result.final_image.close()
+            result.final_image = None
+            result.final_image_bytes = None
+            result.evaluation_history = []
+            for variant in result.variants:
+                variant.image_bytes = None
+        return record
+
+
+@lru_cache
+def get_output_sink() -> OutputSink:
+    """설정 기반 출력 싱크 (OUTPUT_BACKEND=local|s3, OUTPUT_DIR, OUTPUT_MANIFEST)."""
+    settings = get_settings()
+    if settings.output_backend == "s3":
+        backend: OutputBackend = S3OutputBackend.from_settings(settings)
+    elif settings.output_backend == "local":
+        backend = LocalOutputBackend(settings.output_dir)
+    else:
+        raise ValueError(f"Unknown output backend: {settings.output_backend!r}")
+    manifest = settings.output_manifest or str(Path(settings.output_dir) / "manifest.jsonl")
+    return OutputSink(backend, manifest)
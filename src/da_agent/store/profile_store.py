@@ -0,0 +1,384 @@
+"""
+사용자별 Style DNA 프로필 저장소 — 클릭 1건씩 증분 갱신되는 고정 크기 요약
+
+클릭 이력 전체를 매번 재추출·병합하는 대신, 사용자별 요약을 컬럼형 numpy 배열
+(메모리 매핑)로 유지합니다. 사용자 수가 수백만이어도 갱신·조회는 해당 행만 읽고 씁니다.
+
+속성별 슬롯 테이블 (사용자 1명 = 1행, 속성당 K개 슬롯):
+  - <name>.ids.npy  int32   (N, K) — 값 ID (-1 = 빈 슬롯)
+  - <name>.w.npy    float32 (N, K) — 가중치
+가중치 규칙:
+  - 팔레트 / 미학 키워드 / 카피 키워드: 가중 카운트 (감쇠 없음, Space-Saving 교체)
+  - 분위기·조명·톤·레이아웃 등 스타일 속성: 클릭마다 profile_decay 배로 감쇠 (최근 선호 우선)
+요약(summary)은 속성별 상위 값만 사용하므로 Architect 프롬프트 크기가 클릭 수와 무관합니다.
+
+반영한 클릭은 (사용자 행, 클릭 해시)의 64비트 키로 seen.u64에 append해 전부 기억합니다 — 클릭 이력
+전체를 넘기는 호출자도 새 클릭만 추출·반영되고, 같은 클릭은 두 번 반영되지 않습니다.
+
+단일 프로세스 writer를 가정합니다. 변경 사항은 flush() 시 디스크에 반영됩니다.
+공개 메서드는 하나의 락으로 직렬화되므로 여러 스레드에서 호출할 수 있습니다 — 이벤트 루프에서는
+디스크 I/O(flush, 용량 확장 시 컬럼 복사)가 루프를 막지 않도록 asyncio.to_thread로 apply()를 호출하세요.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from da_agent.config import get_settings
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+
+# 속성 이름 → (슬롯 수, 최근성 감쇠 여부)
+_SLOT_COLUMNS: dict[str, tuple[int, bool]] = {
+    "palette": (8, False),
+    "aesthetic": (8, False),
+    "keywords": (8, False),
+    "mood": (4, True),
+    "lighting": (4, True),
+    "tone": (4, True),
+    "length": (2, True),
+    "emphasis_type": (2, True),
+    "layout_type": (2, True),
+    "text_position": (2, True),
+    "product_position": (2, True),
+    "visual_flow": (2, True),
+    "whitespace": (2, True),
+    "focal_point": (2, True),
+}
+
+# 요약 시 속성별 최대 출력 개수 — 프롬프트 크기 상한
+_PALETTE_TOP = 5
+_AESTHETIC_TOP = 6
+_KEYWORDS_TOP = 8
+
+_SEEN_MERGE_SIZE = 65536   # 최근 반영 키 집합이 이 크기를 넘으면 정렬 배열에 병합
+_INITIAL_CAPACITY = 1024
+
+
+def _color_id(color: str) -> int | None:
+    """#RRGGBB → 채널당 5비트 양자화 ID (유사 색 병합)."""
+    value = color.strip().lstrip("#")
+    if len(value) != 6:
+        return None
+    try:
+        r, g, b = (int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return None
+    return (r >> 3) << 10 | (g >> 3) << 5 | (b >> 3)
+
+
+def _color_hex(color_id: int) -> str:
+    r, g, b = (color_id >> 10) & 31, (color_id >> 5) & 31, color_id & 31
+    return "#{:02X}{:02X}{:02X}".format(r << 3 | 4, g << 3 | 4, b << 3 | 4)
+
+
+def _seen_key(row: int, click_prefix: str) -> int:
+    """(사용자 행, 클릭 키 앞 16자) → 64비트 반영 키."""
+    digest = hashlib.blake2b(f"{row}:{click_prefix.lower()}".encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+class ProfileStore:
+    """사용자별 Style DNA 요약을 컬럼형 memmap 파일로 보관하는 저장소."""
+
+    def __init__(self, root: str | Path, decay: float = 0.7):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.decay = decay
+
+        self._users_path = self.root / "users.txt"
+        self._vocab_path = self.root / "vocab.txt"
+        self._users: dict[str, int] = {}
+        self._vocab: list[str] = []
+        self._vocab_ids: dict[str, int] = {}
+        self._new_users: list[str] = []
+        self._new_vocab: list[str] = []
+        self._lock = threading.Lock()
+        self._seen_path = self.root / "seen.u64"
+        self._seen = np.empty(0, dtype=np.uint64)   # 정렬된 반영 키 (병합분)
+        self._seen_recent: set[int] = set()          # 아직 병합하지 않은 반영 키
+        self._seen_pending: list[int] = []           # 아직 디스크에 쓰지 않은 반영 키
+
+        if self._users_path.exists():
+            for row, user_id in enumerate(self._users_path.read_text(encoding="utf-8").splitlines()):
+                self._users[user_id] = row
+        if self._vocab_path.exists():
+            for term in self._vocab_path.read_text(encoding="utf-8").splitlines():
+                self._vocab_ids[term] = len(self._vocab)
+                self._vocab.append(term)
+
+        self._columns: dict[str, np.ndarray] = {}
+        self._capacity = 0
+        self._open_columns(max(_INITIAL_CAPACITY, len(self._users)))
+        self._load_seen()
+
+    def _load_seen(self) -> None:
+        if self._seen_path.exists():
+            self._seen = np.unique(np.fromfile(self._seen_path, dtype=np.uint64))
+
+    # ── 컬럼 파일 관리 ─────────────────────────────────────────────────
+
+    def _column_specs(self) -> dict[str, tuple[np.dtype, tuple[int, ...], int]]:
+        specs: dict[str, tuple[np.dtype, tuple[int, ...], int]] = {
+            "clicks": (np.dtype(np.int32), (), 0),
+        }
+        for name, (slots, _) in _SLOT_COLUMNS.items():
+            specs[f"{name}.ids"] = (np.dtype(np.int32), (slots,), -1)
+            specs[f"{name}.w"] = (np.dtype(np.float32), (slots,), 0)
+        return specs
+
+    def _open_columns(self, capacity: int) -> None:
+        for name, (dtype, shape, fill) in self._column_specs().items():
+            path = self.root / f"{name}.npy"
+            if path.exists():
+                column = np.load(path, mmap_mode="r+")
+                if column.shape[0] < capacity:
+                    column = self._grow(path, column, capacity, fill)
+            else:
+                column = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=dtype, shape=(capacity, *shape)
+                )
+                column[:] = fill
+            self._columns[name] = column
+        self._capacity = next(iter(self._columns.values())).shape[0]
+
+    @staticmethod
+    def _grow(path: Path, column: np.ndarray, capacity: int, fill) -> np.ndarray:
+        tmp = path.with_suffix(".grow.npy")
+        grown = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=column.dtype, shape=(capacity, *column.shape[1:])
+        )
+        grown[: column.shape[0]] = column
+        grown[column.shape[0]:] = fill
+        grown.flush()
+        del grown, column
+        tmp.replace(path)
+        return np.load(path, mmap_mode="r+")
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < rows:
+            capacity *= 2
+        self._flush()
+        self._columns.clear()
+        self._open_columns(capacity)
+
+    # ── ID 매핑 ───────────────────────────────────────────────────────
+
+    def _row(self, user_id: str, create: bool = False) -> int | None:
+        row = self._users.get(user_id)
+        if row is None and create:
+            row = len(self._users)
+            self._ensure_capacity(row + 1)
+            self._users[user_id] = row
+            self._new_users.append(user_id)
+        return row
+
+    def _term_id(self, term: str) -> int:
+        term = " ".join(term.split())  # vocab.txt는 줄 단위 — 개행 제거
+        term_id = self._vocab_ids.get(term)
+        if term_id is None:
+            term_id = len(self._vocab)
+            self._vocab_ids[term] = term_id
+            self._vocab.append(term)
+            self._new_vocab.append(term)
+        return term_id
+
+    # ── 갱신 · 조회 ───────────────────────────────────────────────────
+
+    def _update_slots(self, name: str, row: int, value_ids: list[int], weight: float) -> None:
+        ids = self._columns[f"{name}.ids"][row]
+        weights = self._columns[f"{name}.w"][row]
+        if _SLOT_COLUMNS[name][1]:
+            weights *= self.decay
+
+        for value_id in dict.fromkeys(value_ids):
+            hit = np.flatnonzero(ids == value_id)
+            if hit.size:
+                weights[hit[0]] += weight
+                continue
+            # 빈 슬롯 우선, 없으면 최소 가중치 슬롯 교체 (Space-Saving: 기존 가중치 승계)
+            empty = np.flatnonzero(ids == -1)
+            slot = int(empty[0]) if empty.size else int(np.argmin(weights))
+            inherited = 0.0 if empty.size else float(weights[slot])
+            ids[slot] = value_id
+            weights[slot] = inherited + weight
+
+    def has_seen(self, user_id: str, click_key: str) -> bool:
+        """해당 클릭이 이미 프로필에 반영되었는지 확인합니다."""
+        with self._lock:
+            return self._has_seen(user_id, click_key)
+
+    def unseen(self, user_id: str, click_keys: list[str]) -> list[str]:
+        """아직 반영되지 않은 클릭 키만 (입력 순서 유지)."""
+        with self._lock:
+            return [key for key in click_keys if not self._has_seen(user_id, key)]
+
+    def _has_seen(self, user_id: str, click_key: str) -> bool:
+        row = self._row(user_id)
+        if row is None:
+            return False
+        key = _seen_key(row, click_key[:16])
+        if key in self._seen_recent:
+            return True
+        index = int(np.searchsorted(self._seen, np.uint64(key)))
+        return index < self._seen.size and int(self._seen[index]) == key
+
+    def _mark_seen(self, row: int, click_key: str) -> None:
+        key = _seen_key(row, click_key[:16])
+        self._seen_recent.add(key)
+        self._seen_pending.append(key)
+        if len(self._seen_recent) >= _SEEN_MERGE_SIZE:
+            merged = np.fromiter(self._seen_recent, dtype=np.uint64, count=len(self._seen_recent))
+            self._seen = np.union1d(self._seen, merged)
+            self._seen_recent.clear()
+
+    def update(
+        self,
+        user_id: str,
+        dna: StyleDNA,
+        click_key: str | None = None,
+        weight: float = 1.0,
+    ) -> bool:
+        """새 클릭 1건의 Style DNA를 사용자 프로필에 반영합니다.
+
+        click_key가 이미 반영된 클릭이면 아무 것도 하지 않고 False를 반환합니다.
+        """
+        with self._lock:
+            return self._update(user_id, dna, click_key, weight)
+
+    def apply(
+        self,
+        user_id: str,
+        clicks: list[tuple[StyleDNA, str | None]],
+    ) -> StyleDNA | None:
+        """클릭들을 반영하고 flush한 뒤 요약을 반환 — 한 번의 락 안에서 (to_thread용).
+
+        반영 여부는 락 안에서 다시 확인하므로, 같은 사용자의 동시 실행이 같은 클릭을 넘겨도
+        한 번만 반영됩니다.
+        """
+        with self._lock:
+            for dna, click_key in clicks:
+                self._update(user_id, dna, click_key)
+            self._flush()
+            return self._summary(user_id)
+
+    def _update(
+        self,
+        user_id: str,
+        dna: StyleDNA,
+        click_key: str | None = None,
+        weight: float = 1.0,
+    ) -> bool:
+        if click_key is not None and self._has_seen(user_id, click_key):
+            return False
+        row = self._row(user_id, create=True)
+        image, layout, copy = dna.image_style, dna.layout_style, dna.copy_style
+
+        palette_ids = [cid for cid in map(_color_id, image.color_palette) if cid is not None]
+        self._update_slots("palette", row, palette_ids, weight)
+        self._update_slots("aesthetic", row, [self._term_id(t) for t in image.aesthetic if t.strip()], weight)
+        self._update_slots("keywords", row, [self._term_id(t) for t in copy.keywords if t.strip()], weight)
+
+        scalar_terms = {
+            "mood": image.mood,
+            "lighting": image.lighting,
+            "tone": copy.tone,
+            "length": copy.length,
+            "emphasis_type": copy.emphasis_type,
+            "layout_type": layout.type,
+            "text_position": layout.text_position,
+            "product_position": layout.product_position,
+            "visual_flow": layout.visual_flow,
+            "whitespace": layout.whitespace,
+            "focal_point": layout.focal_point,
+        }
+        for name, term in scalar_terms.items():
+            self._update_slots(name, row, [self._term_id(term)] if term.strip() else [], weight)
+
+        self._columns["clicks"][row] += 1
+        if click_key is not None:
+            self._mark_seen(row, click_key)
+        return True
+
+    def _top(self, name: str, row: int, limit: int) -> list[int]:
+        ids = self._columns[f"{name}.ids"][row]
+        weights = self._columns[f"{name}.w"][row]
+        order = np.argsort(-weights, kind="stable")
+        return [int(ids[i]) for i in order[:limit] if ids[i] != -1]
+
+    def _top_term(self, name: str, row: int) -> str:
+        top = self._top(name, row, 1)
+        return self._vocab[top[0]] if top else ""
+
+    def summary(self, user_id: str) -> StyleDNA | None:
+        """사용자 프로필을 고정 크기 StyleDNA로 요약합니다 (미등록 사용자는 None)."""
+        with self._lock:
+            return self._summary(user_id)
+
+    def _summary(self, user_id: str) -> StyleDNA | None:
+        row = self._row(user_id)
+        if row is None or self._columns["clicks"][row] == 0:
+            return None
+
+        return StyleDNA(
+            image_style=ImageStyle(
+                mood=self._top_term("mood", row),
+                lighting=self._top_term("lighting", row),
+                color_palette=[_color_hex(c) for c in self._top("palette", row, _PALETTE_TOP)],
+                aesthetic=[self._vocab[t] for t in self._top("aesthetic", row, _AESTHETIC_TOP)],
+            ),
+            layout_style=LayoutStyle(
+                type=self._top_term("layout_type", row),
+                text_position=self._top_term("text_position", row),
+                product_position=self._top_term("product_position", row),
+                visual_flow=self._top_term("visual_flow", row),
+                whitespace=self._top_term("whitespace", row),
+                focal_point=self._top_term("focal_point", row),
+            ),
+            copy_style=CopyStyle(
+                tone=self._top_term("tone", row),
+                length=self._top_term("length", row),
+                emphasis_type=self._top_term("emphasis_type", row),
+                keywords=[self._vocab[t] for t in self._top("keywords", row, _KEYWORDS_TOP)],
+            ),
+        )
+
+    def flush(self) -> None:
+        """신규 사용자·어휘를 append하고 컬럼 memmap을 디스크에 반영합니다."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._new_users:
+            with self._users_path.open("a", encoding="utf-8") as f:
+                f.writelines(f"{u}\n" for u in self._new_users)
+            self._new_users.clear()
+        if self._new_vocab:
+            with self._vocab_path.open("a", encoding="utf-8") as f:
+                f.writelines(f"{t}\n" for t in self._new_vocab)
+            self._new_vocab.clear()
+        if self._seen_pending:
+            with self._seen_path.open("ab") as f:
+                np.asarray(self._seen_pending, dtype=np.uint64).tofile(f)
+            self._seen_pending.clear()
+        for column in self._columns.values():
+            column.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._users)
+
+
+@lru_cache
+def get_profile_store() -> ProfileStore | None:
+    """설정된 프로필 저장소를 반환합니다 (PROFILE_STORE_DIR 미설정 시 None)."""
+    settings = get_settings()
+    if not settings.profile_store_dir:
+        return None
+    return ProfileStore(settings.profile_store_dir, decay=settings.profile_decay)
@@ -0,0 +1,58 @@
+"""
+Style DNA 캐시 — 이미지 콘텐츠 해시 → StyleDNA
+
+인라인 Stage 1 추출과 오프라인 배치 사전 계산(da_agent.precompute)이 같은 저장소를
+공유합니다. 로컬 파일은 바이트 해시, URL은 URL 문자열 해시를 키로 사용합니다.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from da_agent.config import get_settings
+from da_agent.models.style_dna import StyleDNA
+from da_agent.utils.single_flight import source_digest
+
+
+def image_cache_key(path_or_url: str) -> str:
+    """이미지 캐시 키를 계산합니다 (로컬 파일: 콘텐츠 sha256, URL: URL sha256)."""
+    return source_digest(path_or_url)
+
+
+class StyleDNACache:
+    """키별 JSON 파일로 StyleDNA를 저장하는 디렉터리 캐시 (2단계 샤딩)."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> StyleDNA | None:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return StyleDNA.model_validate_json(path.read_text(encoding="utf-8"))
+
+    def put(self, key: str, dna: StyleDNA) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 임시 파일에 쓴 뒤 rename — 동시 실행 중인 파이프라인이 반쯤 쓴 파일을 읽지 않도록
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(dna.model_dump_json())
+        os.replace(tmp, path)
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+
+@lru_cache
+def get_style_dna_cache() -> StyleDNACache | None:
+    """설정된 Style DNA 캐시를 반환합니다 (STYLE_DNA_CACHE_DIR 미설정 시 None)."""
+    settings = get_settings()
+    if not settings.style_dna_cache_dir:
+        return None
+    return StyleDNACache(settings.style_dna_cache_dir)
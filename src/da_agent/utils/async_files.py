@@ -0,0 +1,50 @@
+"""
+비차단 파일 I/O 헬퍼 — 파이프라인 경로의 파일 읽기·쓰기를 이벤트 루프 밖(스레드)에서 실행
+
+로컬 디스크 읽기도 느린 볼륨(NFS, 컨테이너 오버레이)에서는 수십 ms까지 걸려 같은 루프의
+다른 파이프라인을 모두 멈춥니다. 프롬프트 템플릿은 프로세스당 한 번만 읽어 캐시합니다.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from pathlib import Path
+
+_templates: dict[Path, str] = {}
+_templates_lock = threading.Lock()
+
+
+async def read_bytes(path: str | Path) -> bytes:
+    return await asyncio.to_thread(Path(path).read_bytes)
+
+
+async def read_text(path: str | Path, encoding: str = "utf-8") -> str:
+    return await asyncio.to_thread(Path(path).read_text, encoding=encoding)
+
+
+async def write_bytes(path: str | Path, data: bytes) -> None:
+    await asyncio.to_thread(Path(path).write_bytes, data)
+
+
+async def write_text(path: str | Path, text: str, encoding: str = "utf-8") -> None:
+    await asyncio.to_thread(Path(path).write_text, text, encoding=encoding)
+
+
+def load_template(path: str | Path) -> str:
+    """프롬프트 템플릿 (프로세스당 한 번만 디스크에서 읽음)."""
+    path = Path(path)
+    template = _templates.get(path)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(path)
+            if template is None:
+                template = _templates[path] = path.read_text(encoding="utf-8")
+    return template
+
+
+async def read_template(path: str | Path) -> str:
+    """load_template의 비동기 버전 — 캐시 미스일 때만 스레드에서 읽음."""
+    template = _templates.get(Path(path))
+    if template is not None:
+        return template
+    return await asyncio.to_thread(load_template, path)
@@ -0,0 +1,295 @@
+"""
+제품 누끼(배경 제거) 서비스 — 배치 ONNX 추론 · 세션 풀 · 콘텐츠 해시 마스크 캐시
+
+rembg.remove()는 이미지 한 장마다 전역 u2net 세션으로 추론하고 스레드 수 제어·캐시가 없습니다.
+BackgroundRemover는 다음을 제공합니다.
+
+- 배치: 짧은 창(batch_window) 동안 들어온 요청을 (N, 3, 320, 320) 텐서 하나로 묶어 추론
+  (모델이 동적 배치를 지원하지 않으면 첫 실패 후 장당 추론으로 전환)
+- 세션 풀: onnxruntime 세션 pool_size개 (intra/inter-op 스레드 수 설정) — 배치끼리 병렬 실행
+- 캐시: 픽셀 내용 해시(sha256) → 원본 크기 알파 마스크(L) — 메모리 LRU + 선택적 디스크(PNG)
+  같은 제품을 여러 위치·크기에 배치해도 마스크는 한 번만 추론 (overlay_product(mask=...))
+
+u2net 계열(u2net, u2netp, u2net_human_seg, silueta — 320×320 입력, ImageNet 정규화)을 지원합니다.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+from PIL import Image
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_INPUT_SIDE = 320
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def content_hash(image: Image.Image) -> str:
+    """픽셀 내용 해시 — 같은 이미지를 다른 경로·포맷으로 읽어도 같은 키."""
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def apply_mask(image: Image.Image, mask: Image.Image) -> Image.Image:
+    """마스크를 알파 채널로 적용한 RGBA 누끼 (마스크 크기가 다르면 이미지에 맞춤)."""
+    if mask.size != image.size:
+        mask = mask.resize(image.size, Image.LANCZOS)
+    cutout = image.convert("RGBA")
+    cutout.putalpha(mask)
+    return cutout
+
+
+def _preprocess(image: Image.Image) -> np.ndarray:
+    """rembg U2netSession.normalize와 같은 전처리 → (3, 320, 320) float32."""
+    pixels = np.asarray(
+        image.convert("RGB").resize((_INPUT_SIDE, _INPUT_SIDE), Image.LANCZOS), dtype=np.float32
+    )
+    pixels /= max(float(pixels.max()), 1e-6)
+    return ((pixels - _MEAN) / _STD).transpose(2, 0, 1)
+
+
+def _postprocess(prediction: np.ndarray, size: tuple[int, int]) -> Image.Image:
+    """(320, 320) 예측 → min-max 정규화 → 원본 크기 L 마스크."""
+    lo, hi = float(prediction.min()), float(prediction.max())
+    normalized = (prediction - lo) / max(hi - lo, 1e-6)
+    mask = Image.fromarray((normalized.clip(0, 1) * 255).astype(np.uint8), "L")
+    return mask.resize(size, Image.LANCZOS)
+
+
+def create_onnx_session(model: str = "u2net", intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """rembg 모델 파일로 스레드 수를 지정한 onnxruntime 세션을 만듭니다 (0 = onnxruntime 기본값)."""
+    import onnxruntime as ort
+    from rembg import new_session
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    if inter_op_threads > 1:
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return new_session(model, sess_opts=options).inner_session
+
+
+@dataclass
+class _Pending:
+    image: Image.Image
+    key: str
+    future: asyncio.Future = field(repr=False)
+
+
+class BackgroundRemover:
+    """배치·세션 풀·마스크 캐시를 갖춘 배경 제거 워커."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Any],
+        pool_size: int = 1,
+        max_batch: int = 8,
+        batch_window: float = 0.01,
+        cache_size: int = 256,
+        cache_dir: str | Path | None = None,
+    ):
+        self.session_factory = session_factory
+        self.pool_size = max(1, pool_size)
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self._sessions: queue.Queue = queue.Queue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._batchable = True
+
+        self._cache: OrderedDict[str, Image.Image] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._pending: list[_Pending] = []
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    # ── 세션 풀 ──────────────────────────────────────────────────────────────
+    def _acquire(self):
+        try:
+            return self._sessions.get_nowait()
+        except queue.Empty:
+            pass
+        with self._create_lock:
+            if self._created < self.pool_size:
+                # 생성에 성공한 뒤에만 자리 차지 — 실패(모델 다운로드·onnxruntime 오류)한 슬롯은
+                # 다음 호출이 다시 만들도록 남겨 둠 (아니면 get()이 영원히 대기)
+                session = self.session_factory()
+                self._created += 1
+                return session
+        return self._sessions.get()
+
+    def _infer(self, images: list[Image.Image]) -> list[Image.Image]:
+        """풀에서 세션을 빌려 마스크를 추론합니다 (블로킹 — 스레드에서 호출)."""
+        session = self._acquire()
+        try:
+            input_name = session.get_inputs()[0].name
+            batch = np.stack([_preprocess(image) for image in images])
+            predictions = None
+            if self._batchable and len(images) > 1:
+                try:
+                    predictions = session.run(None, {input_name: batch})[0][:, 0]
+                except Exception as exc:  # 고정 배치(1) 모델 — 장당 추론으로 전환
+                    logger.info("Background model does not accept batches, falling back: %s", exc)
+                    self._batchable = False
+            if predictions is None:
+                predictions = np.concatenate(
+                    [session.run(None, {input_name: item[None]})[0][:, 0] for item in batch]
+                )
+        finally:
+            self._sessions.put(session)
+        metrics.increment("bg_removal.inferences", len(images))
+        metrics.observe("bg_removal.batch_size", len(images))
+        return [_postprocess(pred, image.size) for pred, image in zip(predictions, images)]
+
+    # ── 캐시 ─────────────────────────────────────────────────────────────────
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def cached_mask(self, key: str) -> Image.Image | None:
+        """메모리 → 디스크 순 캐시 조회 (디스크 조회는 블로킹 — 루프에서는 mask() 사용)."""
+        mask = self._memory_mask(key)
+        if mask is None:
+            mask = self._disk_mask(key)
+        return mask
+
+    def _memory_mask(self, key: str) -> Image.Image | None:
+        with self._cache_lock:
+            mask = self._cache.get(key)
+            if mask is not None:
+                self._cache.move_to_end(key)
+                metrics.increment("bg_removal.cache_hits")
+            return mask
+
+    def _disk_mask(self, key: str) -> Image.Image | None:
+        if self.cache_dir is None:
+            return None
+        path = self._cache_path(key)
+        if not path.exists():
+            return None
+        with Image.open(path) as stored:
+            mask = stored.convert("L")
+        self._remember(key, mask, persist=False)
+        metrics.increment("bg_removal.cache_hits")
+        return mask
+
+    def _remember(self, key: str, mask: Image.Image, persist: bool = True) -> None:
+        with self._cache_lock:
+            self._cache[key] = mask
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        if persist and self.cache_dir is not None:
+            path = self._cache_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            buffer = io.BytesIO()
+            mask.save(buffer, format="PNG", optimize=True)
+            path.write_bytes(buffer.getvalue())
+
+    # ── 동기 API ─────────────────────────────────────────────────────────────
+    def mask_sync(self, image: Image.Image) -> Image.Image:
+        """단건 동기 마스크 (캐시 우선) — 이벤트 루프 밖의 기존 호출부용."""
+        key = content_hash(image)
+        mask = self.cached_mask(key)
+        if mask is None:
+            mask = self._infer([image])[0]
+            self._remember(key, mask)
+        return mask
+
+    # ── 비동기 배치 API ──────────────────────────────────────────────────────
+    async def mask(self, image: Image.Image) -> Image.Image:
+        """원본 크기 알파 마스크(L). 같은 내용의 동시 요청은 한 번만 추론합니다."""
+        key = await asyncio.to_thread(content_hash, image)
+        cached = self._memory_mask(key)
+        if cached is None and self.cache_dir is not None:
+            cached = await asyncio.to_thread(self._disk_mask, key)   # 디스크 PNG 조회는 루프 밖에서
+        if cached is not None:
+            return cached
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._in_flight[key] = future
+        self._pending.append(_Pending(image, key, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await asyncio.shield(future)
+
+    async def masks(self, images: list[Image.Image]) -> list[Image.Image]:
+        return list(await asyncio.gather(*(self.mask(image) for image in images)))
+
+    async def cutout(self, image: Image.Image) -> Image.Image:
+        """배경이 투명한 RGBA 누끼."""
+        return apply_mask(image, await self.mask(image))
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._flush_handle = asyncio.get_running_loop().call_later(0, self._flush)
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: list[_Pending]) -> None:
+        try:
+            masks = await asyncio.to_thread(self._infer, [item.image for item in batch])
+            for item, mask in zip(batch, masks):
+                await asyncio.to_thread(self._remember, item.key, mask)
+                if not item.future.done():
+                    item.future.set_result(mask)
+        except Exception as exc:
+            metrics.increment("bg_removal.errors")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+                    item.future.exception()  # 아무도 기다리지 않는 요청의 미처리 경고 방지
+        finally:
+            for item in batch:
+                self._in_flight.pop(item.key, None)
+
+
+@lru_cache
+def get_background_remover() -> BackgroundRemover:
+    """설정 기반 공유 배경 제거 워커 (BG_REMOVAL_* 설정)."""
+    settings = get_settings()
+
+    def _factory():
+        return create_onnx_session(
+            settings.bg_removal_model,
+            intra_op_threads=settings.bg_removal_intra_op_threads,
+            inter_op_threads=settings.bg_removal_inter_op_threads,
+        )
+
+    return BackgroundRemover(
+        _factory,
+        pool_size=settings.bg_removal_pool_size,
+        max_batch=settings.bg_removal_max_batch,
+        batch_window=settings.bg_removal_batch_window_ms / 1000,
+        cache_size=settings.bg_removal_cache_size,
+        cache_dir=settings.bg_mask_cache_dir or None,
+    )
@@ -0,0 +1,211 @@
+"""
+색 변환 고속 경로 — img2img(FLUX 28스텝) 대신 NumPy 색공간 연산으로 스타일 색감 적용
+
+기존 DA와 사용자 Style DNA의 차이가 색감·밝기뿐일 때 사용합니다 (구도·배경·소품은 그대로).
+
+- lut:   ImageStyle.color_palette로 3D LUT(17³)를 만들어 Pillow Color3DLUT로 적용
+         각 색의 Lab 색차(a*, b*)를 가장 가까운 팔레트 색 쪽으로 당김 (무채색은 유지)
+         LUT는 (팔레트, 강도, 보정값)별로 캐시 — 적용은 C 구현 삼선형 보간이라 수 ms
+- stats: Lab 통계 전이 (Reinhard) — 이미지 a*b* 평균을 팔레트 평균으로 옮기고
+         표준편차를 원본·팔레트 사이로 조정 (통계는 축소본에서, 적용은 같은 LUT 방식)
+
+두 방식 모두 조명(lighting)·분위기(mood) 키워드에서 밝기·대비 보정값을 유도해 L*에 적용합니다.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from da_agent.models.style_dna import ImageStyle
+
+_LUT_SIZE = 17
+_STATS_SAMPLE_SIDE = 256   # Lab 통계 추정용 축소본 한 변 (px)
+_HEX_COLOR = re.compile(r"#?([0-9a-fA-F]{6})")
+
+# sRGB(D65) ↔ XYZ
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ).astype(np.float32)
+_WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+_SNAP_SIGMA = 35.0        # 팔레트 색 근접 가중치의 a*b* 거리 척도
+_NEUTRAL_CHROMA = 12.0    # 이 채도 이하는 무채색 취급 — LUT 색조 이동을 줄임
+
+# 조명·분위기 키워드 → (밝기, 대비) — 밝기는 L* 0~100 기준 비율, 대비는 배율 증감
+_GRADE_KEYWORDS: dict[str, tuple[float, float]] = {
+    "밝": (0.05, 0.0),
+    "화사": (0.06, -0.03),
+    "청량": (0.05, 0.02),
+    "소프트": (0.02, -0.08),
+    "자연광": (0.03, -0.04),
+    "어두": (-0.06, 0.08),
+    "하드": (0.0, 0.12),
+    "드라마틱": (-0.03, 0.15),
+    "무드": (-0.04, 0.06),
+    "bright": (0.05, 0.0),
+    "airy": (0.05, -0.05),
+    "high-key": (0.07, -0.05),
+    "soft": (0.02, -0.08),
+    "dark": (-0.06, 0.08),
+    "low-key": (-0.07, 0.1),
+    "moody": (-0.05, 0.08),
+    "hard": (0.0, 0.12),
+    "dramatic": (-0.03, 0.15),
+    "contrast": (0.0, 0.1),
+}
+
+
+# ── 색공간 변환 ──────────────────────────────────────────────────────────────
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """sRGB(0~1, 마지막 축 3) → CIE Lab."""
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = (linear @ _RGB_TO_XYZ.T) / _WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack(
+        [116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])],
+        axis=-1,
+    ).astype(np.float32)
+
+
+def lab_to_srgb(lab: np.ndarray) -> np.ndarray:
+    """CIE Lab → sRGB(0~1로 클리핑)."""
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f > 0.206893, f ** 3, (f - 16 / 116) / 7.787) * _WHITE
+    linear = np.clip(xyz @ _XYZ_TO_RGB.T, 0, 1)
+    rgb = np.where(linear > 0.0031308, 1.055 * linear ** (1 / 2.4) - 0.055, linear * 12.92)
+    return np.clip(rgb, 0, 1).astype(np.float32)
+
+
+def palette_lab(palette: list[str] | tuple[str, ...]) -> np.ndarray:
+    """HEX 팔레트 → (N, 3) Lab 배열 (해석 불가 항목은 건너뜀)."""
+    colors = []
+    for entry in palette:
+        match = _HEX_COLOR.search(entry)
+        if match:
+            h = match.group(1)
+            colors.append([int(h[i:i + 2], 16) for i in (0, 2, 4)])
+    if not colors:
+        return np.empty((0, 3), dtype=np.float32)
+    return srgb_to_lab(np.asarray(colors, dtype=np.float32) / 255)
+
+
+def grade_for_style(style: ImageStyle) -> tuple[float, float]:
+    """조명·분위기·미학 키워드에서 (밝기, 대비) 보정값을 유도합니다."""
+    text = " ".join([style.lighting, style.mood, *style.aesthetic]).lower()
+    brightness = contrast = 0.0
+    for keyword, (b, c) in _GRADE_KEYWORDS.items():
+        if keyword in text:
+            brightness += b
+            contrast += c
+    return float(np.clip(brightness, -0.15, 0.15)), float(np.clip(contrast, -0.2, 0.3))
+
+
+def _grade_lightness(lab: np.ndarray, brightness: float, contrast: float, pivot: float = 50.0) -> None:
+    lab[..., 0] = np.clip((lab[..., 0] - pivot) * (1 + contrast) + pivot + 100 * brightness, 0, 100)
+
+
+def _lut_from_lab(transform, size: int = _LUT_SIZE) -> ImageFilter.Color3DLUT:
+    """격자 색의 Lab에 transform을 적용한 3D LUT (Color3DLUT 순서: r가 가장 빠르게 변함)."""
+    axis = np.linspace(0, 1, size, dtype=np.float32)
+    b, g, r = np.meshgrid(axis, axis, axis, indexing="ij")
+    lab = srgb_to_lab(np.stack([r, g, b], axis=-1).reshape(-1, 3))
+    return ImageFilter.Color3DLUT(size, lab_to_srgb(transform(lab)).ravel().tolist())
+
+
+# ── Lab 통계 전이 ────────────────────────────────────────────────────────────
+def transfer_lab_stats(
+    image: Image.Image,
+    palette: list[str],
+    strength: float = 0.6,
+    brightness: float = 0.0,
+    contrast: float = 0.0,
+) -> Image.Image:
+    """Reinhard 방식 Lab 통계 전이 — a*b* 평균·분산을 팔레트 쪽으로 옮깁니다.
+
+    통계는 축소본에서 구하고, 채널별 선형 변환이라 3D LUT로 구워 전체 해상도에 적용합니다.
+    """
+    image = image.convert("RGB")
+    sample = image.copy()
+    sample.thumbnail((_STATS_SAMPLE_SIDE, _STATS_SAMPLE_SIDE))
+    lab = srgb_to_lab(np.asarray(sample, dtype=np.float32) / 255).reshape(-1, 3)
+    target = palette_lab(palette)
+    pivot = float(lab[:, 0].mean())
+
+    if len(target):
+        src_mean, src_std = lab[:, 1:].mean(axis=0), lab[:, 1:].std(axis=0) + 1e-6
+        dst_std = np.sqrt((src_std ** 2 + target[:, 1:].std(axis=0) ** 2) / 2)
+        dst_mean = target[:, 1:].mean(axis=0)
+
+    def _transfer(grid: np.ndarray) -> np.ndarray:
+        out = grid.copy()
+        if len(target):
+            out[:, 1:] = (grid[:, 1:] - src_mean) * (dst_std / src_std) + dst_mean
+        _grade_lightness(out, brightness, contrast, pivot=pivot)
+        return grid + (out - grid) * strength
+
+    return image.filter(_lut_from_lab(_transfer))
+
+
+# ── 팔레트 3D LUT ────────────────────────────────────────────────────────────
+@lru_cache(maxsize=64)
+def build_palette_lut(
+    palette: tuple[str, ...],
+    strength: float = 0.6,
+    brightness: float = 0.0,
+    contrast: float = 0.0,
+    size: int = _LUT_SIZE,
+) -> ImageFilter.Color3DLUT:
+    """팔레트 기반 3D LUT — 각 격자 색의 a*b*를 가까운 팔레트 색 쪽으로 당깁니다."""
+    target = palette_lab(palette)
+
+    def _snap(lab: np.ndarray) -> np.ndarray:
+        if not len(target):
+            _grade_lightness(lab, brightness, contrast)
+            return lab
+        ab = lab[:, 1:]
+        dist2 = ((ab[:, None, :] - target[None, :, 1:]) ** 2).sum(axis=-1)
+        weights = np.exp(-(dist2 - dist2.min(axis=1, keepdims=True)) / (2 * _SNAP_SIGMA ** 2))
+        weights /= weights.sum(axis=1, keepdims=True)
+        snapped = weights @ target[:, 1:]
+        chroma = np.linalg.norm(ab, axis=1, keepdims=True)
+        amount = strength * np.clip(chroma / _NEUTRAL_CHROMA, 0.25, 1.0)
+        lab[:, 1:] = ab + (snapped - ab) * amount
+        _grade_lightness(lab, brightness, contrast)
+        return lab
+
+    return _lut_from_lab(_snap, size)
+
+
+def apply_palette_lut(
+    image: Image.Image,
+    palette: list[str],
+    strength: float = 0.6,
+    brightness: float = 0.0,
+    contrast: float = 0.0,
+) -> Image.Image:
+    lut = build_palette_lut(
+        tuple(palette), round(strength, 3), round(brightness, 3), round(contrast, 3)
+    )
+    return image.convert("RGB").filter(lut)
+
+
+def transfer_style_colors(
+    image: Image.Image,
+    style: ImageStyle,
+    method: str = "lut",
+    strength: float = 0.6,
+) -> Image.Image:
+    """ImageStyle의 팔레트·조명을 이미지에 적용합니다 (method: lut | stats)."""
+    brightness, contrast = grade_for_style(style)
+    if method == "lut":
+        return apply_palette_lut(image, style.color_palette, strength, brightness, contrast)
+    if method == "stats":
+        return transfer_lab_stats(image, style.color_palette, strength, brightness, contrast)
+    raise ValueError(f"Unknown colour transfer method: {method!r} (lut | stats)")
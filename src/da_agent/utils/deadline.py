@@ -0,0 +1,94 @@
+"""
+실행 데드라인 전파 — 파이프라인 한 번의 시간 예산을 모든 외부 호출의 타임아웃으로 (RUN_DEADLINE_SECONDS)
+
+서빙 SLO는 정해진 시간 안에 광고를 요구하지만, 느린 fal 작업이나 멈춘 LLM 요청 하나가
+작업을 몇 분씩 붙잡을 수 있습니다. 스테이지·호출마다 고정 타임아웃을 두면 합이 예산을 넘습니다.
+
+- deadline_scope(seconds): 현재 컨텍스트(ContextVar)에 만료 시각을 설정 — asyncio 태스크·
+  to_thread는 생성 시 컨텍스트를 복사하므로 gather로 나뉜 호출에도 그대로 전파됨.
+  중첩하면 더 이른 만료 시각이 유지됨 (스테이지별 하위 예산)
+- within_deadline(aw, stage): 남은 시간을 그 호출의 타임아웃으로 사용 — 만료되면 호출을 취소하고
+  DeadlineExceeded 발생 (이미 만료됐으면 시작하지 않음)
+- 데드라인이 없으면 아무 것도 하지 않음 (기존 동작)
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Awaitable, Iterator, TypeVar
+
+from da_agent.utils import metrics
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """실행 데드라인 안에 호출을 끝낼 수 없을 때 발생합니다."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage}: run deadline exceeded")
+        self.stage = stage
+
+
+@dataclass(frozen=True)
+class Deadline:
+    expires_at: float   # time.monotonic() 기준
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+_current: ContextVar[Deadline | None] = ContextVar("da_agent_deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    return _current.get()
+
+
+def remaining_seconds() -> float | None:
+    """현재 데드라인까지 남은 시간 (데드라인 없으면 None)."""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+
+@contextmanager
+def deadline_scope(seconds: float | None) -> Iterator[Deadline | None]:
+    """seconds 뒤 만료되는 데드라인을 설정 (None·0 이하면 바깥 데드라인 유지)."""
+    outer = _current.get()
+    if seconds is None or seconds <= 0:
+        yield outer
+        return
+    deadline = Deadline(time.monotonic() + seconds)
+    if outer is not None and outer.expires_at <= deadline.expires_at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+async def within_deadline(aw: Awaitable[T], stage: str) -> T:
+    """현재 데드라인의 남은 시간을 타임아웃으로 aw를 기다립니다."""
+    deadline = _current.get()
+    if deadline is None:
+        return await aw
+    if deadline.expired():
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        metrics.increment(f"deadline.exceeded.{stage}")
+        raise DeadlineExceeded(stage)
+    try:
+        async with asyncio.timeout(deadline.remaining()) as scope:
+            return await aw
+    except TimeoutError:
+        if not scope.expired():   # 호출 내부의 자체 타임아웃은 그대로 전파
+            raise
+        metrics.increment(f"deadline.exceeded.{stage}")
+        raise DeadlineExceeded(stage) from None
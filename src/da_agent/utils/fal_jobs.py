@@ -0,0 +1,249 @@
+"""
+fal.ai 큐 작업 관리자 — submit → 상태 폴링 → 결과 수신 / 취소
+
+fal_client.run_async는 결과가 나올 때까지 블로킹되어 대기열 위치를 알 수 없고,
+타임아웃이나 더 이상 필요 없는 작업의 취소도 불가능합니다. FalJobManager는
+큐 REST API(queue.fal.run)를 직접 사용해 다음을 제공합니다.
+
+- submit(): 큐에 요청만 등록하고 즉시 FalJob 반환
+- 단일 폴링 루프가 진행 중인 모든 작업의 상태를 동시에 조회 (대기열 위치·진행 상태)
+- 완료 즉시 결과를 가져와 FalJob.result()를 깨움
+- 같은 group의 새 작업이 들어오면 이전 작업을 취소(superseded), 타임아웃 작업도 취소
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable
+
+import httpx
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+from da_agent.utils.http_client import _build_ssl_context
+
+logger = logging.getLogger(__name__)
+
+IN_QUEUE = "IN_QUEUE"
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+CANCELLED = "CANCELLED"
+FAILED = "FAILED"
+
+
+class FalJobError(RuntimeError):
+    """fal 작업이 실패·취소·타임아웃되었을 때 발생합니다."""
+
+
+@dataclass
+class FalJob:
+    request_id: str
+    application: str
+    status_url: str
+    response_url: str
+    cancel_url: str
+    group: str | None = None
+    status: str = IN_QUEUE
+    queue_position: int | None = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+    _future: asyncio.Future = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self._future.done()
+
+    def progress(self) -> dict:
+        """현재 진행 상태 스냅샷 (상태, 대기열 위치, 경과 시간)."""
+        end = self.finished_at or time.monotonic()
+        return {
+            "request_id": self.request_id,
+            "application": self.application,
+            "status": self.status,
+            "queue_position": self.queue_position,
+            "elapsed": round(end - self.submitted_at, 3),
+        }
+
+    async def result(self) -> dict:
+        """작업 결과(JSON)를 기다립니다. 실패·취소·타임아웃 시 FalJobError."""
+        return await asyncio.shield(self._future)
+
+
+class FalJobManager:
+    """여러 fal 큐 작업을 하나의 폴링 루프로 관리합니다."""
+
+    def __init__(
+        self,
+        key: str,
+        base_url: str = "https://queue.fal.run",
+        poll_interval: float = 0.5,
+        timeout: float = 120.0,
+        on_progress: Callable[[FalJob], None] | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        verify: Any = True,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Key {key}"} if key else {},
+            transport=transport,
+            verify=verify,
+            timeout=30.0,
+        )
+        self._jobs: dict[str, FalJob] = {}
+        self._groups: dict[str, FalJob] = {}
+        self._poller: asyncio.Task | None = None
+
+    # ── 제출 · 대기 · 취소 ────────────────────────────────────────────────────
+    async def submit(self, application: str, arguments: dict, group: str | None = None) -> FalJob:
+        """큐에 작업을 등록합니다. 같은 group의 진행 중 작업은 superseded로 취소됩니다."""
+        response = await self._client.post(f"{self.base_url}/{application}", json=arguments)
+        response.raise_for_status()
+        data = response.json()
+        request_id = data["request_id"]
+        base = f"{self.base_url}/{application}/requests/{request_id}"
+        job = FalJob(
+            request_id=request_id,
+            application=application,
+            status_url=data.get("status_url", f"{base}/status"),
+            response_url=data.get("response_url", base),
+            cancel_url=data.get("cancel_url", f"{base}/cancel"),
+            group=group,
+            queue_position=data.get("queue_position"),
+            _future=asyncio.get_running_loop().create_future(),
+        )
+        metrics.increment("fal.jobs.submitted")
+
+        if group is not None:
+            previous = self._groups.get(group)
+            if previous is not None and not previous.done:
+                await self.cancel(previous, reason="superseded")
+            self._groups[group] = job
+
+        self._jobs[request_id] = job
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+        return job
+
+    async def run(self, application: str, arguments: dict, group: str | None = None) -> dict:
+        """submit 후 결과까지 대기합니다 (fal_client.run_async 대체)."""
+        job = await self.submit(application, arguments, group=group)
+        try:
+            return await job.result()
+        except asyncio.CancelledError:
+            # 호출자가 더 이상 결과를 기다리지 않으면 fal 측 작업도 취소
+            await asyncio.shield(self.cancel(job, reason="cancelled"))
+            raise
+
+    async def cancel(self, job: FalJob, reason: str = "cancelled") -> None:
+        """작업을 취소해 fal 측 용량을 반납합니다."""
+        if job.done:
+            return
+        try:
+            await self._client.put(job.cancel_url)
+        except httpx.HTTPError as exc:
+            logger.warning("fal cancel failed for %s: %s", job.request_id, exc)
+        metrics.increment(f"fal.jobs.{reason}")
+        self._finish(job, CANCELLED, error=FalJobError(f"fal job {job.request_id} {reason}"))
+
+    def progress(self) -> list[dict]:
+        """진행 중인 모든 작업의 상태 스냅샷."""
+        return [job.progress() for job in self._jobs.values()]
+
+    async def aclose(self) -> None:
+        for job in list(self._jobs.values()):
+            await self.cancel(job, reason="cancelled")
+        if self._poller is not None:
+            self._poller.cancel()
+        await self._client.aclose()
+
+    # ── 폴링 ─────────────────────────────────────────────────────────────────
+    def _finish(self, job: FalJob, status: str, result: dict | None = None, error: Exception | None = None) -> None:
+        job.status = status
+        job.queue_position = None
+        job.finished_at = time.monotonic()
+        self._jobs.pop(job.request_id, None)
+        if job.group is not None and self._groups.get(job.group) is job:
+            del self._groups[job.group]
+        if not job._future.done():
+            if error is not None:
+                job._future.set_exception(error)
+                job._future.exception()  # 아무도 기다리지 않는 작업의 미처리 경고 방지
+            else:
+                job._future.set_result(result)
+        if self.on_progress is not None:
+            self.on_progress(job)
+
+    async def _poll_once(self, job: FalJob) -> None:
+        if time.monotonic() - job.submitted_at > self.timeout:
+            await self.cancel(job, reason="timed_out")
+            return
+        try:
+            response = await self._client.get(job.status_url)
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as exc:
+            logger.warning("fal status poll failed for %s: %s", job.request_id, exc)
+            return
+
+        status = data.get("status", job.status)
+        if status == COMPLETED:
+            try:
+                result = await self._client.get(job.response_url)
+            except httpx.HTTPError as exc:
+                # 다음 폴링에서 다시 가져옴 (그 사이 타임아웃되면 취소)
+                logger.warning("fal result fetch failed for %s: %s", job.request_id, exc)
+                return
+            if result.is_success:
+                metrics.observe("fal.job_seconds", time.monotonic() - job.submitted_at)
+                self._finish(job, COMPLETED, result=result.json())
+            else:
+                metrics.increment("fal.jobs.failed")
+                self._finish(
+                    job, FAILED,
+                    error=FalJobError(f"fal job {job.request_id} failed: {result.status_code} {result.text}"),
+                )
+            return
+
+        changed = (status, data.get("queue_position")) != (job.status, job.queue_position)
+        job.status = status
+        job.queue_position = data.get("queue_position")
+        if changed and self.on_progress is not None:
+            self.on_progress(job)
+
+    async def _poll_loop(self) -> None:
+        while self._jobs:
+            jobs = list(self._jobs.values())
+            outcomes = await asyncio.gather(
+                *(self._poll_once(job) for job in jobs), return_exceptions=True
+            )
+            # 한 작업의 예기치 않은 오류가 폴링 루프(다른 작업의 폴링·타임아웃)를 멈추지 않도록
+            for job, outcome in zip(jobs, outcomes):
+                if isinstance(outcome, Exception):
+                    metrics.increment("fal.poll_errors")
+                    logger.error("fal poll failed for %s: %r", job.request_id, outcome)
+            if self._jobs:
+                await asyncio.sleep(self.poll_interval)
+
+
+def _log_progress(job: FalJob) -> None:
+    logger.info("fal job %s", job.progress())
+
+
+@lru_cache
+def get_fal_job_manager() -> FalJobManager:
+    """설정 기반 공유 작업 관리자 (FAL_KEY, FAL_QUEUE_URL, FAL_POLL_INTERVAL, FAL_JOB_TIMEOUT)."""
+    settings = get_settings()
+    return FalJobManager(
+        key=settings.fal_key,
+        base_url=settings.fal_queue_url,
+        poll_interval=settings.fal_poll_interval,
+        timeout=settings.fal_job_timeout,
+        on_progress=_log_progress,
+        verify=_build_ssl_context(),
+    )
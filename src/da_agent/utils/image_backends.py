@@ -0,0 +1,468 @@
+"""
+Stage 3a 이미지 생성 백엔드 — fal / Replicate / 로컬(CPU) 교체 가능한 img2img 스타일 변환
+
+- FalBackend: fal 큐(FalJobManager)로 FLUX.1 img2img 실행 (기존 동작)
+- ReplicateBackend: Replicate predictions REST API (제출 → 폴링 → 결과 / 취소)
+- LocalBackend: 외부 호출 없는 결정적 CPU 색보정 — 테스트·벤치마크·오프라인 및 과부하 시 강등 운영용
+
+ImageBackendRouter는 백엔드별 예상 비용 점수로 순위를 매기고 실패 시 다음 순위로 넘깁니다.
+
+  점수 = 최근 지연(초) × (1 + 대기열 깊이) + 이미지당 비용(USD) × cost_weight + 고정 패널티
+
+로컬 백엔드에는 품질 저하를 반영한 고정 패널티(IMAGE_BACKEND_LOCAL_PENALTY)가 붙어,
+원격 백엔드의 예상 대기가 이를 넘을 때만 선택됩니다 (부하 분산). 최근 오류율이 높은
+백엔드는 점수와 무관하게 후순위로 강등합니다.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import logging
+import mimetypes
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+import fal_client
+import httpx
+import numpy as np
+from PIL import Image
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+from da_agent.utils.fal_jobs import FalJobManager, get_fal_job_manager
+from da_agent.utils.http_client import _build_ssl_context
+from da_agent.utils.image_utils import fit_canvas, load_image_scaled
+from da_agent.utils.providers import ProviderStats
+from da_agent.utils.single_flight import coalesce, source_digest
+
+logger = logging.getLogger(__name__)
+
+_MIN_OUTCOMES_FOR_HEALTH = 3
+_HEX_COLOR = re.compile(r"#([0-9a-fA-F]{6})\b")
+
+_REPLICATE_TERMINAL = {"succeeded", "failed", "canceled"}
+
+
+class ImageBackendError(RuntimeError):
+    """이미지 생성 백엔드가 실패했거나 사용 가능한 백엔드가 없을 때 발생합니다."""
+
+
+@dataclass(frozen=True)
+class StyleTransferRequest:
+    image: str                  # 기존 DA 경로/URL
+    prompt: str                 # img2img 변환 프롬프트
+    width: int
+    height: int
+    strength: float = 0.6       # 0=원본 유지, 1=완전 변환
+    group: str | None = None    # 같은 그룹의 이전 작업은 취소 (지원하는 백엔드만)
+
+
+class ImageBackend(ABC):
+    """img2img 스타일 변환 백엔드."""
+
+    name: str = ""
+    cost_per_image: float = 0.0   # USD
+    nominal_seconds: float = 10.0  # 지연 표본이 쌓이기 전 기본 추정치
+    generative: bool = True        # img2img 생성 모델 여부 (로컬 색보정은 False)
+
+    def available(self) -> bool:
+        """자격 증명 등 실행 조건을 갖췄는지 여부."""
+        return True
+
+    def queue_depth(self) -> int:
+        """이 프로세스가 제출해 아직 끝나지 않은 작업 수 (+ 알려진 대기열 위치)."""
+        return 0
+
+    @abstractmethod
+    async def transform(self, request: StyleTransferRequest) -> Image.Image: ...
+
+    async def aclose(self) -> None:
+        return None
+
+
+def _data_uri(path: str) -> str:
+    mime = mimetypes.guess_type(path)[0] or "image/jpeg"
+    with open(path, "rb") as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+
+# ── fal ─────────────────────────────────────────────────────────────────────
+async def _get_fal_image_url(path_or_url: str) -> str:
+    """로컬 파일 경로면 fal.ai에 업로드하고 URL을 반환합니다.
+
+    같은 내용의 동시 업로드는 하나로 합칩니다 (캠페인의 공통 existing_product_da).
+    """
+    if path_or_url.startswith(("http://", "https://")):
+        return path_or_url
+    key = await asyncio.to_thread(source_digest, path_or_url)
+    return await coalesce(
+        "fal_upload", key, lambda: asyncio.to_thread(fal_client.upload_file, path_or_url)
+    )
+
+
+class FalBackend(ImageBackend):
+    name = "fal"
+    cost_per_image = 0.025
+    nominal_seconds = 10.0
+
+    def __init__(
+        self,
+        manager: FalJobManager | None = None,
+        application: str = "fal-ai/flux/dev/image-to-image",
+        key: str | None = None,
+    ):
+        self._manager = manager
+        self.application = application
+        self._key = key
+
+    @property
+    def manager(self) -> FalJobManager:
+        if self._manager is None:
+            self._manager = get_fal_job_manager()
+        return self._manager
+
+    def available(self) -> bool:
+        key = self._key if self._key is not None else get_settings().fal_key
+        return self._manager is not None or bool(key)
+
+    def queue_depth(self) -> int:
+        if self._manager is None:
+            return 0
+        jobs = self._manager.progress()
+        return len(jobs) + max((job["queue_position"] or 0 for job in jobs), default=0)
+
+    async def transform(self, request: StyleTransferRequest) -> Image.Image:
+        fal_url = await _get_fal_image_url(request.image)
+        result = await self.manager.run(
+            self.application,
+            {
+                "image_url": fal_url,
+                "prompt": request.prompt,
+                "strength": request.strength,
+                "image_size": {"width": request.width, "height": request.height},
+                "num_inference_steps": 28,
+                "guidance_scale": 3.5,
+                "num_images": 1,
+                "enable_safety_checker": True,
+            },
+            group=request.group,
+        )
+        image_url = result["images"][0]["url"]
+        # 캔버스 크기로 바로 디코드 — 알파 불필요 (overlay 단계에서 RGBA로 변환)
+        return (await load_image_scaled(image_url, (request.width, request.height))).image
+
+
+# ── Replicate ───────────────────────────────────────────────────────────────
+class ReplicateBackend(ImageBackend):
+    """Replicate predictions API — 제출 후 폴링, 타임아웃·호출자 취소 시 예측도 취소."""
+
+    name = "replicate"
+    cost_per_image = 0.03
+    nominal_seconds = 15.0
+
+    def __init__(
+        self,
+        token: str,
+        model: str = "black-forest-labs/flux-dev",
+        base_url: str = "https://api.replicate.com",
+        poll_interval: float = 1.0,
+        timeout: float = 120.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+        verify: Any = True,
+    ):
+        self.token = token
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._transport = transport
+        self._verify = verify
+        self._client: httpx.AsyncClient | None = None
+        self._in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.token}"},
+                transport=self._transport,
+                verify=self._verify,
+                timeout=30.0,
+            )
+        return self._client
+
+    def available(self) -> bool:
+        return bool(self.token)
+
+    def queue_depth(self) -> int:
+        return self._in_flight
+
+    async def _cancel(self, prediction: dict) -> None:
+        cancel_url = prediction.get("urls", {}).get("cancel")
+        if not cancel_url:
+            return
+        try:
+            await self.client.post(cancel_url)
+        except httpx.HTTPError as exc:
+            logger.warning("replicate cancel failed for %s: %s", prediction.get("id"), exc)
+
+    async def _wait(self, prediction: dict) -> dict:
+        started = time.monotonic()
+        while prediction.get("status") not in _REPLICATE_TERMINAL:
+            if time.monotonic() - started > self.timeout:
+                await self._cancel(prediction)
+                raise ImageBackendError(f"replicate prediction {prediction.get('id')} timed_out")
+            await asyncio.sleep(self.poll_interval)
+            response = await self.client.get(prediction["urls"]["get"])
+            response.raise_for_status()
+            prediction = response.json()
+        return prediction
+
+    async def transform(self, request: StyleTransferRequest) -> Image.Image:
+        image = request.image
+        if not image.startswith(("http://", "https://")):
+            image = await asyncio.to_thread(_data_uri, image)
+
+        self._in_flight += 1
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/v1/models/{self.model}/predictions",
+                json={
+                    "input": {
+                        "image": image,
+                        "prompt": request.prompt,
+                        "prompt_strength": request.strength,
+                        "num_inference_steps": 28,
+                        "guidance": 3.5,
+                        "num_outputs": 1,
+                        "output_format": "png",
+                    }
+                },
+            )
+            response.raise_for_status()
+            prediction = response.json()
+            try:
+                prediction = await self._wait(prediction)
+            except asyncio.CancelledError:
+                await asyncio.shield(self._cancel(prediction))
+                raise
+        finally:
+            self._in_flight -= 1
+
+        if prediction["status"] != "succeeded":
+            raise ImageBackendError(
+                f"replicate prediction {prediction.get('id')} {prediction['status']}: {prediction.get('error')}"
+            )
+        output = prediction["output"]
+        image_url = output[0] if isinstance(output, list) else output
+        scaled = await load_image_scaled(image_url, (request.width, request.height))
+        return fit_canvas(scaled.image, request.width, request.height)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+
+# ── 로컬 (CPU) ──────────────────────────────────────────────────────────────
+# 프롬프트 키워드 → (밝기, 대비, 채도, 색온도) 조정 — 값은 0~1 스케일 기준
+_TONE_KEYWORDS: dict[str, tuple[float, float, float, float]] = {
+    "bright": (0.06, 0.0, 0.0, 0.0),
+    "airy": (0.05, -0.05, -0.05, 0.0),
+    "dark": (-0.06, 0.1, 0.0, 0.0),
+    "moody": (-0.05, 0.12, -0.1, 0.0),
+    "vivid": (0.0, 0.05, 0.25, 0.0),
+    "vibrant": (0.0, 0.05, 0.25, 0.0),
+    "muted": (0.0, -0.05, -0.3, 0.0),
+    "vintage": (0.02, -0.08, -0.25, 0.04),
+    "film": (0.0, -0.05, -0.15, 0.03),
+    "warm": (0.0, 0.0, 0.0, 0.06),
+    "cool": (0.0, 0.0, 0.0, -0.06),
+    "contrast": (0.0, 0.15, 0.0, 0.0),
+}
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _prompt_tint(prompt: str) -> np.ndarray:
+    """프롬프트의 #rrggbb 색상 평균 — 없으면 프롬프트 해시에서 결정적으로 유도."""
+    colors = [
+        [int(h[i:i + 2], 16) for i in (0, 2, 4)] for h in _HEX_COLOR.findall(prompt)
+    ]
+    if not colors:
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=3).digest()
+        colors = [list(digest)]
+    return np.asarray(colors, dtype=np.float32).mean(axis=0) / 255
+
+
+def local_stylize(image: Image.Image, prompt: str, strength: float = 0.6) -> Image.Image:
+    """결정적 CPU 스타일 변환 — 프롬프트 색상으로 색조 이동 + 키워드별 톤 보정.
+
+    같은 입력·프롬프트면 항상 같은 결과를 냅니다 (구도·제품은 그대로, 색감·톤만 변경).
+    """
+    words = set(re.findall(r"[a-z]+", prompt.lower()))
+    brightness = contrast = saturation = warmth = 0.0
+    for word, (b, c, s, w) in _TONE_KEYWORDS.items():
+        if word in words:
+            brightness, contrast, saturation, warmth = (
+                brightness + b, contrast + c, saturation + s, warmth + w,
+            )
+
+    pixels = np.asarray(image.convert("RGB"), dtype=np.float32) / 255
+    luma = pixels @ _LUMA
+
+    # 색조 이동: 밝기는 유지하고 색차(tint - tint 밝기)만 더함
+    tint = _prompt_tint(prompt)
+    pixels = pixels + (tint - tint @ _LUMA) * (strength * 0.5)
+
+    pixels = luma[..., None] + (pixels - luma[..., None]) * (1 + saturation)
+    pixels = (pixels - 0.5) * (1 + contrast) + 0.5 + brightness
+    pixels[..., 0] += warmth
+    pixels[..., 2] -= warmth
+
+    out = np.clip(pixels * 255 + 0.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(out, "RGB")
+
+
+class LocalBackend(ImageBackend):
+    """외부 호출 없는 결정적 CPU 백엔드 (오프라인·테스트·과부하 강등용)."""
+
+    name = "local"
+    cost_per_image = 0.0
+    nominal_seconds = 0.5
+    generative = False
+
+    async def transform(self, request: StyleTransferRequest) -> Image.Image:
+        scaled = await load_image_scaled(request.image, (request.width, request.height))
+
+        def _render() -> Image.Image:
+            canvas = fit_canvas(scaled.image.convert("RGB"), request.width, request.height)
+            return local_stylize(canvas, request.prompt, request.strength)
+
+        return await asyncio.to_thread(_render)
+
+
+# ── 라우터 ──────────────────────────────────────────────────────────────────
+class ImageBackendRouter:
+    """측정 지연·대기열 깊이·비용으로 백엔드 순위를 매기고 실패 시 failover합니다."""
+
+    def __init__(
+        self,
+        backends: list[ImageBackend],
+        cost_weight: float = 100.0,
+        penalties: dict[str, float] | None = None,
+        max_error_rate: float = 0.5,
+        window_seconds: float = 300.0,
+    ):
+        if not backends:
+            raise ValueError("at least one image backend is required")
+        self.backends = backends
+        self.cost_weight = cost_weight
+        self.penalties = penalties or {}
+        self.max_error_rate = max_error_rate
+        self.window_seconds = window_seconds
+        self._stats = {backend.name: ProviderStats() for backend in backends}
+
+    def expected_wait(self, backend: ImageBackend) -> float:
+        """예상 대기 시간 (초) = 최근 지연 × (1 + 대기열 깊이)."""
+        latency = self._stats[backend.name].latency() or backend.nominal_seconds
+        return latency * (1 + backend.queue_depth())
+
+    def expected_img2img_seconds(self) -> float | None:
+        """사용 가능한 img2img 백엔드 중 가장 짧은 예상 대기 (없으면 None)."""
+        waits = [self.expected_wait(b) for b in self.backends if b.generative and b.available()]
+        return min(waits) if waits else None
+
+    def score(self, backend: ImageBackend) -> float:
+        """예상 비용 점수 (초 단위 환산, 낮을수록 우선)."""
+        return (
+            self.expected_wait(backend)
+            + backend.cost_per_image * self.cost_weight
+            + self.penalties.get(backend.name, 0.0)
+        )
+
+    def ranked(self, now: float | None = None) -> list[ImageBackend]:
+        now = time.monotonic() if now is None else now
+
+        def key(backend: ImageBackend):
+            rate, total = self._stats[backend.name].error_rate(now, self.window_seconds)
+            unhealthy = total >= _MIN_OUTCOMES_FOR_HEALTH and rate > self.max_error_rate
+            return unhealthy, self.score(backend)
+
+        return sorted((b for b in self.backends if b.available()), key=key)
+
+    async def transform(self, request: StyleTransferRequest) -> Image.Image:
+        candidates = self.ranked()
+        if not candidates:
+            raise ImageBackendError(
+                f"no image backend available: {[b.name for b in self.backends]}"
+            )
+        last_error: Exception | None = None
+        for backend in candidates:
+            started = time.monotonic()
+            try:
+                image = await backend.transform(request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                elapsed = time.monotonic() - started
+                self._stats[backend.name].record(False, elapsed, time.monotonic())
+                metrics.increment(f"image_backend.{backend.name}.errors")
+                logger.warning("Image backend %s failed (%.1fs): %s", backend.name, elapsed, exc)
+                last_error = exc
+                continue
+            elapsed = time.monotonic() - started
+            self._stats[backend.name].record(True, elapsed, time.monotonic())
+            metrics.increment(f"image_backend.{backend.name}.selected")
+            metrics.observe(f"image_backend.{backend.name}.seconds", elapsed)
+            return fit_canvas(image, request.width, request.height)
+        raise ImageBackendError(f"all image backends failed: {last_error}") from last_error
+
+    def stats(self) -> dict[str, dict]:
+        now = time.monotonic()
+        result = {}
+        for backend in self.backends:
+            rate, total = self._stats[backend.name].error_rate(now, self.window_seconds)
+            result[backend.name] = {
+                "available": backend.available(),
+                "score": round(self.score(backend), 3),
+                "queue_depth": backend.queue_depth(),
+                "error_rate": round(rate, 3),
+                "samples": total,
+            }
+        return result
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            await backend.aclose()
+
+
+def _build_backend(name: str, settings) -> ImageBackend:
+    if name == "fal":
+        return FalBackend()
+    if name == "replicate":
+        return ReplicateBackend(
+            token=settings.replicate_api_token,
+            model=settings.replicate_model,
+            base_url=settings.replicate_base_url,
+            poll_interval=settings.replicate_poll_interval,
+            timeout=settings.replicate_job_timeout,
+            verify=_build_ssl_context(),
+        )
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown image backend: {name!r} (fal | replicate | local)")
+
+
+@lru_cache
+def get_image_backend_router() -> ImageBackendRouter:
+    """IMAGE_BACKENDS 설정 기반 공유 라우터 (기본: fal 단독 — 기존 동작)."""
+    settings = get_settings()
+    return ImageBackendRouter(
+        [_build_backend(name, settings) for name in settings.image_backends],
+        cost_weight=settings.image_backend_cost_weight,
+        penalties={"local": settings.image_backend_local_penalty},
+    )
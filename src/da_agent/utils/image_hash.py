@@ -0,0 +1,67 @@
+"""
+지각 해시 (dHash / pHash) — 리사이즈·재압축된 같은 광고 소재를 식별
+
+- dHash: 9×8 그레이스케일에서 가로 인접 픽셀 밝기 차이의 부호 (64비트)
+- pHash: 32×32 그레이스케일의 2D DCT 저주파 8×8 계수(DC 제외 중앙값 기준) 부호 (64비트)
+
+축소·그레이스케일 변환만 Pillow로 하고, 차분·DCT·비트 패킹은 NumPy로 계산합니다.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+_HASH_SIDE = 8
+_PHASH_SIDE = 32
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    phash: int
+    dhash: int
+
+    def distance(self, other: "ImageFingerprint") -> tuple[int, int]:
+        """(pHash 해밍 거리, dHash 해밍 거리)"""
+        return hamming(self.phash, other.phash), hamming(self.dhash, other.dhash)
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _grayscale(image: Image.Image, size: tuple[int, int]) -> np.ndarray:
+    return np.asarray(image.convert("L").resize(size, Image.LANCZOS), dtype=np.float32)
+
+
+def dhash(image: Image.Image) -> int:
+    pixels = _grayscale(image, (_HASH_SIDE + 1, _HASH_SIDE))
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+@lru_cache(maxsize=1)
+def _dct_matrix(n: int) -> np.ndarray:
+    """직교 DCT-II 행렬 (D @ x = x의 1D DCT)."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+def phash(image: Image.Image) -> int:
+    pixels = _grayscale(image, (_PHASH_SIDE, _PHASH_SIDE))
+    dct = _dct_matrix(_PHASH_SIDE)
+    low = (dct @ pixels @ dct.T)[:_HASH_SIDE, :_HASH_SIDE]
+    median = np.median(low.ravel()[1:])  # DC 성분은 전체 밝기라 기준에서 제외
+    return _pack_bits(low > median)
+
+
+def fingerprint(image: Image.Image) -> ImageFingerprint:
+    return ImageFingerprint(phash=phash(image), dhash=dhash(image))
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import io
+from dataclasses import dataclass, replace
+from functools import lru_cache
 from pathlib import Path
 
 import httpx
-from PIL import Image, ImageDraw, ImageFont
-from rembg import new_session, remove as rembg_remove
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from da_agent.utils.background_removal import apply_mask, get_background_remover
+from da_agent.utils.single_flight import coalesce
 
 # 한글 폰트 경로 — 프로젝트 루트 기준 assets/fonts/
 _FONT_DIR = Path(__file__).parent.parent.parent.parent / "assets/fonts"
@@ -14,8 +19,12 @@ _FONT_REGULAR = _FONT_DIR / "NanumGothic.ttf"
 _FONT_BOLD = _FONT_DIR / "NanumGothicBold.ttf"
 
 
+@lru_cache(maxsize=256)
 def _load_korean_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
-    """한글 지원 폰트를 로드합니다. 폰트 파일이 없으면 Pillow 기본 폰트로 fallback."""
+    """한글 지원 폰트를 로드합니다. 폰트 파일이 없으면 Pillow 기본 폰트로 fallback.
+
+    (size, bold)별로 캐시 — 자동 맞춤 탐색 중 같은 크기를 반복 로드하지 않도록.
+    """
     font_path = _FONT_BOLD if bold else _FONT_REGULAR
     if font_path.exists():
         return ImageFont.truetype(str(font_path), size=size)
@@ -23,12 +32,77 @@ def _load_korean_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
     return ImageFont.load_default(size=size)
 
 
+# OpenAI Vision detail=high 처리 한계: 2048px 정사각형에 맞춘 뒤 짧은 변 768px로 축소
+_VISION_MAX_SIDE = 2048
+_VISION_SHORT_SIDE = 768
+
+
+@dataclass
+class ScaledImage:
+    """decode_image 결과 — 목표 크기에 맞춘 이미지와 실제 디코드 해상도."""
+
+    image: Image.Image
+    decoded_size: tuple[int, int]    # draft/reduce 후 실제로 디코드된 해상도
+    original_size: tuple[int, int]   # 원본 파일 해상도
+    format: str | None = None        # 원본 파일 포맷 (모드 변환 후에도 유지)
+
+
+def decode_image(
+    source: bytes | str | Path,
+    target_size: tuple[int, int] | None = None,
+    need_alpha: bool = False,
+) -> ScaledImage:
+    """이미지를 목표 크기 근처 해상도로 직접 디코드합니다.
+
+    - JPEG: draft 모드로 DCT 단계에서 1/2·1/4·1/8 축소 디코드 (전체 해상도 디코드 생략)
+    - 그 외: 목표의 2배 이상 크면 reduce()로 정수 배율 박스 축소
+    - 두 경우 모두 결과는 가로·세로 모두 목표 이상 — 최종 리샘플링은 호출부(overlay 등)가 담당
+    - 알파가 필요하거나 원본에 투명도가 있을 때만 RGBA, 그 외에는 RGB
+
+    Args:
+        source: 이미지 바이트 또는 로컬 파일 경로
+        target_size: 최종 사용 크기 (너비, 높이) — None이면 원본 해상도
+        need_alpha: True면 항상 RGBA로 반환
+    """
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    original_size = image.size
+    source_format = image.format
+
+    if target_size is not None:
+        tw, th = max(1, target_size[0]), max(1, target_size[1])
+        if image.format == "JPEG":
+            image.draft("RGB", (tw, th))  # 요청 크기 이상을 유지하는 최대 축소 배율 선택
+        else:
+            factor = min(image.width // tw, image.height // th)
+            if factor >= 2:
+                image = image.reduce(factor)
+    image.load()
+    decoded_size = image.size
+
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    mode = "RGBA" if need_alpha or has_alpha else "RGB"
+    if image.mode != mode:
+        image = image.convert(mode)
+    return ScaledImage(
+        image=image, decoded_size=decoded_size, original_size=original_size, format=source_format
+    )
+
+
+def _vision_target(width: int, height: int) -> tuple[int, int] | None:
+    """Vision API가 실제로 사용하는 해상도 (이미 그 이하이면 None)."""
+    scale = min(1.0, _VISION_MAX_SIDE / max(width, height))
+    scale *= min(1.0, _VISION_SHORT_SIDE / (min(width, height) * scale))
+    if scale >= 1.0:
+        return None
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
 
 def prepare_image_for_api(path_or_url: str) -> str:
     """파일 경로 또는 URL을 OpenAI Vision API가 수락하는 형식으로 변환합니다.
 
     - HTTPS/HTTP URL → 그대로 반환
     - 로컬 파일 경로 → base64 data URL로 변환 (jpg/png/gif/webp 지원)
+      Vision이 어차피 축소하는 큰 이미지는 그 해상도로 디코드·JPEG 재인코딩해 업로드 크기 절감
     """
     if path_or_url.startswith(("http://", "https://")):
         return path_or_url
@@ -42,26 +116,83 @@ def prepare_image_for_api(path_or_url: str) -> str:
         ".webp": "image/webp",
     }
     mime = mime_map.get(path.suffix.lower(), "image/jpeg")
-    b64 = base64.b64encode(path.read_bytes()).decode("utf-8")
+    data = path.read_bytes()
+
+    with Image.open(io.BytesIO(data)) as probe:  # 헤더만 읽음
+        target = _vision_target(*probe.size) if mime != "image/gif" else None
+    if target is not None:
+        image = decode_image(data, target).image
+        image.thumbnail(target, Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=90)
+        data, mime = buffer.getvalue(), "image/jpeg"
+
+    b64 = base64.b64encode(data).decode("utf-8")
     return f"data:{mime};base64,{b64}"
 
+
+async def _read_source(path_or_url: str) -> bytes | str:
+    if path_or_url.startswith(("http://", "https://")):
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.get(path_or_url)
+            response.raise_for_status()
+        return response.content
+    return path_or_url
+
+
 async def download_image(url: str) -> Image.Image:
     """URL에서 이미지를 다운로드하여 PIL Image로 반환합니다."""
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-    return Image.open(io.BytesIO(response.content)).convert("RGBA")
+    source = await _read_source(url)
+    return (await asyncio.to_thread(decode_image, source, need_alpha=True)).image
 
 
 async def load_image(path_or_url: str) -> Image.Image:
-    """로컬 파일 경로 또는 URL에서 PIL Image를 로드합니다.
+    """로컬 파일 경로 또는 URL에서 PIL Image를 로드합니다 (원본 해상도, RGBA).
 
     - HTTPS/HTTP URL → httpx로 다운로드
     - 로컬 파일 경로 → PIL로 직접 열기
+    파일 읽기·디코드는 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+    같은 경로·URL의 동시 로드는 다운로드·디코드를 한 번만 하고 합류한 호출은 사본을 받습니다.
     """
-    if path_or_url.startswith(("http://", "https://")):
-        return await download_image(path_or_url)
-    return Image.open(path_or_url).convert("RGBA")
+    async def _load() -> Image.Image:
+        source = await _read_source(path_or_url)
+        return (await asyncio.to_thread(decode_image, source, need_alpha=True)).image
+
+    return await coalesce(
+        "load_image", ("load_image", path_or_url), _load, share=lambda image: image.copy()
+    )
+
+
+async def load_image_scaled(
+    path_or_url: str,
+    target_size: tuple[int, int],
+    need_alpha: bool = False,
+) -> ScaledImage:
+    """목표 크기에 맞춰 디코드합니다 (로고·캔버스 등 축소해서 쓰는 입력용). decode_image 참고."""
+    async def _load() -> ScaledImage:
+        source = await _read_source(path_or_url)
+        return await asyncio.to_thread(decode_image, source, target_size, need_alpha=need_alpha)
+
+    return await coalesce(
+        "load_image",
+        ("load_image_scaled", path_or_url, tuple(target_size), need_alpha),
+        _load,
+        share=lambda scaled: replace(scaled, image=scaled.image.copy()),
+    )
+
+
+def fit_canvas(image: Image.Image, width: int, height: int) -> Image.Image:
+    """캔버스 크기와 다르면 중앙 기준 cover 크롭·리사이즈합니다."""
+    if image.size == (width, height):
+        return image
+    return ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+
+@lru_cache(maxsize=8192)
+def _text_width(font: ImageFont.FreeTypeFont, text: str) -> int:
+    """렌더링 너비(px) — 폰트 객체는 _load_korean_font 캐시로 재사용되므로 (폰트, 문자열)로 캐시."""
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0]
 
 
 def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[str]:
@@ -79,7 +210,7 @@ def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[
 
     for word in text.split(" "):
         candidate = (current_line + " " + word).strip() if current_line else word
-        w = font.getbbox(candidate)[2] - font.getbbox(candidate)[0]
+        w = _text_width(font, candidate)
 
         if w <= max_width:
             current_line = candidate
@@ -90,12 +221,12 @@ def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[
                 current_line = ""
 
             # 어절 자체가 max_width 초과 → 글자 단위 강제 분할
-            word_w = font.getbbox(word)[2] - font.getbbox(word)[0]
+            word_w = _text_width(font, word)
             if word_w > max_width:
                 char_buf = ""
                 for char in word:
                     test = char_buf + char
-                    if font.getbbox(test)[2] - font.getbbox(test)[0] <= max_width:
+                    if _text_width(font, test) <= max_width:
                         char_buf = test
                     else:
                         if char_buf:
@@ -110,6 +241,7 @@ def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[
     return lines if lines else [""]
 
 
+@lru_cache(maxsize=4096)
 def measure_text_height(
     text: str,
     max_width: int,
@@ -125,6 +257,86 @@ def measure_text_height(
     return len(lines) * line_height
 
 
+@dataclass(frozen=True)
+class FittedText:
+    """fit_text_block 결과 — 선택된 폰트 크기와 각 블록 높이."""
+
+    headline_size: int
+    sub_size: int
+    cta_size: int
+    headline_height: int
+    sub_height: int
+    cta_height: int
+    total_height: int
+    fits: bool
+
+
+def _text_block_layout(
+    headline: str,
+    subheadline: str,
+    cta: str,
+    max_width: int,
+    cta_max_width: int,
+    sizes: tuple[int, int, int],
+    text_gap: int,
+    cta_gap: int,
+) -> tuple[FittedText, bool]:
+    headline_size, sub_size, cta_size = sizes
+    headline_h = measure_text_height(headline, max_width, font_size=headline_size, bold=True)
+    sub_h = measure_text_height(subheadline, max_width, font_size=sub_size, bold=False)
+    cta_h = cta_size * 2  # CTA 버튼 높이 = 글자 크기의 2배 (26px → 52px)
+    total = headline_h + text_gap + sub_h + cta_gap + cta_h
+    cta_fits = _text_width(_load_korean_font(cta_size, bold=True), cta) <= cta_max_width
+    fitted = FittedText(headline_size, sub_size, cta_size, headline_h, sub_h, cta_h, total, False)
+    return fitted, cta_fits
+
+
+def fit_text_block(
+    headline: str,
+    subheadline: str,
+    cta: str,
+    max_width: int,
+    max_height: int,
+    max_sizes: tuple[int, int, int] = (52, 30, 26),
+    min_sizes: tuple[int, int, int] = (14, 11, 11),
+    cta_max_width: int | None = None,
+    text_gap: int = 12,
+    cta_gap: int = 16,
+) -> FittedText:
+    """헤드라인·서브카피·CTA가 영역(max_width × max_height)에 들어가는 최대 폰트 크기를 찾습니다.
+
+    세 요소의 크기 비율(max_sizes)을 유지한 채 배율을 이진 탐색합니다. 측정은
+    measure_text_height / _wrap_text 캐시를 사용하므로 탐색 한 번의 비용이 작습니다.
+    최소 크기에서도 넘치면 최소 크기를 fits=False로 반환합니다.
+    """
+    cta_max_width = max_width if cta_max_width is None else cta_max_width
+
+    def sizes_at(step: int) -> tuple[int, int, int]:
+        # step: 0(최소) ~ max_sizes[0](최대) — 헤드라인 px 기준 배율
+        scale = step / max_sizes[0]
+        return tuple(max(lo, round(hi * scale)) for hi, lo in zip(max_sizes, min_sizes))
+
+    def probe(step: int) -> tuple[FittedText, bool]:
+        fitted, cta_fits = _text_block_layout(
+            headline, subheadline, cta, max_width, cta_max_width,
+            sizes_at(step), text_gap, cta_gap,
+        )
+        return fitted, cta_fits and fitted.total_height <= max_height
+
+    lo, hi = min_sizes[0], max_sizes[0]
+    best, ok = probe(lo)
+    if not ok:
+        return best
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        fitted, ok = probe(mid)
+        if ok:
+            lo, best = mid, fitted
+        else:
+            hi = mid - 1
+    return replace(best, fits=True)
+
+
 def overlay_text(
     image: Image.Image,
     text: str,
@@ -227,17 +439,14 @@ def overlay_cta_button(
     return Image.alpha_composite(img, overlay)
 
 
-# rembg 세션은 프로세스 당 한 번만 생성 (모델 재로드 방지)
-_rembg_session = new_session("u2net")
-
-
 def remove_background(image: Image.Image) -> Image.Image:
     """제품 이미지의 배경을 자동으로 제거하여 투명 PNG로 반환합니다.
 
     u2net 모델을 사용하며, 첫 실행 시 모델을 다운로드합니다 (~170MB).
-    이후 실행은 캐시에서 즉시 로드됩니다.
+    공유 배경 제거 워커의 세션 풀·마스크 캐시를 사용합니다 — 이벤트 루프 안에서는
+    get_background_remover().cutout() / mask()로 배치 추론을 이용하세요.
     """
-    return rembg_remove(image, session=_rembg_session)
+    return apply_mask(image, get_background_remover().mask_sync(image))
 
 
 def overlay_product(
@@ -247,6 +456,7 @@ def overlay_product(
     y: int,
     width: int,
     height: int,
+    mask: Image.Image | None = None,
 ) -> Image.Image:
     """실제 제품 이미지를 지정 영역(product_bbox)에 합성합니다.
 
@@ -254,9 +464,10 @@ def overlay_product(
     - bbox를 캔버스 경계 내로 클램핑 (제품 잘림 방지)
     - 영역 중앙 정렬
     - PNG 투명 배경 지원
+    - mask: 배경 제거 워커의 알파 마스크 (같은 제품의 모든 배치에 재사용)
     """
     img = image.copy().convert("RGBA")
-    product_rgba = product.convert("RGBA")
+    product_rgba = apply_mask(product, mask) if mask is not None else product.convert("RGBA")
 
     # bbox를 캔버스 경계 내로 클램핑
     x = max(0, x)
@@ -0,0 +1,354 @@
+"""
+공유 모델 호출 레이어 — 스키마 강제 구조화 출력
+
+모든 스테이지의 chat.completions 호출은 call_structured()를 거칩니다.
+
+- pydantic 모델에서 strict JSON schema(response_format=json_schema)를 생성해 전송
+- 응답 검증 실패 시 로컬 복구(코드펜스·앞뒤 잡음 제거, 후행 쉼표, 잘린 괄호·문자열 닫기)
+- 복구도 실패하면 해당 호출만 재전송 (최대 structured_max_retries회,
+  finish_reason=length로 잘린 경우 max_tokens를 두 배로 늘려 재시도)
+- 검증 실패·복구·재시도 횟수를 스테이지별 메트릭으로 기록
+- (옵트인, LLM_HEDGING) 스테이지별 지연 백분위를 온라인으로 학습해, 그 시간을 넘긴
+  호출은 복제 요청(hedge)을 보내고 먼저 도착한 응답을 채택 — 나머지는 취소.
+  전역 예산(LLM_HEDGE_BUDGET)이 전체 호출 대비 hedge 비율을 제한
+- (옵트인, LLM_ROUTES) 스테이지별 프로바이더 라우팅·failover — utils/providers.py
+- 같은 스테이지·요청 본문의 동시 호출은 하나로 합침 (SINGLE_FLIGHT_ENABLED) — utils/single_flight.py
+- 실행 데드라인(utils/deadline.py)이 있으면 남은 시간을 호출 타임아웃으로 사용 — 재시도도 그 안에서만
+- 호출마다 프롬프트 토큰과 프로바이더 프롬프트 캐시 적중 토큰(cached_tokens)을 스테이지별로 기록
+  — 캠페인 고정 접두사(utils/prompts.py)의 캐시 절감 효과 측정용
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+from da_agent.utils.deadline import within_deadline
+from da_agent.utils.providers import get_provider_router
+from da_agent.utils.single_flight import coalesce, request_digest
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_MAX_TOKENS_CEILING = 8192
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+class StructuredOutputError(ValueError):
+    """재시도 후에도 응답이 스키마를 만족하지 못할 때 발생합니다."""
+
+
+# ── JSON schema ───────────────────────────────────────────────────────────────
+
+def _strictify(node: Any) -> Any:
+    """pydantic JSON schema를 OpenAI strict 모드 규칙에 맞게 변환합니다."""
+    if isinstance(node, list):
+        return [_strictify(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return {"$ref": node["$ref"]}  # strict 모드는 $ref 형제 키워드를 허용하지 않음
+    node = {k: _strictify(v) for k, v in node.items() if k not in ("title", "default")}
+    if node.get("type") == "object" and "properties" in node:
+        node["required"] = list(node["properties"])
+        node["additionalProperties"] = False
+    return node
+
+
+def json_schema_format(
+    model_cls: type[BaseModel],
+    *,
+    exclude: tuple[str, ...] = (),
+    extra_properties: dict[str, dict] | None = None,
+) -> dict:
+    """pydantic 모델로부터 strict json_schema response_format을 생성합니다.
+
+    Args:
+        model_cls: 응답 스키마 모델
+        exclude: 모델이 로컬에서 채우는 필드 (스키마에서 제외)
+        extra_properties: 모델에는 없지만 응답에 요구할 필드 (예: 추론 근거 한 줄)
+    """
+    schema = copy.deepcopy(model_cls.model_json_schema())
+    for name in exclude:
+        schema["properties"].pop(name, None)
+    if extra_properties:
+        schema["properties"].update(extra_properties)
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model_cls.__name__,
+            "strict": True,
+            "schema": _strictify(schema),
+        },
+    }
+
+
+# ── 파싱 · 로컬 복구 ───────────────────────────────────────────────────────────
+
+def repair_json(text: str) -> str:
+    """흔한 JSON 손상을 로컬에서 복구합니다 (모델 재호출 없음)."""
+    text = _CODE_FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start == -1:
+        return text
+    text = text[start:]
+
+    # 잘린 응답: 열린 문자열·괄호를 닫는다
+    stack: list[str] = []
+    in_string = escaped = False
+    end = len(text)
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                end = i + 1  # 최상위 객체 종료 — 뒤따르는 잡음은 버린다
+                break
+    text = text[:end]
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(":"):
+        text += " null"
+    text += "".join(reversed(stack))
+    return _TRAILING_COMMA.sub(r"\1", text)
+
+
+def parse_structured(model_cls: type[ModelT], content: str | None, stage: str = "") -> ModelT:
+    """응답 본문을 검증하고, 실패하면 로컬 복구 후 한 번 더 검증합니다.
+
+    Raises:
+        StructuredOutputError: 복구 후에도 검증 실패
+    """
+    label = stage or model_cls.__name__
+    try:
+        return model_cls.model_validate_json(content or "")
+    except ValidationError:
+        pass
+    try:
+        result = model_cls.model_validate_json(repair_json(content or ""))
+    except ValidationError as exc:
+        metrics.increment(f"llm.validation_failures.{label}")
+        raise StructuredOutputError(f"{label}: response failed schema validation — {exc}") from exc
+    metrics.increment(f"llm.repaired.{label}")
+    logger.info("Repaired malformed %s response locally", label)
+    return result
+
+
+# ── Hedging ────────────────────────────────────────────────────────────────────
+
+class HedgePolicy:
+    """스테이지별 지연 분포(최근 window개)와 전역 hedge 예산을 관리합니다."""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget_ratio: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self._latencies: dict[str, deque[float]] = {}
+        self._window = window
+        self._calls = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+
+    def threshold(self, stage: str) -> float | None:
+        """hedge 발사 기준 시간 (표본 부족 시 None → hedge 안 함)."""
+        with self._lock:
+            samples = self._latencies.get(stage)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(int(self.percentile * len(ordered)), len(ordered) - 1)]
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self._window)).append(seconds)
+
+    def note_call(self) -> None:
+        with self._lock:
+            self._calls += 1
+
+    def try_acquire(self) -> bool:
+        """hedge 예산 확인 — 누적 hedge 수가 전체 호출의 budget_ratio를 넘지 않도록."""
+        with self._lock:
+            if self._hedges + 1 > self.budget_ratio * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+
+@lru_cache
+def get_hedge_policy() -> HedgePolicy | None:
+    """설정된 hedge 정책 (LLM_HEDGING=false면 None)."""
+    settings = get_settings()
+    if not settings.llm_hedging:
+        return None
+    return HedgePolicy(
+        percentile=settings.llm_hedge_percentile,
+        budget_ratio=settings.llm_hedge_budget,
+        min_samples=settings.llm_hedge_min_samples,
+    )
+
+
+async def _send(client, request: dict, stage: str):
+    """LLM_ROUTES에 스테이지 라우트가 있으면 프로바이더 라우터로, 없으면 주어진 클라이언트로 전송."""
+    router = get_provider_router()
+    if router is not None and router.routes_for(stage):
+        return await router.create(request, stage)
+    return await client.chat.completions.create(**request)
+
+
+async def _create(client, request: dict, stage: str):
+    """단일 모델 호출 — hedge 정책이 있으면 지연 꼬리 구간에서 복제 요청을 보냅니다.
+
+    지연 표본은 첫 전송부터 결과(성공·실패)까지의 전체 대기 시간 — hedge가 이겨도 임계값
+    대기가 포함되므로 학습된 분위수가 복제 요청의 지연 쪽으로 내려가지 않습니다.
+    """
+    policy = get_hedge_policy()
+    if policy is None:
+        return await _send(client, request, stage)
+
+    policy.note_call()
+    threshold = policy.threshold(stage)
+    started = time.perf_counter()
+    primary = asyncio.create_task(_send(client, request, stage))
+    tasks = {primary}
+    cancelled = False
+    try:
+        if threshold is not None:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done and policy.try_acquire():
+                metrics.increment(f"llm.hedges.{stage}")
+                logger.info("Hedging %s call after %.2fs", stage, threshold)
+                tasks.add(asyncio.create_task(_send(client, request, stage)))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics.increment(f"llm.hedge_wins.{stage}")
+                    return task.result()
+        return primary.result()  # 모두 실패 — primary 예외 전파
+    except asyncio.CancelledError:
+        cancelled = True   # 호출자 취소(데드라인 등)는 모델 지연이 아니므로 기록하지 않음
+        raise
+    finally:
+        if not cancelled:
+            policy.record(stage, time.perf_counter() - started)
+        losers = [task for task in tasks if not task.done()]
+        for task in losers:
+            task.cancel()
+        await asyncio.gather(*losers, return_exceptions=True)
+
+
+# ── 사용량 ─────────────────────────────────────────────────────────────────────
+
+def cached_prompt_tokens(response: Any) -> int:
+    """응답 usage의 프롬프트 캐시 적중 토큰 수 (usage.prompt_tokens_details.cached_tokens)."""
+    details = getattr(getattr(response, "usage", None), "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    return cached if isinstance(cached, int) else 0
+
+
+def _record_usage(stage: str, response: Any) -> None:
+    prompt_tokens = getattr(getattr(response, "usage", None), "prompt_tokens", None)
+    if not isinstance(prompt_tokens, int):
+        return
+    cached = cached_prompt_tokens(response)
+    metrics.increment(f"llm.prompt_tokens.{stage}", prompt_tokens)
+    metrics.increment(f"llm.cached_tokens.{stage}", cached)
+    metrics.observe(f"llm.cache_hit_ratio.{stage}", cached / prompt_tokens if prompt_tokens else 0.0)
+    logger.debug("%s call: prompt_tokens=%d cached_tokens=%d", stage, prompt_tokens, cached)
+
+
+async def _create_recorded(client, request: dict, stage: str):
+    response = await _create(client, request, stage)
+    _record_usage(stage, response)
+    return response
+
+
+# ── 호출 ───────────────────────────────────────────────────────────────────────
+
+async def call_structured(
+    client,
+    request: dict,
+    model_cls: type[ModelT],
+    *,
+    stage: str,
+    max_retries: int | None = None,
+) -> tuple[ModelT, Any]:
+    """chat.completions 호출 → 스키마 검증 → (필요 시) 해당 호출만 재시도.
+
+    Args:
+        client: AsyncOpenAI 호환 클라이언트
+        request: chat.completions.create 인자 (response_format 포함)
+        model_cls: 응답을 검증할 pydantic 모델
+        stage: 메트릭·로그용 스테이지 이름
+        max_retries: 검증 실패 시 재전송 횟수 (기본 settings.structured_max_retries)
+
+    Returns:
+        (검증된 모델, 마지막 원본 응답) — 원본은 usage 로깅 등에 사용
+    """
+    if max_retries is None:
+        max_retries = get_settings().structured_max_retries
+    request = dict(request)
+    last_error: Exception | None = None
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            metrics.increment(f"llm.retries.{stage}")
+            logger.warning("Retrying %s call (%d/%d): %s", stage, attempt, max_retries, last_error)
+        sent = dict(request)
+        response = await within_deadline(
+            coalesce(
+                "llm", request_digest(stage, sent), lambda: _create_recorded(client, sent, stage)
+            ),
+            stage,
+        )
+        choice = response.choices[0]
+        refusal = getattr(choice.message, "refusal", None)
+        if isinstance(refusal, str) and refusal:
+            metrics.increment(f"llm.refusals.{stage}")
+            raise StructuredOutputError(f"{stage}: model refused — {refusal}")
+        try:
+            return parse_structured(model_cls, choice.message.content, stage), response
+        except StructuredOutputError as exc:
+            last_error = exc
+            if getattr(choice, "finish_reason", None) == "length" and request.get("max_tokens"):
+                request["max_tokens"] = min(request["max_tokens"] * 2, _MAX_TOKENS_CEILING)
+
+    raise StructuredOutputError(
+        f"{stage}: no valid response after {max_retries + 1} attempts"
+    ) from last_error
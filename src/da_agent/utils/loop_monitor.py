@@ -0,0 +1,130 @@
+"""
+이벤트 루프 지연·정지 감시 (옵트인: LOOP_MONITOR_ENABLED / CLI --monitor-loop)
+
+한 프로세스에서 수십 개 파이프라인을 동시에 돌리면, 루프 스레드에서 실행되는 동기 호출
+(파일 읽기, 이미지 디코드 등) 하나가 모든 파이프라인을 함께 멈춥니다.
+
+- 하트비트 코루틴: interval마다 깨어나 예정 시각 대비 지연(lag)을 event_loop.lag_seconds로 기록
+- 감시 스레드: 하트비트가 threshold 넘게 갱신되지 않으면 루프 스레드의 현재 스택을 캡처해
+  경고 로그로 남김 (루프를 막고 있는 콜백의 위치) — 정지 1회당 한 번만 기록
+
+스택은 정지가 진행 중일 때 캡처되므로 막고 있는 코드 자체를 가리킵니다.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_MAX_STALLS = 100
+
+
+@dataclass
+class LoopStall:
+    started_at: float        # time.monotonic() 기준 마지막 하트비트 시각
+    duration: float          # 하트비트가 재개될 때까지의 정지 시간 (진행 중이면 캡처 시점까지)
+    stack: str               # 정지 중 캡처한 루프 스레드 스택
+
+
+class LoopMonitor:
+    """이벤트 루프 지연을 측정하고 threshold를 넘는 정지를 스택과 함께 기록합니다."""
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque[LoopStall] = deque(maxlen=_MAX_STALLS)
+        self.max_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._reported_beat: float | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """실행 중인 이벤트 루프에서 하트비트와 감시 스레드를 시작합니다."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.observe("event_loop.lag_seconds", lag)
+            if self._reported_beat == self._last_beat and self.stalls:
+                self.stalls[-1].duration = now - self._last_beat   # 정지 종료 — 실제 길이로 갱신
+            self._last_beat = now
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold or self._reported_beat == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)  # noqa: SLF001
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self._reported_beat = beat
+            self.stalls.append(LoopStall(started_at=beat, duration=stalled, stack=stack))
+            metrics.increment("event_loop.stalls")
+            logger.warning(
+                "Event loop blocked for %.0f ms (threshold %.0f ms):\n%s",
+                stalled * 1000, self.threshold * 1000, stack,
+            )
+
+
+def get_loop_monitor() -> LoopMonitor | None:
+    """LOOP_MONITOR_ENABLED일 때만 LoopMonitor를 반환합니다 (비활성화 시 None → 비용 없음)."""
+    settings = get_settings()
+    if not settings.loop_monitor_enabled:
+        return None
+    return LoopMonitor(
+        threshold=settings.loop_stall_threshold_ms / 1000,
+        interval=settings.loop_monitor_interval_ms / 1000,
+    )
+
+
+@asynccontextmanager
+async def monitor_event_loop():
+    """블록 동안 이벤트 루프를 감시합니다 (비활성화 시 None을 yield하고 아무것도 하지 않음)."""
+    monitor = get_loop_monitor()
+    if monitor is None:
+        yield None
+        return
+    monitor.start()
+    try:
+        yield monitor
+    finally:
+        await monitor.stop()
+        logger.info(
+            "Event loop monitor: max lag %.1f ms, %d stall(s) over %.0f ms",
+            monitor.max_lag * 1000, len(monitor.stalls), monitor.threshold * 1000,
+        )
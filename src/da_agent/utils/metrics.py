@@ -0,0 +1,54 @@
+"""
+프로세스 내 경량 메트릭 레지스트리
+
+카운터(increment)와 관측값 요약(observe: count/sum/min/max)을 이름별로 누적합니다.
+외부 모니터링 연동 전까지 snapshot()으로 로그·벤치마크에서 조회합니다.
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters: dict[str, float] = defaultdict(float)
+_observations: dict[str, dict[str, float]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """카운터를 value만큼 증가시킵니다."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float) -> None:
+    """관측값을 누적합니다 (count / sum / min / max)."""
+    with _lock:
+        stats = _observations.get(name)
+        if stats is None:
+            _observations[name] = {"count": 1, "sum": value, "min": value, "max": value}
+            return
+        stats["count"] += 1
+        stats["sum"] += value
+        stats["min"] = min(stats["min"], value)
+        stats["max"] = max(stats["max"], value)
+
+
+def counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot() -> dict[str, dict]:
+    """현재 메트릭 스냅샷을 반환합니다 (관측값에는 mean 포함)."""
+    with _lock:
+        observations = {
+            name: {**stats, "mean": stats["sum"] / stats["count"]}
+            for name, stats in _observations.items()
+        }
+        return {"counters": dict(_counters), "observations": observations}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _observations.clear()
@@ -0,0 +1,151 @@
+"""
+스테이지별 프로파일링 훅 (옵트인: PROFILE_ENABLED / CLI --profile)
+
+파이프라인의 각 스테이지를 cProfile + tracemalloc + 스택 샘플러로 감싸고,
+실행(run_id)·반복(iteration)별로 다음 파일을 남깁니다.
+
+  {profile_dir}/{run_id}/{iteration:02d}_{stage}.prof       — pstats 원본 (snakeviz 등)
+  {profile_dir}/{run_id}/{iteration:02d}_{stage}.txt        — 누적 시간 상위 함수
+  {profile_dir}/{run_id}/{iteration:02d}_{stage}.alloc.txt  — 스테이지 중 증가한 할당 상위
+  {profile_dir}/{run_id}/{iteration:02d}_{stage}.collapsed  — 샘플링 스택 (flamegraph.pl / speedscope)
+
+스테이지는 await를 포함하므로 프로파일에는 같은 이벤트 루프에서 동시에 실행된 다른
+코루틴도 섞일 수 있습니다 — 정확한 분석은 --concurrency 1 또는 단건 실행을 권장합니다.
+비활성화 시 get_run_profiler()가 None을 반환하고 파이프라인은 훅을 전혀 거치지 않습니다.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from da_agent.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_TOP_FUNCTIONS = 40
+_TOP_ALLOCATIONS = 25
+
+# cProfile은 프로세스당 하나만 활성화할 수 있음 (동시 실행 중인 다른 스테이지는 샘플러만 사용)
+_cprofile_lock = threading.Lock()
+
+# tracemalloc은 동시에 열린 스테이지가 모두 끝날 때까지 유지 (참조 카운트)
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _acquire_tracing() -> None:
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(16)
+        _tracing_users += 1
+
+
+def _release_tracing() -> None:
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+class _StackSampler(threading.Thread):
+    """대상 스레드의 호출 스택을 주기적으로 수집해 collapsed 형식으로 집계합니다."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # noqa: SLF001
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class RunProfiler:
+    """한 파이프라인 실행의 스테이지별 프로파일을 기록합니다."""
+
+    def __init__(self, out_dir: str | Path, run_id: str, sample_interval: float = 0.005):
+        self.out_dir = Path(out_dir) / run_id
+        self.run_id = run_id
+        self.sample_interval = sample_interval
+
+    @contextmanager
+    def stage(self, name: str, iteration: int = 0):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.out_dir / f"{iteration:02d}_{name}"
+
+        _acquire_tracing()
+        before = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile() if _cprofile_lock.acquire(blocking=False) else None
+        sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        if profiler is not None:
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_lock.release()
+            sampler.stop()
+            after = tracemalloc.take_snapshot()
+            _release_tracing()
+            self._dump(prefix, name, iteration, elapsed, profiler, sampler, before, after)
+
+    def _dump(self, prefix, name, iteration, elapsed, profiler, sampler, before, after) -> None:
+        header = f"run_id={self.run_id} iteration={iteration} stage={name} wall={elapsed:.3f}s\n\n"
+
+        if profiler is not None:
+            profiler.dump_stats(f"{prefix}.prof")
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(_TOP_FUNCTIONS)
+            Path(f"{prefix}.txt").write_text(header + text.getvalue(), encoding="utf-8")
+
+        stats = after.compare_to(before, "lineno")[:_TOP_ALLOCATIONS]
+        Path(f"{prefix}.alloc.txt").write_text(
+            header + "\n".join(str(stat) for stat in stats) + "\n", encoding="utf-8"
+        )
+
+        Path(f"{prefix}.collapsed").write_text(
+            "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common()),
+            encoding="utf-8",
+        )
+        logger.info("Profile written: %s (%.3fs)", prefix, elapsed)
+
+
+def get_run_profiler(run_id: str) -> RunProfiler | None:
+    """PROFILE_ENABLED일 때만 RunProfiler를 반환합니다 (비활성화 시 None → 비용 없음)."""
+    settings = get_settings()
+    if not settings.profile_enabled:
+        return None
+    return RunProfiler(
+        settings.profile_dir,
+        run_id,
+        sample_interval=settings.profile_sample_interval_ms / 1000,
+    )
@@ -0,0 +1,90 @@
+"""
+프롬프트 캐시 친화 템플릿 — 캠페인 고정 접두사(system) + 사용자별 접미사(user)
+
+프로바이더 프롬프트 캐시(OpenAI 자동 캐시, Anthropic cache_control)는 요청의 앞부분이
+이전 요청과 토큰 단위로 같을 때만 재사용됩니다. 지시문·브랜드·가이드라인·매체 스펙 사이에
+사용자별 Style DNA나 카피가 섞여 있으면 공유할 수 있는 접두사가 거의 없습니다.
+
+템플릿 파일은 PER_USER 표식 줄로 두 부분을 나눕니다.
+
+- 접두사: 캠페인 안에서 바뀌지 않는 필드만 사용 → system 메시지 (렌더링 결과도 캐시)
+- 접미사: 사용자·후보별 필드 → user 메시지 (이미지 파트와 함께)
+
+템플릿은 경로별로 한 번만 읽고 필드 목록을 미리 파싱해 둡니다 (compile_prompt).
+"""
+from __future__ import annotations
+
+import string
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from da_agent.utils.async_files import load_template, read_template
+
+PER_USER_MARKER = "<<<PER_USER>>>"
+
+
+def _fields(text: str) -> frozenset[str]:
+    return frozenset(
+        field.split(".")[0].split("[")[0]
+        for _, field, _, _ in string.Formatter().parse(text) if field
+    )
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """접두사·접미사로 나뉜 str.format 템플릿 (필드 목록은 컴파일 시 파싱)."""
+
+    prefix: str
+    suffix: str
+    prefix_fields: frozenset[str]
+    suffix_fields: frozenset[str]
+
+    def render_prefix(self, **fields: object) -> str:
+        """캠페인 고정 접두사 — 같은 필드 값이면 이전 렌더링 결과를 재사용."""
+        return _render_prefix(self, tuple(sorted((k, str(v)) for k, v in fields.items())))
+
+    def render_suffix(self, **fields: object) -> str:
+        return self.suffix.format(**fields)
+
+    def messages(
+        self,
+        static: dict,
+        per_user: dict,
+        images: list[dict] | None = None,
+    ) -> list[dict]:
+        """[system: 접두사, user: 이미지 파트 + 접미사] chat 메시지."""
+        suffix = self.render_suffix(**per_user)
+        content: str | list[dict] = (
+            [*images, {"type": "text", "text": suffix}] if images else suffix
+        )
+        return [
+            {"role": "system", "content": self.render_prefix(**static)},
+            {"role": "user", "content": content},
+        ]
+
+
+@lru_cache(maxsize=256)
+def _render_prefix(template: PromptTemplate, fields: tuple[tuple[str, str], ...]) -> str:
+    return template.prefix.format(**dict(fields))
+
+
+@lru_cache(maxsize=None)
+def compile_prompt(text: str) -> PromptTemplate:
+    """PER_USER 표식으로 나누고 각 부분의 필드를 파싱합니다 (표식이 없으면 전체가 접두사)."""
+    prefix, marker, suffix = text.partition(PER_USER_MARKER)
+    if not marker:
+        suffix = ""
+    prefix = prefix.strip() + "\n"
+    suffix = suffix.strip() + "\n" if suffix.strip() else ""
+    return PromptTemplate(prefix, suffix, _fields(prefix), _fields(suffix))
+
+
+def load_prompt(path: str | Path) -> PromptTemplate:
+    """템플릿 파일을 읽어(프로세스당 한 번) 컴파일합니다."""
+    return compile_prompt(load_template(path))
+
+
+async def read_prompt(path: str | Path) -> PromptTemplate:
+    """load_prompt의 비동기 버전 — 캐시 미스일 때만 스레드에서 읽음."""
+    return compile_prompt(await read_template(path))
@@ -0,0 +1,382 @@
+"""
+LLM / Vision 프로바이더 라우팅 (옵트인: LLM_ROUTES)
+
+스테이지별로 순위가 매겨진 (프로바이더, 모델) 목록을 두고, 프로바이더별 최근 지연·오류율을
+추적해 각 호출을 가장 빠른 정상 프로바이더로 보냅니다. 오류·타임아웃이면 다음 순위로
+즉시 넘어갑니다 (failover).
+
+- 요청은 call_structured가 만드는 OpenAI chat.completions 형식 그대로 받고, 프로바이더별로 변환
+  - OpenAI: 그대로 전송 (model만 라우트 값으로 교체)
+  - Anthropic Messages API: system 분리, 이미지 파트 → base64/url image 블록(긴 변 1568px 이하로
+    축소, detail 제거), json_schema 응답 형식 → 강제 tool 호출의 input_schema
+- 응답은 OpenAI 형식(choices[0].message.content / finish_reason / usage)으로 되돌려
+  검증·복구·재시도 로직을 공유
+- 라우트 키는 점으로 구분된 스테이지의 가장 긴 접두사 (evaluator.low → evaluator → *)
+- 정상 판정: 최근 window 초 동안의 오류율이 상한 이하. 표본이 부족한 프로바이더는 먼저 시도해 지연을 학습
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import io
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+from PIL import Image
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+from da_agent.utils.image_utils import decode_image
+
+logger = logging.getLogger(__name__)
+
+_ANTHROPIC_VERSION = "2023-06-01"
+_ANTHROPIC_MAX_IMAGE_SIDE = 1568   # 이보다 큰 이미지는 서버에서 축소되므로 미리 줄여 전송
+_ANTHROPIC_MEDIA_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+_ANTHROPIC_STOP_REASONS = {"max_tokens": "length", "refusal": "content_filter"}
+_LATENCY_SAMPLES = 50
+_MIN_OUTCOMES_FOR_HEALTH = 3
+
+
+class ProviderError(RuntimeError):
+    """프로바이더 호출 실패 (HTTP 오류·형식 오류) — 라우터가 다음 순위로 넘어갑니다."""
+
+
+# ── 프로바이더 ─────────────────────────────────────────────────────────────────
+
+class LLMProvider(ABC):
+    name: str
+
+    @abstractmethod
+    async def complete(self, request: dict) -> Any:
+        """OpenAI chat.completions 형식 요청 → OpenAI 형식 응답."""
+
+    async def aclose(self) -> None:
+        return None
+
+
+class OpenAIProvider(LLMProvider):
+    def __init__(self, client=None, name: str = "openai"):
+        self.name = name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from da_agent.utils.http_client import create_openai_client
+
+            self._client = create_openai_client()
+        return self._client
+
+    async def complete(self, request: dict) -> Any:
+        return await self.client.chat.completions.create(**request)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+def _adapt_image(url: str) -> dict:
+    """OpenAI image_url → Anthropic image 블록 (큰 data URL은 축소·JPEG 재인코딩)."""
+    if not url.startswith("data:"):
+        return {"type": "image", "source": {"type": "url", "url": url}}
+
+    header, b64 = url.split(",", 1)
+    media_type = header[len("data:"):].split(";", 1)[0]
+    data = base64.b64decode(b64)
+    with Image.open(io.BytesIO(data)) as probe:  # 헤더만 읽음
+        oversized = max(probe.size) > _ANTHROPIC_MAX_IMAGE_SIDE
+    if oversized or media_type not in _ANTHROPIC_MEDIA_TYPES:
+        image = decode_image(data, (_ANTHROPIC_MAX_IMAGE_SIDE, _ANTHROPIC_MAX_IMAGE_SIDE)).image
+        image.thumbnail((_ANTHROPIC_MAX_IMAGE_SIDE, _ANTHROPIC_MAX_IMAGE_SIDE))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=90)
+        media_type, b64 = "image/jpeg", base64.b64encode(buffer.getvalue()).decode("ascii")
+    return {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": b64}}
+
+
+def _adapt_content(content: str | list[dict]) -> str | list[dict]:
+    if isinstance(content, str):
+        return content
+    blocks = []
+    for part in content:
+        if part["type"] == "text":
+            blocks.append({"type": "text", "text": part["text"]})
+        elif part["type"] == "image_url":
+            blocks.append(_adapt_image(part["image_url"]["url"]))
+    return blocks
+
+
+def to_anthropic_request(request: dict) -> dict:
+    """OpenAI chat.completions 요청을 Anthropic Messages API 요청으로 변환합니다."""
+    system = [
+        m["content"] if isinstance(m["content"], str) else " ".join(p["text"] for p in m["content"])
+        for m in request["messages"] if m["role"] == "system"
+    ]
+    payload: dict[str, Any] = {
+        "model": request["model"],
+        "max_tokens": request.get("max_tokens") or 1024,
+        "messages": [
+            {"role": m["role"], "content": _adapt_content(m["content"])}
+            for m in request["messages"] if m["role"] != "system"
+        ],
+    }
+    if system:
+        # system은 캠페인 고정 접두사 (utils/prompts.py) — 프롬프트 캐시 중단점으로 표시
+        payload["system"] = [{
+            "type": "text",
+            "text": "\n\n".join(system),
+            "cache_control": {"type": "ephemeral"},
+        }]
+    if "temperature" in request:
+        payload["temperature"] = request["temperature"]
+
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        # Anthropic에는 json_schema 응답 형식이 없으므로 강제 tool 호출로 스키마를 강제
+        spec = response_format["json_schema"]
+        payload["tools"] = [{
+            "name": spec["name"],
+            "description": "Record the response as structured data.",
+            "input_schema": spec["schema"],
+        }]
+        payload["tool_choice"] = {"type": "tool", "name": spec["name"]}
+    return payload
+
+
+def from_anthropic_response(body: dict) -> SimpleNamespace:
+    """Anthropic Messages 응답을 OpenAI chat.completions 응답 형태로 변환합니다."""
+    blocks = body.get("content") or []
+    tool_inputs = [b["input"] for b in blocks if b.get("type") == "tool_use"]
+    text = "".join(b.get("text", "") for b in blocks if b.get("type") == "text")
+    content = json.dumps(tool_inputs[0], ensure_ascii=False) if tool_inputs else text
+    stop_reason = body.get("stop_reason")
+
+    usage = body.get("usage") or {}
+    prompt_tokens = (
+        usage.get("input_tokens", 0)
+        + usage.get("cache_read_input_tokens", 0)
+        + usage.get("cache_creation_input_tokens", 0)
+    )
+    completion_tokens = usage.get("output_tokens", 0)
+    return SimpleNamespace(
+        model=body.get("model"),
+        choices=[SimpleNamespace(
+            message=SimpleNamespace(
+                content=content,
+                refusal=(text or "refused") if stop_reason == "refusal" else None,
+            ),
+            finish_reason=_ANTHROPIC_STOP_REASONS.get(stop_reason, "stop"),
+        )],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            prompt_tokens_details=SimpleNamespace(
+                cached_tokens=usage.get("cache_read_input_tokens", 0)
+            ),
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic Messages API (httpx 직접 호출 — transport 주입으로 로컬 대역 서버 테스트 가능)."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.anthropic.com",
+        transport: httpx.AsyncBaseTransport | None = None,
+        verify: Any = True,
+        name: str = "anthropic",
+    ):
+        self.name = name
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": _ANTHROPIC_VERSION,
+                "content-type": "application/json",
+            },
+            transport=transport,
+            verify=verify,
+            timeout=httpx.Timeout(120.0, connect=10.0),
+        )
+
+    async def complete(self, request: dict) -> Any:
+        payload = await asyncio.to_thread(to_anthropic_request, request)  # 이미지 재인코딩 포함
+        response = await self._client.post("/v1/messages", json=payload)
+        if response.status_code >= 400:
+            raise ProviderError(f"anthropic HTTP {response.status_code}: {response.text[:200]}")
+        return from_anthropic_response(response.json())
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# ── 라우팅 ─────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Route:
+    provider: str
+    model: str = ""   # 비어 있으면 요청의 model(스테이지 설정값) 유지
+
+    @classmethod
+    def parse(cls, spec: str) -> "Route":
+        provider, _, model = spec.partition(":")
+        return cls(provider.strip(), model.strip())
+
+    def __str__(self) -> str:
+        return f"{self.provider}:{self.model}" if self.model else self.provider
+
+
+class ProviderStats:
+    """(프로바이더, 모델)별 최근 지연 표본과 시간 창 내 성공/실패 기록."""
+
+    def __init__(self):
+        self.latencies: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.outcomes: deque[tuple[float, bool]] = deque()
+
+    def record(self, ok: bool, seconds: float | None, now: float) -> None:
+        self.outcomes.append((now, ok))
+        if ok and seconds is not None:
+            self.latencies.append(seconds)
+
+    def error_rate(self, now: float, window: float) -> tuple[float, int]:
+        while self.outcomes and self.outcomes[0][0] < now - window:
+            self.outcomes.popleft()
+        total = len(self.outcomes)
+        errors = sum(1 for _, ok in self.outcomes if not ok)
+        return (errors / total if total else 0.0), total
+
+    def latency(self) -> float | None:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+
+class ProviderRouter:
+    """스테이지별 라우트를 지연·오류율로 정렬해 호출하고 실패 시 다음 라우트로 넘어갑니다."""
+
+    def __init__(
+        self,
+        providers: dict[str, LLMProvider],
+        routes: dict[str, list[str]],
+        timeout: float = 60.0,
+        max_error_rate: float = 0.5,
+        window_seconds: float = 120.0,
+        min_samples: int = 5,
+    ):
+        self.providers = providers
+        self.routes = {stage: [Route.parse(s) for s in specs] for stage, specs in routes.items()}
+        for route in (r for rs in self.routes.values() for r in rs):
+            if route.provider not in providers:
+                raise ValueError(f"Unknown LLM provider in route: {route}")
+        self.timeout = timeout
+        self.max_error_rate = max_error_rate
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self._stats: dict[Route, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def routes_for(self, stage: str) -> list[Route]:
+        parts = stage.split(".")
+        for i in range(len(parts), 0, -1):
+            routes = self.routes.get(".".join(parts[:i]))
+            if routes:
+                return routes
+        return self.routes.get("*", [])
+
+    def ranked(self, stage: str, now: float | None = None) -> list[Route]:
+        """정상 여부 → 추정 지연(표본 부족 시 0 — 먼저 시도해 학습) → 설정 순위로 정렬."""
+        now = time.monotonic() if now is None else now
+        routes = self.routes_for(stage)
+
+        def key(item: tuple[int, Route]):
+            rank, route = item
+            with self._lock:
+                stats = self._stats.setdefault(route, ProviderStats())
+                rate, outcomes = stats.error_rate(now, self.window_seconds)
+                latency = stats.latency() if len(stats.latencies) >= self.min_samples else None
+            unhealthy = outcomes >= _MIN_OUTCOMES_FOR_HEALTH and rate > self.max_error_rate
+            return unhealthy, latency if latency is not None else 0.0, rank
+
+        return [route for _, route in sorted(enumerate(routes), key=key)]
+
+    def _record(self, route: Route, ok: bool, seconds: float | None) -> None:
+        with self._lock:
+            self._stats.setdefault(route, ProviderStats()).record(ok, seconds, time.monotonic())
+        metrics.increment(f"llm.provider.{route.provider}.{'calls' if ok else 'errors'}")
+
+    async def create(self, request: dict, stage: str) -> Any:
+        """순위대로 시도 — 첫 성공 응답을 반환하고, 모두 실패하면 마지막 오류를 발생시킵니다."""
+        last_error: BaseException | None = None
+        for attempt, route in enumerate(self.ranked(stage)):
+            if attempt:
+                metrics.increment(f"llm.failovers.{stage}")
+                logger.warning("Failing over %s call to %s: %r", stage, route, last_error)
+            routed = {**request, "model": route.model} if route.model else request
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    self.providers[route.provider].complete(routed), timeout=self.timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001 — 타임아웃·HTTP·SDK 오류 모두 failover 대상
+                self._record(route, False, None)
+                last_error = exc
+                continue
+            self._record(route, True, time.perf_counter() - started)
+            return response
+        if last_error is None:
+            raise ProviderError(f"No LLM route configured for stage {stage!r}")
+        raise last_error
+
+    def stats(self) -> dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            out = {}
+            for route, stats in self._stats.items():
+                rate, outcomes = stats.error_rate(now, self.window_seconds)
+                out[str(route)] = {
+                    "latency": stats.latency(),
+                    "error_rate": rate,
+                    "outcomes": outcomes,
+                }
+        return out
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(p.aclose() for p in self.providers.values()))
+
+
+@lru_cache
+def get_provider_router() -> ProviderRouter | None:
+    """LLM_ROUTES가 설정된 경우의 라우터 (비어 있으면 None → 기존 OpenAI 클라이언트 직접 호출)."""
+    settings = get_settings()
+    if not settings.llm_routes:
+        return None
+    from da_agent.utils.http_client import _build_ssl_context
+
+    providers: dict[str, LLMProvider] = {"openai": OpenAIProvider()}
+    if settings.anthropic_api_key:
+        providers["anthropic"] = AnthropicProvider(
+            settings.anthropic_api_key,
+            base_url=settings.anthropic_base_url,
+            verify=_build_ssl_context(),
+        )
+    return ProviderRouter(
+        providers,
+        settings.llm_routes,
+        timeout=settings.llm_route_timeout,
+        max_error_rate=settings.llm_route_max_error_rate,
+        window_seconds=settings.llm_route_window_seconds,
+        min_samples=settings.llm_route_min_samples,
+    )
@@ -0,0 +1,121 @@
+"""
+싱글 플라이트 — 동시에 들어온 같은 요청을 진행 중인 하나의 호출로 합침 (SINGLE_FLIGHT_ENABLED)
+
+캠페인 시작 직후에는 수백 개 파이프라인이 같은 existing_product_da 업로드, 같은 인기 클릭
+광고 추출, 같은 로고 다운로드를 동시에 요청합니다. 캐시가 있어도 모두 동시에 미스가 나므로
+캐시를 채우기 전에 같은 작업이 수백 번 실행됩니다.
+
+SingleFlight는 키(콘텐츠 해시 + 파라미터)별로 진행 중인 태스크를 하나만 두고 나머지 호출은
+그 결과를 함께 기다립니다. 완료되면 항목을 지우므로 결과를 보관하는 캐시가 아닙니다.
+
+- 오류: 진행 중이던 모든 호출에 같은 예외가 전파되고, 다음 호출은 새로 실행 (실패를 캐시하지 않음)
+- 취소: 기다리던 호출 하나가 취소되어도 공유 태스크는 계속 — 마지막 대기자까지 취소되면
+  공유 태스크도 취소하고 항목을 즉시 지워 새 호출이 취소 중인 태스크에 합류하지 않도록 함
+- share: 후속 대기자에게 돌려줄 때 적용할 복사 함수 (PIL Image처럼 변경 가능한 결과용)
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from da_agent.config import get_settings
+from da_agent.utils import metrics
+
+T = TypeVar("T")
+
+
+def source_digest(path_or_url: str) -> str:
+    """이미지 입력의 콘텐츠 키 (로컬 파일: 바이트 sha256, URL: URL 문자열 sha256)."""
+    if path_or_url.startswith(("http://", "https://")):
+        return hashlib.sha256(f"url:{path_or_url}".encode("utf-8")).hexdigest()
+    return hashlib.sha256(Path(path_or_url).read_bytes()).hexdigest()
+
+
+def request_digest(*parts: Any) -> str:
+    """JSON 직렬화 가능한 파라미터들의 안정적인 해시 (dict 키 순서 무관)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """키별로 진행 중인 코루틴 하나를 동시 호출자들이 공유합니다."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[T]],
+        share: Callable[[T], T] | None = None,
+    ) -> T:
+        """key로 진행 중인 호출이 있으면 합류하고, 없으면 fn()을 태스크로 시작합니다."""
+        loop = asyncio.get_running_loop()
+        call = self._calls.get(key)
+        leader = call is None or call.task.get_loop() is not loop
+        if leader:
+            call = _Call(loop.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._done(key, call))
+        else:
+            metrics.increment(f"single_flight.{self.name}.shared")
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 남은 대기자 없음 (모두 취소됨) — 공유 작업도 취소
+                self._forget(key, call)
+                call.task.cancel()
+        return result if leader or share is None else share(result)
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _done(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        if not call.task.cancelled():
+            call.task.exception()   # 모든 대기자가 떠난 뒤 실패해도 미처리 경고를 남기지 않음
+
+
+_flights: dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight | None:
+    """이름별 공유 SingleFlight (SINGLE_FLIGHT_ENABLED=false면 None → 합치지 않음)."""
+    if not get_settings().single_flight_enabled:
+        return None
+    flight = _flights.get(name)
+    if flight is None:
+        flight = _flights[name] = SingleFlight(name)
+    return flight
+
+
+async def coalesce(
+    name: str,
+    key: Hashable,
+    fn: Callable[[], Awaitable[T]],
+    share: Callable[[T], T] | None = None,
+) -> T:
+    """get_single_flight(name)이 있으면 합쳐서, 없으면 그대로 fn()을 실행합니다."""
+    flight = get_single_flight(name)
+    if flight is None:
+        return await fn()
+    return await flight.do(key, fn, share=share)
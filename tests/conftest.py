@@ -0,0 +1,56 @@
+"""공용 테스트 픽스처 — 메트릭 초기화, 파이프라인 모델 팩토리"""
+import pytest
+
+from da_agent.models.blueprint import AdCopy, Blueprint
+from da_agent.models.evaluation import CategoryScores, EvaluationResult
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+from da_agent.utils import metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    """프로세스 전역 메트릭 레지스트리를 테스트마다 비움."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _style_dna() -> StyleDNA:
+    return StyleDNA(
+        image_style=ImageStyle(mood="미니멀", lighting="자연광", color_palette=["#FFF"], aesthetic=["clean"]),
+        layout_style=LayoutStyle(type="top-text", text_position="top", product_position="bottom", visual_flow="Z", whitespace="moderate", focal_point="center"),
+        copy_style=CopyStyle(tone="감성적", length="short", emphasis_type="감정소구", keywords=["일상"]),
+    )
+
+
+def _blueprint() -> Blueprint:
+    return Blueprint(
+        ad_copy=AdCopy(headline="오늘도 특별하게", subheadline="당신을 위한 선택", cta="지금 보기"),
+        transformation_prompt="Transform this product advertisement. minimal, soft natural light.",
+    )
+
+
+def _eval_result(passed: bool, score: int) -> EvaluationResult:
+    return EvaluationResult(
+        passed=passed,
+        score=score,
+        category_scores=CategoryScores(brand_compliance=score, copy_compliance=score, layout_compliance=score, visual_quality=score),
+        issues=[],
+        recommendations=[],
+        retry_priority=[],
+    )
+
+
+@pytest.fixture
+def make_style_dna():
+    return _style_dna
+
+
+@pytest.fixture
+def make_blueprint():
+    return _blueprint
+
+
+@pytest.fixture
+def make_eval_result():
+    return _eval_result
@@ -0,0 +1,148 @@
+"""유사 사용자 광고 재사용 인덱스 테스트 — serve / adapt / miss 판정과 제거"""
+import io
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+
+from da_agent.models.ad_layout import AdLayout, BBox
+from da_agent.models.blueprint import AdCopy, Blueprint
+from da_agent.models.evaluation import CategoryScores, EvaluationResult
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+from da_agent.store.ad_index import AdIndex, campaign_key, embed_style_dna
+
+
+def _dna(mood="미니멀", palette=("#FFFFFF", "#222222"), keywords=("일상", "여유"), tone="감성적"):
+    return StyleDNA(
+        image_style=ImageStyle(mood=mood, lighting="자연광", color_palette=list(palette), aesthetic=["clean"]),
+        layout_style=LayoutStyle(
+            type="top-text", text_position="top", product_position="bottom",
+            visual_flow="Z", whitespace="moderate", focal_point="center",
+        ),
+        copy_style=CopyStyle(tone=tone, length="short", emphasis_type="감정소구", keywords=list(keywords)),
+    )
+
+
+def _eval(score=90):
+    return EvaluationResult(
+        passed=score >= 80,
+        score=score,
+        category_scores=CategoryScores(
+            brand_compliance=score, copy_compliance=score, layout_compliance=score, visual_quality=score
+        ),
+        issues=[],
+        recommendations=[],
+        retry_priority=[],
+    )
+
+
+def _layout():
+    return AdLayout(
+        text_zone=BBox(x=4, y=4, width=56, height=20),
+        logo_zone=BBox(x=50, y=54, width=10, height=6),
+        text_color="white",
+    )
+
+
+def _png(color=(10, 20, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_embedding_is_unit_and_similarity_tracks_style():
+    base = embed_style_dna(_dna())
+    near = embed_style_dna(_dna(keywords=("일상", "휴식")))
+    far = embed_style_dna(_dna(mood="럭셔리", palette=("#C0A060",), keywords=("프리미엄",), tone="직접적"))
+
+    assert abs(float(base @ base) - 1.0) < 1e-5
+    assert float(base @ near) > float(base @ far)
+
+
+def test_lookup_serves_adapts_and_misses():
+    index = AdIndex(serve_distance=0.01, adapt_distance=0.2)
+    campaign = campaign_key({"name": "A"}, {}, {}, "base-a")
+    index.add(campaign, _dna(), _png(), _eval(), canvas=Image.new("RGB", (64, 64)), layout=_layout())
+
+    served = index.lookup(campaign, _dna())
+    assert served.kind == "served"
+
+    adapted = index.lookup(campaign, _dna(keywords=("일상", "휴식")))
+    assert adapted.kind == "adapted"
+    assert adapted.entry.canvas().size == (64, 64)
+
+    assert index.lookup(campaign, _dna(mood="럭셔리", palette=("#C0A060",), tone="직접적")) is None
+    assert index.lookup(campaign_key({"name": "B"}, {}, {}, "base-a"), _dna()) is None
+    assert index.lookup(campaign_key({"name": "A"}, {}, {}, "base-b"), _dna()) is None   # 다른 기반 소재
+
+
+def test_eviction_by_capacity_ttl_and_campaign_end(monkeypatch):
+    index = AdIndex(max_per_campaign=2, ttl_seconds=100)
+    campaign = campaign_key({"name": "A"}, {}, {}, "base-a")
+    clock = [1000.0]
+    monkeypatch.setattr("da_agent.store.ad_index.time.time", lambda: clock[0])
+
+    for mood in ("m1", "m2", "m3"):
+        index.add(campaign, _dna(mood=mood), _png(), _eval())
+    assert len(index) == 2
+    assert index.lookup(campaign, _dna(mood="m1")) is None  # 가장 오래된 항목 제거됨
+
+    clock[0] += 101
+    assert index.lookup(campaign, _dna(mood="m3")) is None  # TTL 만료
+    assert len(index) == 0
+
+    index.add(campaign, _dna(), _png(), _eval())
+    assert index.end_campaign(campaign) == 1
+    assert len(index) == 0
+
+
+@pytest.mark.asyncio
+async def test_pipeline_serves_and_adapts_from_index(monkeypatch):
+    index = AdIndex(serve_distance=0.01, adapt_distance=0.3)
+    monkeypatch.setattr("da_agent.pipeline.get_ad_index", lambda: index)
+    inputs = dict(
+        existing_product_da="https://example.com/product_da.jpg",
+        product_info={"name": "Test", "description": "Test", "features": []},
+        brand_identity={"logo_url": "", "primary_colors": [], "secondary_colors": []},
+        guidelines={"required_elements": [], "forbidden_elements": [], "tone_constraints": [], "media_specs": {}},
+    )
+    composed = Image.new("RGB", (64, 64))
+    composed.info.update(styled_canvas=Image.new("RGB", (64, 64)), ad_layout=_layout())
+    blueprint = Blueprint(
+        ad_copy=AdCopy(headline="오늘도 특별하게", subheadline="당신을 위한 선택", cta="지금 보기"),
+        transformation_prompt="Transform this product advertisement.",
+    )
+    generate = AsyncMock(return_value=(composed, _png()))
+    compose = AsyncMock(return_value=(Image.new("RGB", (64, 64)), _png((1, 2, 3))))
+    extract = AsyncMock(side_effect=[_dna(), _dna(), _dna(keywords=("일상", "휴식"))])
+
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=extract),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=blueprint)),
+        patch("da_agent.pipeline.generate_ad_image", new=generate),
+        patch("da_agent.pipeline.compose_ad", new=compose),
+        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=_eval(90))),
+    ):
+        from da_agent.pipeline import run_pipeline
+        fresh = await run_pipeline(user_clicked_ad_image="https://example.com/a.jpg", **inputs)
+        served = await run_pipeline(user_clicked_ad_image="https://example.com/b.jpg", **inputs)
+        adapted = await run_pipeline(user_clicked_ad_image="https://example.com/c.jpg", **inputs)
+
+    assert fresh.reused is None
+    assert served.reused == "served" and served.iterations_used == 0
+    assert served.final_image_bytes == fresh.final_image_bytes
+    assert served.final_image.size == fresh.final_image.size and served.encoding["format"] == "PNG"
+    assert adapted.reused == "adapted"
+    assert generate.await_count == 1
+    assert compose.await_count == 1
+    assert len(index) == 2
+
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=blueprint)),
+        patch("da_agent.pipeline.generate_ad_image", new=generate),
+        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=_eval(90))),
+    ):
+        other_base = {**inputs, "existing_product_da": "https://example.com/other_da.jpg"}
+        regenerated = await run_pipeline(user_clicked_ad_image="https://example.com/b.jpg", **other_base)
+    assert regenerated.reused is None and generate.await_count == 2   # 기반 소재가 다르면 재사용 안 함
@@ -0,0 +1,108 @@
+"""배경 제거 워커 테스트 — 가짜 ONNX 세션으로 배치 추론·마스크 캐시·고정 배치 폴백 확인"""
+import asyncio
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from da_agent.utils.background_removal import BackgroundRemover, content_hash
+from da_agent.utils.image_utils import overlay_product
+
+
+class FakeSession:
+    """u2net 대역 — 입력 첫 채널이 평균보다 밝은 픽셀을 전경으로 예측."""
+
+    def __init__(self, fixed_batch: bool = False):
+        self.fixed_batch = fixed_batch
+        self.batch_sizes: list[int] = []
+
+    def get_inputs(self):
+        return [type("Input", (), {"name": "input.1"})()]
+
+    def run(self, outputs, feed):
+        batch = feed["input.1"]
+        if self.fixed_batch and batch.shape[0] != 1:
+            raise ValueError("Got invalid dimensions for input: input.1 index: 0 Got: 2 Expected: 1")
+        self.batch_sizes.append(batch.shape[0])
+        red = batch[:, 0:1]
+        return [(red > red.mean(axis=(2, 3), keepdims=True)).astype(np.float32)]
+
+
+def _product(color=(230, 40, 40)) -> Image.Image:
+    image = Image.new("RGB", (80, 60), (10, 10, 10))
+    image.paste(color, (20, 15, 60, 45))
+    return image
+
+
+def _remover(session: FakeSession, **kwargs) -> BackgroundRemover:
+    return BackgroundRemover(lambda: session, batch_window=0.01, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batched_inference_and_cache():
+    session = FakeSession()
+    remover = _remover(session)
+    images = [_product((200 + i * 10, 40, 40)) for i in range(3)]
+
+    masks = await remover.masks(images + [images[0].copy()])   # 같은 내용은 한 번만 추론
+    assert session.batch_sizes == [3]
+    assert all(m.mode == "L" and m.size == (80, 60) for m in masks)
+    mask = np.asarray(masks[0])
+    assert mask[30, 40] > 200 and mask[2, 2] < 50             # 제품=전경, 배경=투명
+
+    await remover.mask(images[1])
+    cutout = await remover.cutout(images[2])
+    assert session.batch_sizes == [3]                          # 캐시 히트 — 재추론 없음
+    assert cutout.mode == "RGBA" and cutout.getpixel((2, 2))[3] < 50
+
+
+@pytest.mark.asyncio
+async def test_fixed_batch_model_falls_back_and_masks_persist(tmp_path):
+    session = FakeSession(fixed_batch=True)
+    remover = _remover(session, cache_dir=tmp_path)
+    images = [_product((200, 40 + i * 20, 40)) for i in range(2)]
+
+    await asyncio.gather(*(remover.mask(image) for image in images))
+    assert session.batch_sizes == [1, 1]
+    assert not remover._batchable
+
+    # 새 워커(프로세스 재시작)도 디스크 캐시에서 마스크를 재사용
+    fresh_session = FakeSession()
+    fresh = _remover(fresh_session, cache_dir=tmp_path)
+    assert fresh.cached_mask(content_hash(images[0])) is not None
+    assert (await fresh.mask(images[1])).size == (80, 60)
+    assert fresh_session.batch_sizes == []                     # 디스크 히트 — 추론 없음
+
+
+def test_mask_is_reused_across_product_placements():
+    session = FakeSession()
+    remover = _remover(session)
+    product = _product()
+    mask = remover.mask_sync(product)
+    canvas = Image.new("RGB", (300, 200), (255, 255, 255))
+
+    small = overlay_product(canvas, product, 0, 0, 40, 30, mask=mask)
+    large = overlay_product(canvas, product, 100, 50, 160, 120, mask=mask)
+    assert remover.mask_sync(product) is mask and session.batch_sizes == [1]
+    assert small.getpixel((1, 1))[:3] == (255, 255, 255)      # 배경 투명 → 캔버스 유지
+    assert large.getpixel((180, 110))[:3] == (230, 40, 40)    # 제품 중앙
+
+
+@pytest.mark.asyncio
+async def test_failed_session_creation_does_not_use_up_the_pool():
+    session = FakeSession()
+    attempts = 0
+
+    def flaky_factory():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("model download failed")
+        return session
+
+    remover = BackgroundRemover(flaky_factory, pool_size=1, batch_window=0.01)
+    with pytest.raises(RuntimeError, match="model download failed"):
+        await remover.mask(_product())
+
+    mask = await asyncio.wait_for(remover.mask(_product()), timeout=5)   # 막히지 않고 재생성
+    assert mask.size == (80, 60) and attempts == 2 and session.batch_sizes == [1]
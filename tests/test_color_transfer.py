@@ -0,0 +1,77 @@
+"""색 변환 고속 경로 테스트 — Lab 왕복, 팔레트 쪽 색 이동, always·지연 예산 시 img2img 생략"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from da_agent.agents.generator import _transform_style
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils.color_transfer import (
+    lab_to_srgb,
+    palette_lab,
+    srgb_to_lab,
+    transfer_style_colors,
+)
+
+_ORANGE = ImageStyle(
+    mood="따뜻한 라이프스타일", lighting="소프트 자연광", color_palette=["#E8742A", "#F4B183"],
+    aesthetic=["warm lifestyle"],
+)
+
+
+def _scene() -> Image.Image:
+    rng = np.random.default_rng(7)
+    base = np.full((90, 120, 3), (70, 110, 160), dtype=np.float32)   # 푸른 배경
+    base[30:60, 40:80] = (200, 200, 200)                             # 무채색 제품
+    noise = rng.normal(0, 12, base.shape)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def _mean_ab(image: Image.Image) -> np.ndarray:
+    return srgb_to_lab(np.asarray(image, dtype=np.float32) / 255)[..., 1:].mean(axis=(0, 1))
+
+
+def test_lab_roundtrip():
+    rgb = np.random.default_rng(0).random((32, 32, 3), dtype=np.float32)
+    assert np.abs(lab_to_srgb(srgb_to_lab(rgb)) - rgb).max() < 1e-3
+
+
+@pytest.mark.parametrize("method", ["lut", "stats"])
+def test_transfer_moves_colors_towards_palette(method):
+    source = _scene()
+    styled = transfer_style_colors(source, _ORANGE, method=method)
+    target = palette_lab(_ORANGE.color_palette)[:, 1:].mean(axis=0)
+
+    assert styled.size == source.size and styled.mode == "RGB"
+    before = np.linalg.norm(_mean_ab(source) - target)
+    after = np.linalg.norm(_mean_ab(styled) - target)
+    assert after < before * 0.8
+    # 같은 입력이면 같은 결과 (LUT 캐시 재사용 포함)
+    assert transfer_style_colors(source, _ORANGE, method=method).tobytes() == styled.tobytes()
+
+
+@pytest.mark.asyncio
+async def test_transform_style_skips_img2img_when_forced_or_over_budget(tmp_path, monkeypatch):
+    path = tmp_path / "da.png"
+    _scene().save(path)
+    router = SimpleNamespace(transform=AsyncMock(), expected_img2img_seconds=lambda: 40.0)
+    monkeypatch.setattr("da_agent.agents.generator.get_image_backend_router", lambda: router)
+    settings = SimpleNamespace(
+        fast_style_transfer="always", fast_style_method="lut", style_latency_budget=0.0,
+        image_width=60, image_height=60,
+    )
+
+    styled = await _transform_style(str(path), "prompt", settings, image_style=_ORANGE)
+    assert styled.size == (60, 60)
+
+    settings.fast_style_transfer = "auto"
+
+    settings.style_latency_budget = 20.0   # 예상 img2img 대기 40s > 예산
+    await _transform_style(str(path), "prompt", settings, image_style=_ORANGE)
+    router.transform.assert_not_awaited()
+
+    settings.style_latency_budget = 60.0
+    await _transform_style(str(path), "prompt", settings, image_style=_ORANGE)
+    router.transform.assert_awaited_once()
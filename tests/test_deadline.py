@@ -0,0 +1,131 @@
+"""실행 데드라인 테스트 — 호출 타임아웃 전파, 반복 건너뛰기, 최고 점수 결과 반환, img2img 고속 경로"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from PIL import Image
+
+from da_agent.agents.generator import _fast_path_reason
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils import metrics
+from da_agent.utils.deadline import DeadlineExceeded, deadline_scope, remaining_seconds, within_deadline
+
+_INPUTS = dict(
+    user_clicked_ad_image="https://example.com/ad.jpg",
+    existing_product_da="https://example.com/product_da.jpg",
+    product_info={"name": "Test", "description": "Test", "features": []},
+    brand_identity={"logo_url": "", "primary_colors": [], "secondary_colors": []},
+    guidelines={"required_elements": [], "forbidden_elements": [], "tone_constraints": [], "media_specs": {}},
+)
+
+
+@pytest.mark.asyncio
+async def test_within_deadline_cancels_slow_calls_and_nested_scopes_keep_the_earlier_deadline():
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    assert await within_deadline(asyncio.sleep(0, "ok"), "free") == "ok"   # 데드라인 없음
+    with deadline_scope(0.05):
+        with deadline_scope(30):
+            assert remaining_seconds() <= 0.05                 # 바깥의 더 이른 데드라인 유지
+        with pytest.raises(DeadlineExceeded):
+            await within_deadline(slow(), "img2img")
+        assert cancelled.is_set()
+
+        started = AsyncMock()
+        with pytest.raises(DeadlineExceeded):                   # 이미 만료 — 시작하지 않음
+            await within_deadline(started(), "architect")
+        assert started.await_count == 0
+
+    async def own_timeout():
+        raise TimeoutError("provider timeout")
+
+    with deadline_scope(30), pytest.raises(TimeoutError) as info:
+        await within_deadline(own_timeout(), "evaluator")
+    assert not isinstance(info.value, DeadlineExceeded)         # 호출 자체 타임아웃은 그대로
+    assert metrics.counter("deadline.exceeded.img2img") == 1
+    assert remaining_seconds() is None
+
+
+@pytest.mark.asyncio
+async def test_pipeline_returns_best_so_far_when_a_later_iteration_runs_out_of_time(
+    make_style_dna,
+    make_blueprint,
+    make_eval_result,
+):
+    image = Image.new("RGBA", (64, 64), (255, 255, 255, 255))
+    calls = 0
+
+    async def generate(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls > 1:   # 두 번째 반복의 img2img가 멈춤 — 데드라인이 호출 타임아웃으로 전파됨
+            await within_deadline(asyncio.sleep(10), "img2img")
+        return image, b"first"
+
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=make_blueprint())),
+        patch("da_agent.pipeline.generate_ad_image", new=generate),
+        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=make_eval_result(False, 60))),
+    ):
+        from da_agent.pipeline import run_pipeline
+        result = await run_pipeline(**_INPUTS, deadline_seconds=0.3)
+
+    assert result.deadline_exceeded and result.final_image_bytes == b"first"
+    assert result.iterations_used == 1 and result.eval_result.score == 60
+    assert remaining_seconds() is None                          # 호출자 컨텍스트에 남지 않음
+
+
+@pytest.mark.asyncio
+async def test_pipeline_skips_iteration_that_cannot_fit_and_raises_without_any_result(
+    make_style_dna,
+    make_blueprint,
+    make_eval_result,
+):
+    image = Image.new("RGBA", (64, 64), (255, 255, 255, 255))
+
+    async def slow_generate(*args, **kwargs):
+        await asyncio.sleep(0.4)
+        return image, b"bytes"
+
+    blueprint = AsyncMock(return_value=make_blueprint())
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=blueprint),
+        patch("da_agent.pipeline.generate_ad_image", new=slow_generate),
+        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=make_eval_result(False, 70))),
+    ):
+        from da_agent.pipeline import run_pipeline
+        result = await run_pipeline(**_INPUTS, deadline_seconds=0.6)
+        assert result.deadline_exceeded and result.iterations_used == 1
+        assert blueprint.await_count == 1                       # 약 0.2초 남음 < 직전 반복 0.4초
+        assert metrics.counter("deadline.skipped_iterations") == 1
+
+        async def hanging(*args, **kwargs):
+            return await within_deadline(asyncio.sleep(10), "img2img")
+
+        with patch("da_agent.pipeline.generate_ad_image", new=hanging), pytest.raises(DeadlineExceeded):
+            await run_pipeline(**_INPUTS, deadline_seconds=0.05)
+
+
+def test_img2img_falls_back_to_colour_transfer_when_deadline_cannot_fit_it():
+    settings = SimpleNamespace(
+        fast_style_transfer="auto", style_latency_budget=0.0, deadline_eval_reserve_seconds=10.0
+    )
+    router = MagicMock()
+    router.expected_img2img_seconds.return_value = 8.0
+    style = ImageStyle(mood="m", lighting="l", color_palette=["#FFFFFF"], aesthetic=[])
+
+    assert _fast_path_reason(settings, router, style) is None
+    with deadline_scope(15):                                   # 8초 + 평가 10초 > 15초
+        assert _fast_path_reason(settings, router, style) == "deadline"
+    with deadline_scope(60):
+        assert _fast_path_reason(settings, router, style) is None
@@ -60,3 +60,161 @@ def test_ad_copy_text_passthrough():
         assert word not in copy.headline
         assert word not in copy.subheadline
         assert word not in copy.cta
+
+
+# ── Stage 4 평가 캐스케이드 ───────────────────────────────────────────────
+
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from PIL import Image
+
+from da_agent.config import get_settings
+from da_agent.models.ad_layout import AdLayout, BBox
+
+
+def _eval_response(score: int):
+    payload = {
+        "passed": score >= 80,
+        "score": score,
+        "category_scores": {
+            "brand_compliance": score,
+            "copy_compliance": score,
+            "layout_compliance": score,
+            "visual_quality": score,
+        },
+        "issues": [],
+        "recommendations": [],
+        "retry_priority": [],
+    }
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(payload)))],
+        usage=SimpleNamespace(total_tokens=100),
+    )
+
+
+def _mock_client(*scores):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(
+        side_effect=[_eval_response(s) for s in scores]
+    )
+    return client
+
+
+def _details(call):
+    content = call.kwargs["messages"][-1]["content"]
+    return [part["image_url"]["detail"] for part in content if part["type"] == "image_url"]
+
+
+_COPY = AdCopy(headline="오늘도 특별한 하루", subheadline="당신만을 위한 선택", cta="지금 알아보기")
+_IMAGE = Image.new("RGBA", (1000, 1000), (240, 240, 240, 255))
+
+
+@pytest.fixture
+def cascade_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "eval_pass_score", 80)
+    monkeypatch.setattr(settings, "eval_cascade_band", 10)
+    monkeypatch.setattr(settings, "eval_escalation_model", "gpt-4o")
+    monkeypatch.setattr(settings, "eval_zone_crops", False)
+    return settings
+
+
+@pytest.mark.asyncio
+async def test_cascade_decides_clear_result_at_low_detail(cascade_settings):
+    client = _mock_client(95)
+    with patch("da_agent.agents.evaluator.create_openai_client", return_value=client):
+        from da_agent.agents.evaluator import evaluate_ad_cascade
+        result = await evaluate_ad_cascade(_IMAGE, _COPY, {}, {})
+
+    assert result.tier == "low"
+    assert client.chat.completions.create.await_count == 1
+    assert _details(client.chat.completions.create.await_args) == ["low"]
+
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_borderline_score(cascade_settings):
+    client = _mock_client(78, 84)
+    with patch("da_agent.agents.evaluator.create_openai_client", return_value=client):
+        from da_agent.agents.evaluator import evaluate_ad_cascade
+        result = await evaluate_ad_cascade(_IMAGE, _COPY, {}, {})
+
+    assert result.tier == "escalated"
+    assert result.score == 84
+    escalation = client.chat.completions.create.await_args_list[1]
+    assert escalation.kwargs["model"] == "gpt-4o"
+    assert _details(escalation) == ["high"]
+
+
+@pytest.mark.asyncio
+async def test_cascade_sends_zone_crops(cascade_settings, monkeypatch):
+    monkeypatch.setattr(cascade_settings, "eval_zone_crops", True)
+    layout = AdLayout(
+        text_zone=BBox(x=0, y=650, width=1000, height=350),
+        logo_zone=BBox(x=850, y=30, width=120, height=50),
+        text_color="dark",
+    )
+    client = _mock_client(75, 82)
+    with patch("da_agent.agents.evaluator.create_openai_client", return_value=client):
+        from da_agent.agents.evaluator import evaluate_ad_cascade
+        result = await evaluate_ad_cascade(_IMAGE, _COPY, {}, {}, layout=layout)
+
+    assert result.tier == "crops"
+    assert _details(client.chat.completions.create.await_args_list[1]) == ["low", "high", "high"]
+
+
+# ── 묶음 평가 ─────────────────────────────────────────────────────────────
+
+def _batch_response(scores: dict[int, int]):
+    evaluations = [
+        {"candidate": c, **json.loads(_eval_response(s).choices[0].message.content)}
+        for c, s in scores.items()
+    ]
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"evaluations": evaluations})))],
+        usage=SimpleNamespace(total_tokens=300),
+    )
+
+
+_CANDIDATES = [
+    (_IMAGE, AdCopy(headline=f"헤드라인 {i}", subheadline="서브", cta="보기")) for i in range(3)
+]
+
+
+@pytest.mark.asyncio
+async def test_batch_evaluates_candidates_in_one_request():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=_batch_response({2: 70, 1: 91, 3: 84}))
+    with patch("da_agent.agents.evaluator.create_openai_client", return_value=client):
+        from da_agent.agents.evaluator import evaluate_ads_batch
+        results = await evaluate_ads_batch(_CANDIDATES, {}, {}, batch_size=4)
+
+    assert [r.score for r in results] == [91, 70, 84]
+    assert all(r.tier == "batch" for r in results)
+    call = client.chat.completions.create.await_args
+    assert _details(call) == ["high"] * 3
+    system, user = call.kwargs["messages"]
+    assert system["role"] == "system" and system["content"].count("Scoring Weights") == 1
+    assert "Candidate 3:" in user["content"][-1]["text"]
+    assert "Candidate 1:" not in system["content"]               # 접두사는 후보와 무관 (캐시 재사용)
+
+    from da_agent.agents.evaluator import _build_messages
+    single_system = (await _build_messages(_CANDIDATES[0][1], {}, {}, []))[0]
+    assert system == single_system                               # 단건 평가와 같은 접두사 (기준 한 곳)
+    assert "3 candidates" in user["content"][-1]["text"]
+
+
+@pytest.mark.asyncio
+async def test_batch_falls_back_to_single_calls_for_missing_candidates():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(
+        side_effect=[_batch_response({1: 88, 3: 60}), _eval_response(77)]
+    )
+    with patch("da_agent.agents.evaluator.create_openai_client", return_value=client):
+        from da_agent.agents.evaluator import evaluate_ads_batch
+        results = await evaluate_ads_batch(_CANDIDATES, {}, {}, batch_size=4)
+
+    assert [r.score for r in results] == [88, 77, 60]
+    assert [r.tier for r in results] == ["batch", "high", "batch"]
+    assert client.chat.completions.create.await_count == 2
@@ -0,0 +1,139 @@
+"""fal 큐 작업 관리자 테스트 — 로컬 큐 대역(FalQueueStandIn)으로 제출·진행·취소 확인"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from da_agent.utils.fal_jobs import CANCELLED, COMPLETED, FalJobError, FalJobManager
+
+_BASE = "https://queue.test"
+
+
+class FalQueueStandIn:
+    """fal 큐 REST API 대역 — 상태 조회마다 대기열이 한 칸씩 줄고 0이 되면 실행·완료."""
+
+    def __init__(self, queue_positions: int = 2, run_polls: int = 1):
+        self.queue_positions = queue_positions
+        self.run_polls = run_polls
+        self.jobs: dict[str, dict] = {}
+        self.cancelled: list[str] = []
+        self.auth_headers: set[str] = set()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.auth_headers.add(request.headers.get("authorization", ""))
+        path = request.url.path
+        if request.method == "POST":
+            request_id = f"req-{len(self.jobs)}"
+            self.jobs[request_id] = {
+                "remaining": self.queue_positions + self.run_polls + 1,
+                "args": json.loads(request.content),
+            }
+            return httpx.Response(
+                200, json={"request_id": request_id, "queue_position": self.queue_positions}
+            )
+
+        request_id = path.split("/requests/")[1].split("/")[0]
+        job = self.jobs[request_id]
+        if request.method == "PUT" and path.endswith("/cancel"):
+            job["cancelled"] = True
+            self.cancelled.append(request_id)
+            return httpx.Response(202, json={"status": "CANCELLATION_REQUESTED"})
+        if path.endswith("/status"):
+            job["remaining"] -= 1
+            if job["remaining"] <= 0:
+                return httpx.Response(200, json={"status": "COMPLETED"})
+            if job["remaining"] > self.run_polls:
+                return httpx.Response(
+                    200, json={"status": "IN_QUEUE", "queue_position": job["remaining"] - self.run_polls - 1}
+                )
+            return httpx.Response(200, json={"status": "IN_PROGRESS"})
+        return httpx.Response(200, json={"images": [{"url": f"https://cdn.test/{request_id}.png"}]})
+
+
+def _manager(server: FalQueueStandIn, **kwargs) -> FalJobManager:
+    return FalJobManager(
+        key="test-key", base_url=_BASE, poll_interval=0.001, transport=server.transport(), **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_jobs_progress_concurrently_and_return_results():
+    server = FalQueueStandIn(queue_positions=2)
+    updates = []
+    manager = _manager(server, on_progress=lambda job: updates.append(job.progress()))
+
+    jobs = [await manager.submit("fal-ai/flux/dev/image-to-image", {"prompt": str(i)}) for i in range(3)]
+    results = await asyncio.gather(*(job.result() for job in jobs))
+
+    assert [r["images"][0]["url"] for r in results] == [f"https://cdn.test/req-{i}.png" for i in range(3)]
+    assert all(job.status == COMPLETED for job in jobs)
+    assert {u["queue_position"] for u in updates if u["status"] == "IN_QUEUE"} == {0, 1}
+    assert manager.progress() == []
+    assert server.auth_headers == {"Key test-key"}
+    await manager.aclose()
+
+
+@pytest.mark.asyncio
+async def test_new_job_in_group_cancels_superseded_job():
+    server = FalQueueStandIn(queue_positions=50)
+    manager = _manager(server)
+
+    first = await manager.submit("fal-ai/flux/dev/image-to-image", {"prompt": "a"}, group="user-1")
+    server.queue_positions = 0
+    second = await manager.submit("fal-ai/flux/dev/image-to-image", {"prompt": "b"}, group="user-1")
+
+    with pytest.raises(FalJobError, match="superseded"):
+        await first.result()
+    assert first.status == CANCELLED
+    assert (await second.result())["images"]
+    assert server.cancelled == ["req-0"]
+    await manager.aclose()
+
+
+@pytest.mark.asyncio
+async def test_timed_out_and_abandoned_jobs_are_cancelled():
+    server = FalQueueStandIn(queue_positions=10_000)
+    manager = _manager(server, timeout=0.02)
+
+    with pytest.raises(FalJobError, match="timed_out"):
+        await manager.run("fal-ai/flux/dev/image-to-image", {"prompt": "slow"})
+
+    manager.timeout = 60
+    waiter = asyncio.create_task(manager.run("fal-ai/flux/dev/image-to-image", {"prompt": "abandoned"}))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert server.cancelled == ["req-0", "req-1"]
+    await manager.aclose()
+
+
+@pytest.mark.asyncio
+async def test_poller_survives_result_fetch_and_unexpected_poll_errors():
+    server = FalQueueStandIn(queue_positions=0)
+    handle = server._handle
+    failures = {"fetch": 1, "status": 1}
+
+    def flaky(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/req-0") and failures["fetch"]:
+            failures["fetch"] -= 1
+            raise httpx.ConnectError("connection reset", request=request)
+        if path.endswith("/req-1/status") and failures["status"]:
+            failures["status"] -= 1
+            return httpx.Response(200, content=b"<html>bad gateway</html>")   # JSON 아님
+        return handle(request)
+
+    server._handle = flaky
+    manager = _manager(server)
+    jobs = [await manager.submit("fal-ai/flux/dev/image-to-image", {"prompt": str(i)}) for i in range(2)]
+    results = await asyncio.wait_for(asyncio.gather(*(job.result() for job in jobs)), timeout=2)
+
+    assert [r["images"][0]["url"] for r in results] == [f"https://cdn.test/req-{i}.png" for i in range(2)]
+    assert failures == {"fetch": 0, "status": 0}
+    await manager.aclose()
@@ -0,0 +1,121 @@
+"""이미지 생성 백엔드 테스트 — 로컬 백엔드 결정성, 지연·대기열 기반 부하 분산, Replicate 폴링·failover"""
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+from da_agent.utils.image_backends import (
+    ImageBackend,
+    ImageBackendRouter,
+    LocalBackend,
+    ReplicateBackend,
+    StyleTransferRequest,
+)
+
+
+class StubBackend(ImageBackend):
+    def __init__(self, name: str, seconds: float, depth: int = 0, cost: float = 0.0, fail: bool = False):
+        self.name = name
+        self.nominal_seconds = seconds
+        self.cost_per_image = cost
+        self.depth = depth
+        self.fail = fail
+        self.calls = 0
+
+    def queue_depth(self) -> int:
+        return self.depth
+
+    async def transform(self, request: StyleTransferRequest) -> Image.Image:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return Image.new("RGB", (request.width * 2, request.height * 2), (10, 20, 30))
+
+
+@pytest.fixture
+def source_da(tmp_path):
+    gradient = np.linspace(0, 255, 160 * 120 * 3).reshape(120, 160, 3).astype(np.uint8)
+    path = tmp_path / "da.png"
+    Image.fromarray(gradient, "RGB").save(path)
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_local_backend_is_deterministic_and_follows_prompt(source_da):
+    backend = LocalBackend()
+    warm = StyleTransferRequest(source_da, "warm vivid mood, palette #FF6600", width=100, height=80)
+    first = await backend.transform(warm)
+    second = await backend.transform(warm)
+    cool = await backend.transform(StyleTransferRequest(source_da, "cool muted, #0044FF", 100, 80))
+
+    assert first.size == (100, 80) and first.mode == "RGB"
+    assert first.tobytes() == second.tobytes()
+    warm_px = np.asarray(first, dtype=np.float32).mean(axis=(0, 1))
+    cool_px = np.asarray(cool, dtype=np.float32).mean(axis=(0, 1))
+    assert warm_px[0] - warm_px[2] > cool_px[0] - cool_px[2]
+
+
+@pytest.mark.asyncio
+async def test_router_sheds_load_to_local_when_remote_queue_is_deep():
+    fal = StubBackend("fal", seconds=10.0, cost=0.025)
+    local = StubBackend("local", seconds=0.5)
+    router = ImageBackendRouter([fal, local], cost_weight=100.0, penalties={"local": 60.0})
+    request = StyleTransferRequest("da.png", "prompt", width=50, height=40)
+
+    assert [b.name for b in router.ranked()] == ["fal", "local"]
+
+    fal.depth = 6   # 예상 대기 10s × 7 > 로컬 패널티 60s
+    assert [b.name for b in router.ranked()] == ["local", "fal"]
+    image = await router.transform(request)
+    assert image.size == (50, 40)  # 백엔드 출력은 캔버스 크기로 맞춤
+    assert (fal.calls, local.calls) == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over_and_demotes_erroring_backend():
+    broken = StubBackend("fal", seconds=1.0, fail=True)
+    local = StubBackend("local", seconds=0.5)
+    router = ImageBackendRouter([broken, local], penalties={"local": 60.0})
+    request = StyleTransferRequest("da.png", "prompt", width=10, height=10)
+
+    for _ in range(3):
+        await router.transform(request)
+    assert broken.calls == 3 and local.calls == 3
+    assert [b.name for b in router.ranked()] == ["local", "fal"]  # 오류율 초과 → 강등
+
+
+@pytest.mark.asyncio
+async def test_replicate_backend_polls_prediction(monkeypatch):
+    polls = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        assert request.headers["authorization"] == "Bearer r8-test"
+        urls = {"get": "https://replicate.test/v1/predictions/p1",
+                "cancel": "https://replicate.test/v1/predictions/p1/cancel"}
+        if request.method == "POST":
+            return httpx.Response(201, json={"id": "p1", "status": "starting", "urls": urls})
+        polls.append(request.url.path)
+        if len(polls) < 2:
+            return httpx.Response(200, json={"id": "p1", "status": "processing", "urls": urls})
+        return httpx.Response(200, json={
+            "id": "p1", "status": "succeeded", "urls": urls, "output": ["https://cdn.test/out.png"],
+        })
+
+    loaded = []
+
+    async def fake_load(url, target_size, need_alpha=False):
+        loaded.append(url)
+        return type("Scaled", (), {"image": Image.new("RGB", (64, 64))})()
+
+    monkeypatch.setattr("da_agent.utils.image_backends.load_image_scaled", fake_load)
+    backend = ReplicateBackend(
+        "r8-test", base_url="https://replicate.test", poll_interval=0.001,
+        transport=httpx.MockTransport(handle),
+    )
+    image = await backend.transform(StyleTransferRequest("https://cdn.test/da.png", "p", 32, 16))
+
+    assert image.size == (32, 16)
+    assert loaded == ["https://cdn.test/out.png"] and len(polls) == 2
+    assert backend.queue_depth() == 0
+    await backend.aclose()
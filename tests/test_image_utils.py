@@ -0,0 +1,94 @@
+"""이미지 유틸 테스트 — 텍스트 블록 폰트 자동 맞춤, 목표 크기 디코드"""
+import base64
+import io
+
+from PIL import Image
+
+from da_agent.utils.image_utils import (
+    decode_image,
+    fit_text_block,
+    measure_text_height,
+    prepare_image_for_api,
+)
+
+_HEADLINE = "러닝 에너지를 폭발시키는 단 하나의 선택"
+_SUB = "부드러운 쿠셔닝과 통기성이 뛰어난 메쉬 소재로 완성한 최상급 퍼포먼스"
+_CTA = "지금 구매하기"
+
+
+def test_short_copy_in_large_zone_uses_max_sizes():
+    fitted = fit_text_block("신제품", "가볍게", "보기", max_width=800, max_height=600)
+    assert fitted.fits
+    assert (fitted.headline_size, fitted.sub_size, fitted.cta_size) == (52, 30, 26)
+
+
+def test_fit_is_largest_size_within_zone():
+    max_width, max_height = 400, 200
+    fitted = fit_text_block(_HEADLINE, _SUB, _CTA, max_width=max_width, max_height=max_height)
+
+    assert fitted.fits
+    assert fitted.total_height <= max_height
+    assert fitted.headline_size < 52
+    assert fitted.headline_height == measure_text_height(
+        _HEADLINE, max_width, font_size=fitted.headline_size, bold=True
+    )
+
+    # 한 단계 큰 크기는 영역을 넘친다
+    bigger = fit_text_block(
+        _HEADLINE, _SUB, _CTA, max_width=max_width, max_height=max_height,
+        min_sizes=(fitted.headline_size + 1, 1, 1),
+    )
+    assert not bigger.fits
+
+
+def test_banner_caps_and_overflow_fallback():
+    banner = fit_text_block(
+        _HEADLINE, _SUB, _CTA, max_width=1200, max_height=220, max_sizes=(32, 20, 18)
+    )
+    assert banner.fits and banner.headline_size <= 32
+
+    tiny = fit_text_block(_HEADLINE, _SUB, _CTA, max_width=120, max_height=20)
+    assert not tiny.fits
+    assert tiny.headline_size == 14  # 최소 크기로 폴백
+
+
+def _encoded(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def test_jpeg_decodes_at_reduced_scale_without_alpha():
+    data = _encoded(Image.new("RGB", (1600, 1200), (200, 40, 40)), "JPEG")
+
+    scaled = decode_image(data, (180, 120))
+
+    assert scaled.original_size == (1600, 1200)
+    assert scaled.decoded_size == (200, 150)  # draft 1/8 — 목표 이상 유지
+    assert scaled.image.mode == "RGB"
+    assert decode_image(data).decoded_size == (1600, 1200)
+
+
+def test_png_reduce_and_alpha_only_when_needed():
+    opaque = _encoded(Image.new("RGB", (800, 400), (0, 0, 255)), "PNG")
+    logo = _encoded(Image.new("RGBA", (800, 400), (0, 0, 0, 0)), "PNG")
+
+    scaled = decode_image(opaque, (200, 90))
+    assert scaled.decoded_size == (200, 100) and scaled.image.mode == "RGB"
+    assert decode_image(opaque, (200, 90), need_alpha=True).image.mode == "RGBA"
+    assert decode_image(logo, (200, 90)).image.mode == "RGBA"  # 원본 투명도 보존
+
+
+def test_prepare_image_for_api_downscales_large_local_files(tmp_path):
+    large, small = tmp_path / "large.png", tmp_path / "small.png"
+    Image.new("RGB", (4000, 2000), (9, 9, 9)).save(large)
+    Image.new("RGB", (300, 200), (9, 9, 9)).save(small)
+
+    url = prepare_image_for_api(str(large))
+    assert url.startswith("data:image/jpeg;base64,")
+    sent = Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1])))
+    assert sent.size == (1536, 768)
+
+    assert prepare_image_for_api(str(small)) == (
+        "data:image/png;base64," + base64.b64encode(small.read_bytes()).decode()
+    )
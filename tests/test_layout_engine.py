@@ -0,0 +1,84 @@
+"""Stage 3b 로컬 레이아웃 엔진 테스트 — 실제 Vision 호출 없이 존 선택 검증"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image, ImageDraw
+
+from da_agent.agents.layout_engine import analyze_layout_local, select_ad_layout
+from da_agent.models.ad_layout import AdLayout, BBox
+
+
+def _product_top_image(size=(1000, 1000), background=(245, 245, 240)):
+    """상단 중앙에 복잡한 제품이 있고 하단은 비어 있는 합성 이미지."""
+    img = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for i in range(0, w // 2, 12):
+        draw.rectangle(
+            [w // 4 + i, h // 10, w // 4 + i + 6, h // 2],
+            fill=(200, 30 + i % 200, 40),
+        )
+    return img
+
+
+def _overlaps(a, b):
+    return not (
+        a.x + a.width <= b.x or b.x + b.width <= a.x
+        or a.y + a.height <= b.y or b.y + b.height <= a.y
+    )
+
+
+def test_local_layout_avoids_product():
+    result = analyze_layout_local(_product_top_image())
+    tz = result.layout.text_zone
+    product = BBox(x=250, y=100, width=500, height=400)
+
+    assert not _overlaps(tz, product)
+    assert tz.width >= 350 and tz.height >= 300
+    assert not _overlaps(result.layout.logo_zone, tz)
+
+
+def test_local_layout_text_color_from_luminance():
+    light = analyze_layout_local(_product_top_image(background=(245, 245, 240)))
+    dark = analyze_layout_local(_product_top_image(background=(15, 15, 30)))
+
+    assert light.layout.text_color == "dark"
+    assert dark.layout.text_color == "white"
+    assert light.text_zone_luminance > dark.text_zone_luminance
+
+
+def test_local_layout_clamped_for_banner():
+    result = analyze_layout_local(_product_top_image(size=(1660, 260)))
+    for bbox in (result.layout.text_zone, result.layout.logo_zone):
+        assert bbox.x >= 0 and bbox.y >= 0
+        assert bbox.x + bbox.width <= 1660
+        assert bbox.y + bbox.height <= 260
+    # 가로형 배너는 좌·우 패널만 후보
+    assert result.layout.text_zone.height == 260
+
+
+@pytest.mark.asyncio
+async def test_hybrid_falls_back_to_vision_on_low_confidence():
+    vision_layout = AdLayout(
+        text_zone=BBox(x=0, y=0, width=500, height=500),
+        logo_zone=BBox(x=800, y=20, width=120, height=50),
+        text_color="white",
+    )
+    # 전체가 노이즈 패턴 → 깨끗한 존이 없어 신뢰도 낮음
+    noisy = Image.effect_noise((400, 400), 120).convert("RGB")
+
+    with patch(
+        "da_agent.agents.layout_engine.analyze_ad_layout",
+        new=AsyncMock(return_value=vision_layout),
+    ) as vision:
+        layout = await select_ad_layout(noisy, engine="hybrid")
+        assert vision.await_count == 1
+        assert layout == vision_layout
+
+        await select_ad_layout(_product_top_image(), engine="hybrid")
+        assert vision.await_count == 1  # 신뢰도 높음 → Vision 미호출
+
+
+@pytest.mark.asyncio
+async def test_unknown_layout_engine_rejected():
+    with pytest.raises(ValueError):
+        await select_ad_layout(_product_top_image(), engine="magic")
@@ -0,0 +1,179 @@
+"""공유 모델 호출 레이어 테스트 — 스키마 생성, 로컬 복구, 실패 호출만 재시도"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from da_agent.models.blueprint import Blueprint
+from da_agent.models.evaluation import EvaluationResult
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils import metrics
+from da_agent.utils.llm import (
+    StructuredOutputError,
+    call_structured,
+    json_schema_format,
+    parse_structured,
+)
+
+_IMAGE_STYLE = {"mood": "미니멀", "lighting": "자연광", "color_palette": ["#FFFFFF"], "aesthetic": ["clean"]}
+
+
+def _response(content: str, finish_reason: str = "stop"):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+        usage=None,
+    )
+
+
+def _client(*contents):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=[_response(*c) for c in contents])
+    return client
+
+
+def test_schema_is_strict_and_excludes_local_fields():
+    schema = json_schema_format(EvaluationResult, exclude=("tier",))["json_schema"]["schema"]
+    assert "tier" not in schema["properties"]
+    assert schema["additionalProperties"] is False
+    assert set(schema["required"]) == set(schema["properties"])
+    assert schema["$defs"]["Issue"]["additionalProperties"] is False
+
+    blueprint = json_schema_format(Blueprint)["json_schema"]["schema"]
+    assert blueprint["properties"]["ad_copy"] == {"$ref": "#/$defs/AdCopy"}
+
+
+def test_parse_repairs_fenced_truncated_json():
+    content = '```json\n{"mood": "미니멀", "lighting": "자연광", "color_palette": ["#FFFFFF",], "aesthetic": ["clean'
+    style = parse_structured(ImageStyle, content, stage="image_style")
+
+    assert style.aesthetic == ["clean"]
+    assert metrics.counter("llm.repaired.image_style") == 1
+
+
+@pytest.mark.asyncio
+async def test_call_retries_only_failed_call_with_larger_budget():
+    client = _client(('{"mood": "미니멀"', "length"), (json.dumps(_IMAGE_STYLE), "stop"))
+    request = {"model": "m", "messages": [], "max_tokens": 512}
+
+    style, _ = await call_structured(client, request, ImageStyle, stage="image_style")
+
+    assert style.mood == "미니멀"
+    assert client.chat.completions.create.await_count == 2
+    assert client.chat.completions.create.await_args_list[1].kwargs["max_tokens"] == 1024
+    assert request["max_tokens"] == 512  # 호출자 요청은 변경하지 않음
+    assert metrics.counter("llm.validation_failures.image_style") == 1
+    assert metrics.counter("llm.retries.image_style") == 1
+
+
+@pytest.mark.asyncio
+async def test_call_gives_up_after_bounded_retries():
+    client = _client(("not json",), ("still not json",))
+    with pytest.raises(StructuredOutputError):
+        await call_structured(client, {"model": "m"}, ImageStyle, stage="image_style", max_retries=1)
+    assert client.chat.completions.create.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_layout_analyzer_accepts_reasoning_field():
+    from PIL import Image
+
+    payload = {
+        "text_zone": {"x": 10, "y": 10, "width": 200, "height": 80},
+        "logo_zone": {"x": 250, "y": 10, "width": 40, "height": 20},
+        "text_color": "dark",
+        "reasoning": "Product on the left, text on the right.",
+    }
+    client = _client((json.dumps(payload),))
+    with patch("da_agent.agents.layout_analyzer.create_openai_client", return_value=client):
+        from da_agent.agents.layout_analyzer import analyze_ad_layout
+        layout = await analyze_ad_layout(Image.new("RGB", (300, 300)))
+
+    assert layout.text_color == "dark"
+    sent = client.chat.completions.create.await_args.kwargs["response_format"]
+    assert "reasoning" in sent["json_schema"]["schema"]["properties"]
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled(monkeypatch):
+    from da_agent.utils.llm import HedgePolicy
+
+    policy = HedgePolicy(percentile=0.9, budget_ratio=0.5, min_samples=3)
+    for _ in range(3):
+        policy.record("image_style", 0.01)
+    monkeypatch.setattr("da_agent.utils.llm.get_hedge_policy", lambda: policy)
+
+    cancelled = []
+
+    async def create(**kwargs):
+        call = create.calls = getattr(create, "calls", 0) + 1
+        try:
+            await asyncio.sleep(5 if call == 1 else 0.001)  # 첫 호출만 꼬리 지연
+        except asyncio.CancelledError:
+            cancelled.append(call)
+            raise
+        return _response(json.dumps(_IMAGE_STYLE))
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    policy.note_call()  # 예산 확보 (hedge 1회 ≤ 0.5 × 호출 수)
+
+    style, _ = await call_structured(client, {"model": "m"}, ImageStyle, stage="image_style")
+
+    assert style.mood == "미니멀"
+    assert create.calls == 2
+    assert cancelled == [1]
+    assert metrics.counter("llm.hedge_wins.image_style") == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_threshold_stays_stable_under_repeated_hedges(monkeypatch):
+    from da_agent.utils.llm import HedgePolicy
+
+    policy = HedgePolicy(percentile=0.5, budget_ratio=1.0, min_samples=5)
+    for _ in range(5):
+        policy.record("copy_style", 0.05)
+    monkeypatch.setattr("da_agent.utils.llm.get_hedge_policy", lambda: policy)
+
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(1 if calls % 2 else 0.001)   # primary는 항상 꼬리, 복제는 즉시 응답
+        return _response(json.dumps(_IMAGE_STYLE))
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    for _ in range(10):
+        await call_structured(client, {"model": "m"}, ImageStyle, stage="copy_style")
+
+    assert metrics.counter("llm.hedge_wins.copy_style") == 10
+    assert policy.threshold("copy_style") >= 0.05               # 복제 지연(1ms)으로 내려가지 않음
+
+    client.chat.completions.create = AsyncMock(side_effect=RuntimeError("boom"))
+    samples = len(policy._latencies["copy_style"])
+    with pytest.raises(RuntimeError):
+        await call_structured(client, {"model": "m"}, ImageStyle, stage="copy_style")
+    assert len(policy._latencies["copy_style"]) > samples     # 실패 호출도 기록
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_limits_duplicates(monkeypatch):
+    from da_agent.utils.llm import HedgePolicy
+
+    policy = HedgePolicy(percentile=0.5, budget_ratio=0.1, min_samples=1)
+    policy.record("architect", 0.0)
+    monkeypatch.setattr("da_agent.utils.llm.get_hedge_policy", lambda: policy)
+
+    async def create(**kwargs):
+        await asyncio.sleep(0.005)
+        return _response(json.dumps(_IMAGE_STYLE))
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    for _ in range(20):
+        await call_structured(client, {"model": "m"}, ImageStyle, stage="architect")
+
+    assert metrics.counter("llm.hedges.architect") <= 2
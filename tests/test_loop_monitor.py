@@ -0,0 +1,41 @@
+"""이벤트 루프 감시 테스트 — 동기 블로킹 호출을 스택과 함께 감지, 비동기 대기는 정지로 보지 않음"""
+import asyncio
+import time
+
+import pytest
+
+from da_agent.utils.async_files import load_template, read_template
+from da_agent.utils.loop_monitor import LoopMonitor
+
+
+def _blocking_decode():
+    time.sleep(0.25)   # 루프 스레드에서 실행되는 동기 I/O 대역
+
+
+@pytest.mark.asyncio
+async def test_monitor_reports_blocking_callback_with_stack():
+    monitor = LoopMonitor(threshold=0.1, interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)            # 비동기 대기 — 정지 아님
+    assert not monitor.stalls
+
+    _blocking_decode()
+    await asyncio.sleep(0.05)           # 하트비트 재개 → 정지 길이 확정
+    await monitor.stop()
+
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert "_blocking_decode" in stall.stack
+    assert stall.duration >= 0.2
+    assert monitor.max_lag >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_templates_are_read_once(tmp_path):
+    path = tmp_path / "prompt.txt"
+    path.write_text("Evaluate {candidate_count} candidates", encoding="utf-8")
+
+    assert await read_template(path) == "Evaluate {candidate_count} candidates"
+    path.write_text("changed", encoding="utf-8")
+    assert load_template(path) == "Evaluate {candidate_count} candidates"
@@ -0,0 +1,104 @@
+"""클릭 광고 근접 중복 테스트 — 지각 해시, 인덱스, Stage 1 중복 추출 생략"""
+import io
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from da_agent.config import get_settings
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle
+from da_agent.store.near_duplicates import NearDuplicateIndex, get_near_duplicate_index
+from da_agent.store.style_dna_cache import get_style_dna_cache
+from da_agent.utils.image_hash import fingerprint
+
+
+def _creative(seed: int, size=(800, 800)) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", size, tuple(int(c) for c in rng.integers(0, 255, 3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(6):
+        x0, y0 = (int(v) for v in rng.integers(0, size[0] // 2, 2))
+        w, h = (int(v) for v in rng.integers(size[0] // 6, size[0] // 2, 2))
+        draw.ellipse([x0, y0, x0 + w, y0 + h], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+    return image
+
+
+def _recompressed(image: Image.Image, size, quality=60) -> Image.Image:
+    buffer = io.BytesIO()
+    image.resize(size, Image.BILINEAR).save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def test_hash_matches_resized_recompressed_copy_only():
+    original = fingerprint(_creative(1))
+    copy = fingerprint(_recompressed(_creative(1), (480, 480)))
+    other = fingerprint(_creative(2))
+
+    index = NearDuplicateIndex(max_distance=6)
+    index.add(original, "key-1")
+    assert original.distance(copy)[0] <= 6
+    assert index.lookup(copy) == "key-1"
+    assert index.lookup(other) is None
+
+
+def test_index_persists_and_keeps_canonical(tmp_path):
+    path = tmp_path / "near_duplicates.jsonl"
+    index = NearDuplicateIndex(max_distance=6, path=path)
+    index.add(fingerprint(_creative(1)), "canonical")
+    index.add(fingerprint(_recompressed(_creative(1), (300, 300))), "copy")  # 근접 중복 → 무시
+
+    reloaded = NearDuplicateIndex(max_distance=6, path=path)
+    assert len(reloaded) == 1
+    assert reloaded.lookup(fingerprint(_creative(1))) == "canonical"
+
+
+@pytest.fixture
+def dedupe_settings(monkeypatch, tmp_path):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "click_dedupe_enabled", True)
+    monkeypatch.setattr(settings, "click_dedupe_distance", 6)
+    monkeypatch.setattr(settings, "style_dna_cache_dir", str(tmp_path / "cache"))
+    get_near_duplicate_index.cache_clear()
+    get_style_dna_cache.cache_clear()
+    yield settings
+    get_near_duplicate_index.cache_clear()
+    get_style_dna_cache.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_clicks_extract_once_and_map_across_requests(dedupe_settings, tmp_path):
+    paths = {}
+    for name, image in {
+        "a.png": _creative(1),
+        "a_small.jpg": _recompressed(_creative(1), (400, 400)),
+        "b.png": _creative(2),
+        "a_later.jpg": _recompressed(_creative(1), (640, 640), quality=75),
+    }.items():
+        paths[name] = str(tmp_path / name)
+        image.save(paths[name])
+
+    # 추출 순서는 스레드 해시 계산에 따라 달라지므로 무드는 소재(경로)로 결정
+    image_style = AsyncMock(side_effect=lambda url: ImageStyle(
+        mood="미니멀" if url.endswith("b.png") else "레트로",
+        lighting="자연광", color_palette=["#FFFFFF"], aesthetic=["clean"],
+    ))
+    layout_style = AsyncMock(return_value=LayoutStyle(
+        type="t", text_position="top", product_position="p",
+        visual_flow="Z", whitespace="moderate", focal_point="c",
+    ))
+    copy_style = AsyncMock(return_value=CopyStyle(
+        tone="감성적", length="short", emphasis_type="e", keywords=[]
+    ))
+    with (
+        patch("da_agent.agents.extractor.extract_image_style", new=image_style),
+        patch("da_agent.agents.extractor.extract_layout_style", new=layout_style),
+        patch("da_agent.agents.extractor.extract_copy_style", new=copy_style),
+    ):
+        from da_agent.agents.extractor import extract_style_dna
+        merged = await extract_style_dna([paths["b.png"], paths["a.png"], paths["a_small.jpg"]])
+        later = await extract_style_dna(paths["a_later.jpg"])
+
+    assert image_style.await_count == 2   # 중복 클릭 1건, 교차 요청 근접 중복 1건 생략
+    assert merged.image_style.mood == "레트로 ×2 / 미니멀"
+    assert later.image_style.mood == "레트로"
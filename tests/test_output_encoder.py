@@ -0,0 +1,82 @@
+"""출력 인코더 테스트 — 크기 상한 품질 탐색, 워밍 스타트, PNG 양자화, media_specs 포맷 처리"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from da_agent.agents.generator import compose_copy, prepare_ad_layers
+from da_agent.models.ad_layout import AdLayout, BBox
+from da_agent.models.blueprint import AdCopy
+from da_agent.utils import metrics
+from da_agent.utils.output_encoder import OutputEncoder, _encoder, get_output_encoder
+
+
+@pytest.fixture(autouse=True)
+def _reset_encoders():
+    _encoder.cache_clear()
+    yield
+    _encoder.cache_clear()
+
+
+def _photo(size=(320, 240), seed=0) -> Image.Image:
+    """품질에 따라 크기가 달라지도록 그라디언트 + 노이즈 (합성 결과처럼 불투명 RGBA)."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    gradient = np.linspace(0, 255, w, dtype=np.float32)[None, :, None].repeat(h, 0).repeat(3, 2)
+    pixels = np.clip(gradient + rng.normal(0, 40, (h, w, 3)), 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, "RGB").convert("RGBA")
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "WEBP"])
+def test_lossy_search_picks_highest_quality_under_limit_and_starts_warm(fmt):
+    image = _photo()
+    unbounded = OutputEncoder(fmt).encode(image)
+    assert unbounded.quality == 95 and unbounded.attempts == 1
+
+    encoder = OutputEncoder(fmt, max_bytes=unbounded.size // 2)
+    first = encoder.encode(image)
+    assert first.fits and first.size <= encoder.max_bytes
+    assert 50 <= first.quality < 95
+    assert Image.open(io.BytesIO(first.data)).format == fmt
+    higher = OutputEncoder(fmt, min_quality=first.quality + 1, max_quality=first.quality + 1)
+    assert higher.encode(image).size > encoder.max_bytes    # 한 단계 위는 상한 초과
+
+    second = encoder.encode(_photo(seed=1))                   # 같은 캠페인의 다음 광고
+    assert second.fits and second.attempts <= 2 < first.attempts
+
+
+def test_png_quantizes_over_limit_and_reports_impossible_limit():
+    image = _photo()
+    lossless = OutputEncoder("PNG").encode(image)
+    assert lossless.quality is None and lossless.fits
+
+    limited = OutputEncoder("PNG", max_bytes=lossless.size // 2).encode(image)
+    assert limited.fits and 16 <= limited.quality <= 256
+    assert Image.open(io.BytesIO(limited.data)).mode == "P"
+
+    impossible = OutputEncoder("JPEG", max_bytes=100).encode(image)
+    assert not impossible.fits and impossible.quality == 50
+    assert metrics.counter("output.oversize") == 1
+
+
+@pytest.mark.asyncio
+async def test_media_specs_select_format_and_compose_honours_encoder():
+    encoder = get_output_encoder({"format": "jpg", "max_kb": 40})
+    assert encoder.format == "JPEG" and encoder.max_bytes == 40 * 1024
+    assert get_output_encoder({"format": "JPEG", "max_bytes": 40960}) is encoder   # 스펙별 공유
+    with pytest.raises(ValueError, match="Unsupported output format"):
+        get_output_encoder({"format": "GIF"})
+
+    layout = AdLayout(
+        text_zone=BBox(x=0, y=160, width=320, height=80),
+        logo_zone=BBox(x=260, y=10, width=50, height=30),
+        text_color="white",
+    )
+    layers = await prepare_ad_layers(_photo(), layout, {"primary_colors": ["#E8742A"]})
+    ad_copy = AdCopy(headline="헤드라인", subheadline="서브", cta="보기")
+    composed, data = compose_copy(layers, ad_copy, encoder)
+    assert data[:3] == b"\xff\xd8\xff" and len(data) <= encoder.max_bytes
+    assert composed.info["encoding"]["format"] == "JPEG"
+    assert composed.info["encoding"]["bytes"] == len(data)
+
@@ -0,0 +1,177 @@
+"""출력 싱크 테스트 — 콘텐츠 주소 경로, 매니페스트, 메모리 해제, 배치 실행"""
+import json
+import tracemalloc
+
+import pytest
+from unittest.mock import patch
+from PIL import Image
+
+from da_agent.models.evaluation import CategoryScores, EvaluationResult
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+from da_agent.pipeline import PipelineResult
+from da_agent.store.output_sink import LocalOutputBackend, OutputSink, S3OutputBackend
+from da_agent.utils.image_utils import image_to_bytes
+
+
+def _result(color=(10, 20, 30), size=(64, 64)) -> PipelineResult:
+    image = Image.new("RGB", size, color)
+    score = 90
+    return PipelineResult(
+        final_image=image,
+        final_image_bytes=image_to_bytes(image),
+        style_dna=StyleDNA(
+            image_style=ImageStyle(mood="m", lighting="l", color_palette=[], aesthetic=[]),
+            layout_style=LayoutStyle(
+                type="t", text_position="top", product_position="p",
+                visual_flow="Z", whitespace="moderate", focal_point="c",
+            ),
+            copy_style=CopyStyle(tone="t", length="short", emphasis_type="e", keywords=[]),
+        ),
+        eval_result=EvaluationResult(
+            passed=True,
+            score=score,
+            category_scores=CategoryScores(
+                brand_compliance=score, copy_compliance=score, layout_compliance=score, visual_quality=score
+            ),
+            issues=[],
+            recommendations=[],
+            retry_priority=[],
+        ),
+        iterations_used=1,
+        timings={"stage1": 0.5, "stage3": 2.0},
+    )
+
+
+class _S3StandIn:
+    """boto3 S3 클라이언트 대역 (put_object / head_object)."""
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError(Key)
+        return {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body
+
+
+@pytest.mark.asyncio
+async def test_sink_writes_content_addressed_file_and_manifest(tmp_path):
+    sink = OutputSink(LocalOutputBackend(tmp_path / "out"), tmp_path / "out/manifest.jsonl")
+    first, second = _result(), _result()
+
+    record = await sink.write(first, inputs={"guidelines": "abc"}, user_id="u1")
+    again = await sink.write(second)  # 같은 콘텐츠 → 같은 경로, 행은 별도
+
+    assert record.uri == again.uri
+    assert record.uri.endswith(f"{record.sha256[:2]}/{record.sha256[2:4]}/{record.sha256}.png")
+    rows = [json.loads(line) for line in (tmp_path / "out/manifest.jsonl").read_text().splitlines()]
+    assert len(rows) == 2
+    assert rows[0]["run_id"] == first.run_id != rows[1]["run_id"]
+    assert rows[0]["score"] == 90 and rows[0]["timings"]["stage3"] == 2.0
+    assert rows[0]["inputs"] == {"guidelines": "abc"}
+    assert first.final_image is None and first.final_image_bytes is None
+    assert first.output_uri == record.uri
+
+
+@pytest.mark.asyncio
+async def test_sink_s3_backend_skips_existing_objects(tmp_path):
+    client = _S3StandIn()
+    sink = OutputSink(S3OutputBackend("ads", client, prefix="da"), tmp_path / "manifest.jsonl")
+
+    record = await sink.write(_result())
+    await sink.write(_result())
+
+    assert record.uri.startswith("s3://ads/da/")
+    assert len(client.objects) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_memory_stays_flat(tmp_path):
+    from da_agent.batch import run_batch
+
+    sink = OutputSink(LocalOutputBackend(tmp_path / "out"), tmp_path / "out/manifest.jsonl")
+    counter = iter(range(10_000))
+
+    async def fake_pipeline(**kwargs):
+        i = next(counter)
+        return _result(color=(i % 256, i // 256, 7), size=(256, 256))
+
+    def jobs(n):
+        for i in range(n):
+            yield {
+                "user_clicked_ad_image": f"https://example.com/{i}.png",
+                "existing_product_da": "https://example.com/da.png",
+                "product_info": {}, "brand_identity": {}, "guidelines": {},
+                "user_id": f"u{i}",
+            }
+
+    async def peak_for(n):
+        tracemalloc.start()
+        summary = await run_batch(jobs(n), sink, concurrency=4)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert summary.completed == n
+        return peak
+
+    with patch("da_agent.batch.run_pipeline", new=fake_pipeline):
+        small = await peak_for(8)
+        large = await peak_for(64)
+
+    assert large < small * 2
+    assert len((tmp_path / "out/manifest.jsonl").read_text().splitlines()) == 72
+
+
+@pytest.mark.asyncio
+async def test_batch_counts_corrupt_jsonl_line_as_one_failed_job(tmp_path):
+    from da_agent.batch import iter_jobs, run_batch
+
+    job = {
+        "user_clicked_ad_image": "https://example.com/ad.png",
+        "existing_product_da": "https://example.com/da.png",
+        "product_info": {}, "brand_identity": {}, "guidelines": {},
+    }
+    jobs_file = tmp_path / "jobs.jsonl"
+    jobs_file.write_text(
+        json.dumps(job | {"user_id": "u1"}) + "\n"
+        + '{"user_id": "u2", "existing_product_da": \n'          # 잘린 줄
+        + "\n"
+        + json.dumps(job | {"user_id": "u3"}) + "\n",
+        encoding="utf-8",
+    )
+    sink = OutputSink(LocalOutputBackend(tmp_path / "out"), tmp_path / "out/manifest.jsonl")
+
+    async def fake_pipeline(**kwargs):
+        return _result()
+
+    with patch("da_agent.batch.run_pipeline", new=fake_pipeline):
+        summary = await run_batch(iter_jobs(jobs_file), sink, concurrency=2)
+
+    assert summary.completed == 2 and summary.failed == 1
+    assert "JSONDecodeError" in summary.errors[0]
+
+
+@pytest.mark.asyncio
+async def test_sink_stores_ranked_copy_variants(tmp_path):
+    from da_agent.models.blueprint import AdCopy
+    from da_agent.pipeline import CopyVariant
+
+    result = _result()
+    result.variants = [
+        CopyVariant(
+            AdCopy(headline=h, subheadline="s", cta="c"),
+            image_to_bytes(Image.new("RGB", (8, 8), color)),
+            result.eval_result,
+        )
+        for h, color in (("a", (1, 1, 1)), ("b", (2, 2, 2)))
+    ]
+    sink = OutputSink(LocalOutputBackend(tmp_path / "out"), tmp_path / "manifest.jsonl")
+
+    await sink.write(result)
+
+    row = json.loads((tmp_path / "manifest.jsonl").read_text())
+    assert [v["rank"] for v in row["variants"]] == [1, 2]
+    assert row["variants"][1]["ad_copy"]["headline"] == "b"
+    assert all(v.image_bytes is None and v.output_uri for v in result.variants)
@@ -3,54 +3,24 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from PIL import Image
 
-from da_agent.models.style_dna import StyleDNA, ImageStyle, LayoutStyle, CopyStyle
-from da_agent.models.blueprint import Blueprint, AdCopy, LayoutGuide, BoundingBox
-from da_agent.models.evaluation import EvaluationResult, CategoryScores
-
-
-def _make_style_dna():
-    return StyleDNA(
-        image_style=ImageStyle(mood="미니멀", lighting="자연광", color_palette=["#FFF"], aesthetic=["clean"]),
-        layout_style=LayoutStyle(type="top-text", text_position="top", product_position="bottom", visual_flow="Z", whitespace="moderate", focal_point="center"),
-        copy_style=CopyStyle(tone="감성적", length="short", emphasis_type="감정소구", keywords=["일상"]),
-    )
-
-
-def _make_blueprint():
-    bbox = BoundingBox(x=0, y=0, width=540, height=200)
-    return Blueprint(
-        ad_copy=AdCopy(headline="오늘도 특별하게", subheadline="당신을 위한 선택", cta="지금 보기"),
-        image_prompt="minimal product photography, soft natural light",
-        layout_guide=LayoutGuide(product_bbox=bbox, text_bbox=bbox, logo_bbox=bbox, background_desc="white"),
-    )
-
-
-def _make_eval_result(passed: bool, score: int):
-    return EvaluationResult(
-        passed=passed,
-        score=score,
-        category_scores=CategoryScores(brand_compliance=score, copy_compliance=score, layout_compliance=score, visual_quality=score),
-        issues=[],
-        recommendations=[],
-        retry_priority=[],
-    )
+from da_agent.models.blueprint import AdCopy
 
 
 @pytest.mark.asyncio
-async def test_pipeline_passes_on_first_iteration():
+async def test_pipeline_passes_on_first_iteration(make_style_dna, make_blueprint, make_eval_result):
     """첫 번째 평가에서 PASS이면 iteration=1로 종료."""
     mock_image = Image.new("RGBA", (1080, 1080), (255, 255, 255, 255))
 
     with (
-        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=_make_style_dna())),
-        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=_make_blueprint())),
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=make_blueprint())),
         patch("da_agent.pipeline.generate_ad_image", new=AsyncMock(return_value=(mock_image, b"bytes"))),
-        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=_make_eval_result(passed=True, score=90))),
+        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=make_eval_result(passed=True, score=90))),
     ):
         from da_agent.pipeline import run_pipeline
         result = await run_pipeline(
             user_clicked_ad_image="https://example.com/ad.jpg",
-            product_image="https://example.com/product.jpg",
+            existing_product_da="https://example.com/product_da.jpg",
             product_info={"name": "Test", "description": "Test", "features": []},
             brand_identity={"logo_url": "", "primary_colors": [], "secondary_colors": []},
             guidelines={"required_elements": [], "forbidden_elements": [], "tone_constraints": [], "media_specs": {}},
@@ -61,24 +31,24 @@ async def test_pipeline_passes_on_first_iteration():
 
 
 @pytest.mark.asyncio
-async def test_pipeline_retries_on_fail():
+async def test_pipeline_retries_on_fail(make_style_dna, make_blueprint, make_eval_result):
     """FAIL 후 재시도하여 두 번째에서 PASS하는 루프를 확인합니다."""
     mock_image = Image.new("RGBA", (1080, 1080), (255, 255, 255, 255))
     eval_side_effects = [
-        _make_eval_result(passed=False, score=60),
-        _make_eval_result(passed=True, score=88),
+        make_eval_result(passed=False, score=60),
+        make_eval_result(passed=True, score=88),
     ]
 
     with (
-        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=_make_style_dna())),
-        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=_make_blueprint())),
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=make_blueprint())),
         patch("da_agent.pipeline.generate_ad_image", new=AsyncMock(return_value=(mock_image, b"bytes"))),
         patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(side_effect=eval_side_effects)),
     ):
         from da_agent.pipeline import run_pipeline
         result = await run_pipeline(
             user_clicked_ad_image="https://example.com/ad.jpg",
-            product_image="https://example.com/product.jpg",
+            existing_product_da="https://example.com/product_da.jpg",
             product_info={"name": "Test", "description": "Test", "features": []},
             brand_identity={"logo_url": "", "primary_colors": [], "secondary_colors": []},
             guidelines={"required_elements": [], "forbidden_elements": [], "tone_constraints": [], "media_specs": {}},
@@ -87,3 +57,100 @@ async def test_pipeline_retries_on_fail():
     assert result.iterations_used == 2
     assert result.eval_result.passed is True
     assert len(result.evaluation_history) == 2
+
+
+@pytest.mark.asyncio
+async def test_pipeline_copy_variants_share_one_styled_image_and_are_ranked(
+    make_style_dna,
+    make_blueprint,
+    make_eval_result,
+):
+    """카피 변형 N개는 스타일 변환 1회로 합성되고, 함께 평가되어 점수순으로 정렬됩니다."""
+    copies = [
+        AdCopy(headline=f"헤드라인 {i}", subheadline="서브", cta="보기") for i in range(3)
+    ]
+    blueprint = make_blueprint().model_copy(update={"ad_copy": copies[0], "variants": copies})
+    candidates = [(Image.new("RGB", (64, 64), (i, i, i)), f"bytes{i}".encode()) for i in range(3)]
+    scores = {"헤드라인 0": 70, "헤드라인 1": 92, "헤드라인 2": 85}
+
+    async def fake_evaluate(generated_image, ad_copy, brand_identity, guidelines):
+        score = scores[ad_copy.headline]
+        return make_eval_result(passed=score >= 80, score=score)
+
+    generate_variants = AsyncMock(return_value=candidates)
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=blueprint)),
+        patch("da_agent.pipeline.generate_ad_variants", new=generate_variants),
+        patch("da_agent.pipeline.generate_ad_image", new=AsyncMock()) as generate_single,
+        patch("da_agent.pipeline.evaluate_ad", new=fake_evaluate),
+    ):
+        from da_agent.pipeline import run_pipeline
+        result = await run_pipeline(
+            user_clicked_ad_image="https://example.com/ad.jpg",
+            existing_product_da="https://example.com/product_da.jpg",
+            product_info={"name": "Test", "description": "Test", "features": []},
+            brand_identity={"logo_url": "", "primary_colors": [], "secondary_colors": []},
+            guidelines={"required_elements": [], "forbidden_elements": [], "tone_constraints": [], "media_specs": {}},
+        )
+
+    assert generate_variants.await_count == 1 and generate_single.await_count == 0
+    assert [v.eval_result.score for v in result.variants] == [92, 85, 70]
+    assert result.final_image_bytes == b"bytes1"
+    assert result.eval_result.score == 92
+
+
+@pytest.mark.asyncio
+async def test_compose_ad_variants_reuses_background_layers():
+    from da_agent.agents.generator import compose_ad, compose_ad_variants
+    from da_agent.models.ad_layout import AdLayout, BBox
+
+    styled = Image.new("RGB", (400, 400), (120, 160, 200))
+    layout = AdLayout(
+        text_zone=BBox(x=0, y=0, width=400, height=200),
+        logo_zone=BBox(x=340, y=340, width=40, height=40),
+        text_color="white",
+    )
+    brand = {"logo_url": "", "primary_colors": ["#102030"], "secondary_colors": []}
+    copies = [AdCopy(headline=f"카피 {i}", subheadline="서브카피", cta="구매") for i in range(3)]
+
+    composed = await compose_ad_variants(styled, layout, copies, brand)
+    single, single_bytes = await compose_ad(styled, layout, copies[1], brand)
+
+    assert len(composed) == 3
+    assert len({image_bytes for _, image_bytes in composed}) == 3
+    assert composed[1][1] == single_bytes   # 레이어 재사용 결과는 단건 합성과 동일
+    assert composed[0][0].getpixel((200, 390)) == single.getpixel((200, 390))
+
+
+@pytest.mark.asyncio
+async def test_fal_job_group_is_scoped_to_user_and_campaign(
+    make_style_dna,
+    make_blueprint,
+    make_eval_result,
+):
+    """같은 사용자의 다른 캠페인 작업은 서로 다른 fal 그룹 — 배치에서 서로 취소하지 않음."""
+    mock_image = Image.new("RGBA", (64, 64), (255, 255, 255, 255))
+    generate = AsyncMock(return_value=(mock_image, b"bytes"))
+    inputs = dict(
+        user_clicked_ad_image="https://example.com/ad.jpg",
+        existing_product_da="https://example.com/product_da.jpg",
+        brand_identity={"logo_url": "", "primary_colors": [], "secondary_colors": []},
+        guidelines={"required_elements": [], "forbidden_elements": [], "tone_constraints": [], "media_specs": {}},
+        user_id="u1",
+    )
+
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.get_profile_store", return_value=None),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=make_blueprint())),
+        patch("da_agent.pipeline.generate_ad_image", new=generate),
+        patch("da_agent.pipeline.evaluate_ad", new=AsyncMock(return_value=make_eval_result(passed=True, score=90))),
+    ):
+        from da_agent.pipeline import run_pipeline
+        for name in ("A", "B", "A"):
+            await run_pipeline(product_info={"name": name, "description": "", "features": []}, **inputs)
+
+    groups = [call.kwargs["job_group"] for call in generate.await_args_list]
+    assert groups[0] == groups[2] != groups[1]
+    assert all(group.startswith("u1:") for group in groups)
@@ -0,0 +1,107 @@
+"""Style DNA 배치 사전 계산 테스트 — 로컬 배치 대역(LocalBatchBackend) 사용"""
+import json
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+
+from da_agent.precompute import LocalBatchBackend, precompute_style_dna
+from da_agent.store.style_dna_cache import StyleDNACache, image_cache_key
+
+_CONTENT = {
+    "image style": {"mood": "미니멀", "lighting": "자연광", "color_palette": ["#FFFFFF"], "aesthetic": ["clean"]},
+    "layout composition": {
+        "type": "top-text", "text_position": "top", "product_position": "bottom",
+        "visual_flow": "Z", "whitespace": "moderate", "focal_point": "center",
+    },
+    "copy style": {"tone": "감성적", "length": "short", "emphasis_type": "감정소구", "keywords": ["일상"]},
+}
+
+
+def _axis_of(body: dict) -> str:
+    text = body["messages"][1]["content"][1]["text"]
+    return next(axis for axis in _CONTENT if axis in text)
+
+
+async def _responder(body: dict) -> str:
+    return json.dumps(_CONTENT[_axis_of(body)])
+
+
+@pytest.fixture
+def ad_images(tmp_path):
+    paths = []
+    for i, color in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+        path = tmp_path / f"ad_{i}.png"
+        Image.new("RGB", (32, 32), color).save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.asyncio
+async def test_precompute_fills_cache_for_live_pipeline(tmp_path, ad_images, monkeypatch):
+    cache = StyleDNACache(tmp_path / "cache")
+    report = await precompute_style_dna(
+        ad_images, LocalBatchBackend(_responder), cache, tmp_path / "work", poll_interval=0
+    )
+
+    assert report.submitted_requests == 9
+    assert report.ingested_images == 3
+    assert all(image_cache_key(p) in cache for p in ad_images)
+
+    # 라이브 파이프라인은 캐시만 조회 — 추출기 호출 없음
+    monkeypatch.setattr("da_agent.agents.extractor.get_style_dna_cache", lambda: cache)
+    with patch(
+        "da_agent.agents.extractor.extract_image_style",
+        new=AsyncMock(side_effect=AssertionError("cache miss")),
+    ):
+        from da_agent.agents.extractor import extract_style_dna
+        dna = await extract_style_dna(ad_images[0])
+    assert dna.image_style.mood == "미니멀"
+
+
+@pytest.mark.asyncio
+async def test_precompute_resumes_without_resubmitting(tmp_path, ad_images):
+    cache = StyleDNACache(tmp_path / "cache")
+    backend = LocalBatchBackend(_responder, requests_per_poll=4)
+    work_dir = tmp_path / "work"
+
+    first = await precompute_style_dna(ad_images, backend, cache, work_dir, wait=False)
+    assert first.submitted_requests == 9
+    assert first.pending_batches == 1
+
+    second = await precompute_style_dna(ad_images, backend, cache, work_dir, poll_interval=0)
+    assert second.submitted_requests == 0
+    assert second.ingested_images == 3
+    assert second.pending_batches == 0
+
+
+@pytest.mark.asyncio
+async def test_precompute_partial_ingestion_resubmits_failed_axis(tmp_path, ad_images):
+    cache = StyleDNACache(tmp_path / "cache")
+    failed_once: set[str] = set()
+
+    async def flaky(body: dict) -> str:
+        url = body["messages"][1]["content"][0]["image_url"]["url"]
+        if _axis_of(body) == "layout composition" and url not in failed_once and not failed_once:
+            failed_once.add(url)
+            raise RuntimeError("upstream 500")
+        return await _responder(body)
+
+    backend = LocalBatchBackend(flaky)
+    first = await precompute_style_dna(ad_images, backend, cache, tmp_path / "work", poll_interval=0)
+    assert first.ingested_images == 2
+    assert first.failed_requests == 1
+
+    second = await precompute_style_dna(ad_images, backend, cache, tmp_path / "work", poll_interval=0)
+    assert second.already_cached == 2
+    assert second.submitted_requests == 1  # 실패한 layout 축만 재제출
+    assert second.ingested_images == 1
+
+
+def test_cli_rejects_no_wait_with_local_backend(monkeypatch):
+    from da_agent import precompute
+
+    monkeypatch.setattr("sys.argv", ["precompute", "ad.jpg", "--backend", "local", "--no-wait"])
+    with patch.object(precompute, "precompute_style_dna") as run, pytest.raises(SystemExit) as info:
+        precompute.main()
+    assert info.value.code == 2 and not run.called
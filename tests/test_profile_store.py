@@ -0,0 +1,136 @@
+"""사용자 프로필 저장소 테스트 — 증분 갱신·최근성 감쇠·고정 크기 요약·반영 클릭 기억"""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+from da_agent.store.profile_store import ProfileStore
+from da_agent.store.style_dna_cache import image_cache_key
+
+
+def _dna(mood="미니멀", palette=("#FFFFFF",), keywords=("일상",), tone="감성적"):
+    return StyleDNA(
+        image_style=ImageStyle(mood=mood, lighting="자연광", color_palette=list(palette), aesthetic=["clean"]),
+        layout_style=LayoutStyle(
+            type="top-text", text_position="top", product_position="bottom",
+            visual_flow="Z", whitespace="moderate", focal_point="center",
+        ),
+        copy_style=CopyStyle(tone=tone, length="short", emphasis_type="감정소구", keywords=list(keywords)),
+    )
+
+
+def test_profile_counts_palette_and_keywords(tmp_path):
+    store = ProfileStore(tmp_path, decay=0.5)
+    store.update("u1", _dna(palette=("#FF0000", "#000000"), keywords=("일상", "여유")))
+    store.update("u1", _dna(palette=("#FF0000",), keywords=("여유",)))
+
+    summary = store.summary("u1")
+    assert summary.image_style.color_palette[0] == "#FC0404"  # 5비트 양자화된 빨강
+    assert summary.copy_style.keywords[0] == "여유"
+
+
+def test_profile_style_attributes_prefer_recent_clicks(tmp_path):
+    store = ProfileStore(tmp_path, decay=0.5)
+    store.update("u1", _dna(mood="럭셔리", tone="직접적"))
+    store.update("u1", _dna(mood="럭셔리", tone="직접적"))
+    for _ in range(3):
+        store.update("u1", _dna(mood="청량한", tone="감성적"))
+
+    summary = store.summary("u1")
+    assert summary.image_style.mood == "청량한"
+    assert summary.copy_style.tone == "감성적"
+
+
+def test_profile_summary_stays_fixed_size(tmp_path):
+    store = ProfileStore(tmp_path)
+    for i in range(200):
+        store.update(
+            "u1",
+            _dna(mood=f"mood-{i}", palette=(f"#{i:02X}{i:02X}{i:02X}",), keywords=(f"kw-{i}",)),
+        )
+
+    summary = store.summary("u1")
+    assert " / " not in summary.image_style.mood
+    assert len(summary.image_style.color_palette) <= 5
+    assert len(summary.copy_style.keywords) <= 8
+
+
+def test_profile_persists_and_grows(tmp_path):
+    store = ProfileStore(tmp_path)
+    for i in range(1500):  # 초기 용량(1024) 초과 → 컬럼 확장
+        store.update(f"user-{i}", _dna(mood=f"mood-{i % 7}"), click_key=f"{i:064x}")
+    store.flush()
+
+    reopened = ProfileStore(tmp_path)
+    assert len(reopened) == 1500
+    assert reopened.summary("user-1499").image_style.mood == f"mood-{1499 % 7}"
+    assert reopened.has_seen("user-1499", f"{1499:064x}")
+    assert reopened.summary("unknown") is None
+
+
+@pytest.mark.asyncio
+async def test_user_style_dna_extracts_only_new_clicks(tmp_path):
+    store = ProfileStore(tmp_path)
+    extract = AsyncMock(return_value=_dna())
+
+    with patch("da_agent.agents.extractor._extract_single", new=extract):
+        from da_agent.agents.extractor import extract_user_style_dna
+        await extract_user_style_dna("u1", ["https://example.com/a.jpg"], store)
+        await extract_user_style_dna(
+            "u1", ["https://example.com/a.jpg", "https://example.com/b.jpg"], store
+        )
+
+    assert extract.await_count == 2
+    assert [c.args[0] for c in extract.await_args_list] == [
+        "https://example.com/a.jpg",
+        "https://example.com/b.jpg",
+    ]
+
+
+def test_concurrent_updates_and_flushes_keep_every_user(tmp_path):
+    import threading
+
+    store = ProfileStore(tmp_path)
+    done = threading.Event()
+
+    def flusher():
+        while not done.is_set():
+            store.flush()
+
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    try:
+        for i in range(2500):   # 용량 확장(1024 → 4096)이 flush와 겹침
+            store.update(f"user-{i}", _dna(mood=f"mood-{i % 5}"))
+    finally:
+        done.set()
+        thread.join()
+    store.flush()
+
+    reopened = ProfileStore(tmp_path)
+    assert len(reopened) == 2500
+    assert reopened.summary("user-2499").image_style.mood == f"mood-{2499 % 5}"
+
+
+@pytest.mark.asyncio
+async def test_full_click_history_is_applied_once_even_across_concurrent_runs(tmp_path):
+    store = ProfileStore(tmp_path)
+    history = [f"https://example.com/{i}.jpg" for i in range(20)]   # 이전 링 버퍼(16)보다 긴 이력
+    extract = AsyncMock(return_value=_dna())
+
+    with patch("da_agent.agents.extractor._extract_single", new=extract):
+        from da_agent.agents.extractor import extract_user_style_dna
+        await asyncio.gather(*(extract_user_style_dna("u1", history, store) for _ in range(2)))
+        assert store._columns["clicks"][store._row("u1")] == 20   # 동시 실행도 한 번만 반영
+
+        extract.reset_mock()
+        await extract_user_style_dna("u1", [*history, "https://example.com/new.jpg"], store)
+        assert [c.args[0] for c in extract.await_args_list] == ["https://example.com/new.jpg"]
+
+        with pytest.raises(ValueError, match="No clicks"):
+            await extract_user_style_dna("u2", [], store)
+
+    reopened = ProfileStore(tmp_path)
+    assert reopened.has_seen("u1", image_cache_key(history[0]))
+    assert not reopened.update("u1", _dna(), click_key=image_cache_key(history[0]))
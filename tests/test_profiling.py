@@ -0,0 +1,63 @@
+"""프로파일링 훅 테스트 — 스테이지별 산출물과 비활성화 시 무비용"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+
+from da_agent.config import get_settings
+from da_agent.utils.profiling import RunProfiler, get_run_profiler
+
+
+def test_profiler_disabled_by_default():
+    assert get_run_profiler("run") is None
+
+
+def test_stage_writes_profile_allocations_and_collapsed_stacks(tmp_path):
+    profiler = RunProfiler(tmp_path, "run-1", sample_interval=0.001)
+    with profiler.stage("stage3", iteration=2):
+        blocks = [bytearray(10_000) for _ in range(200)]
+        sum(i * i for i in range(20_000))
+    del blocks
+
+    prefix = tmp_path / "run-1" / "02_stage3"
+    assert "run_id=run-1 iteration=2 stage=stage3" in prefix.with_suffix(".txt").read_text()
+    assert prefix.with_suffix(".prof").stat().st_size > 0
+    assert "test_profiling.py" in (tmp_path / "run-1" / "02_stage3.alloc.txt").read_text()
+    collapsed = (tmp_path / "run-1" / "02_stage3.collapsed").read_text().splitlines()
+    assert collapsed and all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_profiles_each_stage_by_run_and_iteration(
+    tmp_path,
+    monkeypatch,
+    make_style_dna,
+    make_blueprint,
+    make_eval_result,
+):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "profile_enabled", True)
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    mock_image = Image.new("RGBA", (64, 64))
+
+    with (
+        patch("da_agent.pipeline.extract_style_dna", new=AsyncMock(return_value=make_style_dna())),
+        patch("da_agent.pipeline.create_blueprint", new=AsyncMock(return_value=make_blueprint())),
+        patch("da_agent.pipeline.generate_ad_image", new=AsyncMock(return_value=(mock_image, b"bytes"))),
+        patch(
+            "da_agent.pipeline.evaluate_ad",
+            new=AsyncMock(side_effect=[make_eval_result(False, 60), make_eval_result(True, 90)]),
+        ),
+    ):
+        from da_agent.pipeline import run_pipeline
+        result = await run_pipeline(
+            user_clicked_ad_image="https://example.com/ad.jpg",
+            existing_product_da="https://example.com/product_da.jpg",
+            product_info={}, brand_identity={}, guidelines={},
+        )
+
+    names = sorted(p.name for p in (tmp_path / result.run_id).glob("*.prof"))
+    assert names == [
+        "00_stage1.prof",
+        "01_stage2.prof", "01_stage3.prof", "01_stage4.prof",
+        "02_stage2.prof", "02_stage3.prof", "02_stage4.prof",
+    ]
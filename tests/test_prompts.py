@@ -0,0 +1,88 @@
+"""프롬프트 캐시 친화 템플릿 테스트 — 캠페인 고정 접두사 공유, 사용자별 접미사 분리, 캐시 토큰 기록"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from da_agent.models.style_dna import CopyStyle, ImageStyle, LayoutStyle, StyleDNA
+from da_agent.utils import metrics
+from da_agent.utils.llm import call_structured, json_schema_format
+from da_agent.utils.prompts import compile_prompt
+
+_BLUEPRINT = {
+    "ad_copy": {"headline": "헤드라인", "subheadline": "서브", "cta": "보기"},
+    "transformation_prompt": "Transform this product advertisement.",
+}
+_PRODUCT = {"name": "콜드브루", "description": "저온 추출 커피", "features": ["12시간 추출"]}
+_BRAND = {"primary_colors": ["#E8742A"]}
+_GUIDELINES = {"forbidden_elements": ["최저가"], "media_specs": {"format": "PNG"}}
+
+
+def _dna(mood: str, keyword: str) -> StyleDNA:
+    return StyleDNA(
+        image_style=ImageStyle(mood=mood, lighting="자연광", color_palette=["#FFFFFF"], aesthetic=["clean"]),
+        layout_style=LayoutStyle(
+            type="t", text_position="bottom", product_position="center",
+            visual_flow="Z", whitespace="moderate", focal_point="product",
+        ),
+        copy_style=CopyStyle(tone="감성적", length="short", emphasis_type="benefit", keywords=[keyword]),
+    )
+
+
+def _response(content: dict, prompt_tokens: int, cached: int):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(content)), finish_reason="stop")],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            total_tokens=prompt_tokens + 50,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached),
+        ),
+    )
+
+
+def test_template_splits_static_prefix_from_per_user_suffix():
+    template = compile_prompt("Brand {brand}\n{{\"json\": 1}}\n<<<PER_USER>>>\nMood {mood}\n")
+    assert template.prefix_fields == {"brand"} and template.suffix_fields == {"mood"}
+
+    first = template.messages({"brand": "A"}, {"mood": "레트로"}, [{"type": "image_url"}])
+    second = template.messages({"brand": "A"}, {"mood": "미니멀"})
+    assert first[0] == {"role": "system", "content": 'Brand A\n{"json": 1}\n'}
+    assert first[0]["content"] is second[0]["content"]          # 접두사 렌더링 재사용
+    assert first[1]["content"][-1]["text"] == "Mood 레트로\n"
+    assert second[1]["content"] == "Mood 미니멀\n"
+
+
+@pytest.mark.asyncio
+async def test_architect_users_in_one_campaign_share_prefix_and_cached_tokens_are_recorded():
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=[
+        _response(_BLUEPRINT, prompt_tokens=1800, cached=0),
+        _response(_BLUEPRINT, prompt_tokens=1790, cached=1536),
+    ])
+    with patch("da_agent.agents.architect.create_openai_client", return_value=client):
+        from da_agent.agents.architect import create_blueprint
+        for dna in (_dna("비 오는 오후", "새벽"), _dna("주말 브런치", "청량")):
+            await create_blueprint(dna, _PRODUCT, _BRAND, _GUIDELINES, n_variants=1)
+
+    first, second = (call.kwargs["messages"] for call in client.chat.completions.create.await_args_list)
+    assert first[0] == second[0] and first[0]["role"] == "system"
+    assert "콜드브루" in first[0]["content"] and "PNG" in first[0]["content"]
+    assert "비 오는 오후" not in first[0]["content"] and "비 오는 오후" in first[1]["content"]
+    assert "주말 브런치" in second[1]["content"]
+
+    assert metrics.counter("llm.prompt_tokens.architect") == 3590
+    assert metrics.counter("llm.cached_tokens.architect") == 1536
+
+
+@pytest.mark.asyncio
+async def test_usage_without_cache_details_is_recorded_as_uncached():
+    client = MagicMock()
+    response = _response({"mood": "m", "lighting": "l", "color_palette": [], "aesthetic": []}, 900, 0)
+    del response.usage.prompt_tokens_details
+    client.chat.completions.create = AsyncMock(return_value=response)
+    request = {"model": "m", "messages": [], "response_format": json_schema_format(ImageStyle)}
+
+    await call_structured(client, request, ImageStyle, stage="image_style")
+    assert metrics.counter("llm.prompt_tokens.image_style") == 900
+    assert metrics.counter("llm.cached_tokens.image_style") == 0
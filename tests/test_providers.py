@@ -0,0 +1,165 @@
+"""프로바이더 라우팅 테스트 — OpenAI·Anthropic API 대역 서버로 변환·failover·지연 기반 선택 확인"""
+import asyncio
+import base64
+import io
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+from PIL import Image
+
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils.llm import call_structured, json_schema_format
+from da_agent.utils.providers import AnthropicProvider, OpenAIProvider, ProviderRouter
+
+_STYLE = {"mood": "미니멀", "lighting": "자연광", "color_palette": ["#FFFFFF"], "aesthetic": ["clean"]}
+
+
+class OpenAIStandIn:
+    """chat.completions 대역 — fail_first번 503 후 스키마에 맞는 JSON 응답."""
+
+    def __init__(self, fail_first: int = 0, delay: float = 0.0):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.requests: list[dict] = []
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body)
+        await asyncio.sleep(self.delay)
+        if len(self.requests) <= self.fail_first:
+            return httpx.Response(503, json={"error": {"message": "overloaded"}})
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(_STYLE)}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+    def provider(self) -> OpenAIProvider:
+        client = AsyncOpenAI(
+            api_key="test", base_url="https://openai.test/v1", max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self._handle)),
+        )
+        return OpenAIProvider(client)
+
+
+class AnthropicStandIn:
+    """Messages API 대역 — 강제 tool 호출 요청에 tool_use 블록으로 응답."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests: list[dict] = []
+        self.headers: list[httpx.Headers] = []
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body)
+        self.headers.append(request.headers)
+        await asyncio.sleep(self.delay)
+        tool = body["tool_choice"]["name"]
+        return httpx.Response(200, json={
+            "id": "msg_1", "type": "message", "role": "assistant", "model": body["model"],
+            "content": [{"type": "tool_use", "id": "tu_1", "name": tool, "input": _STYLE}],
+            "stop_reason": "tool_use",
+            "usage": {"input_tokens": 20, "output_tokens": 7, "cache_read_input_tokens": 0},
+        })
+
+    def provider(self) -> AnthropicProvider:
+        return AnthropicProvider(
+            "test-key", base_url="https://anthropic.test", transport=httpx.MockTransport(self._handle)
+        )
+
+
+def _request(image_size=(2400, 1200)) -> dict:
+    buffer = io.BytesIO()
+    Image.new("RGB", image_size, (200, 10, 10)).save(buffer, format="PNG")
+    data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "You are a style analyst."},
+            {"role": "user", "content": [
+                {"type": "image_url", "image_url": {"url": data_url, "detail": "high"}},
+                {"type": "text", "text": "Analyze the image style."},
+            ]},
+        ],
+        "response_format": json_schema_format(ImageStyle),
+        "max_tokens": 512,
+    }
+
+
+@pytest.fixture
+def use_router(monkeypatch):
+    def install(router: ProviderRouter) -> ProviderRouter:
+        monkeypatch.setattr("da_agent.utils.llm.get_provider_router", lambda: router)
+        return router
+    return install
+
+
+@pytest.mark.asyncio
+async def test_anthropic_request_adapted_and_response_parsed(use_router):
+    anthropic = AnthropicStandIn()
+    use_router(ProviderRouter({"anthropic": anthropic.provider()}, {"*": ["anthropic:claude-test"]}))
+
+    style, response = await call_structured(None, _request(), ImageStyle, stage="image_style")
+
+    sent = anthropic.requests[0]
+    assert sent["model"] == "claude-test" and sent["system"] == [{
+        "type": "text", "text": "You are a style analyst.", "cache_control": {"type": "ephemeral"},
+    }]
+    image_block, text_block = sent["messages"][0]["content"]
+    assert image_block["source"]["media_type"] == "image/jpeg"   # 1568px 초과 → 축소·재인코딩
+    decoded = Image.open(io.BytesIO(base64.b64decode(image_block["source"]["data"])))
+    assert max(decoded.size) == 1568
+    assert text_block == {"type": "text", "text": "Analyze the image style."}
+    assert sent["tools"][0]["input_schema"]["required"] == list(_STYLE)
+    assert anthropic.headers[0]["x-api-key"] == "test-key"
+    assert style.mood == "미니멀"
+    assert response.usage.total_tokens == 27
+    assert response.usage.prompt_tokens_details.cached_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over_and_demotes_unhealthy_provider(use_router):
+    openai, anthropic = OpenAIStandIn(fail_first=3), AnthropicStandIn()
+    router = use_router(ProviderRouter(
+        {"openai": openai.provider(), "anthropic": anthropic.provider()},
+        {"evaluator": ["openai", "anthropic:claude-test"]},
+        min_samples=100,   # 지연 정렬 없이 순위·정상 여부만 사용
+    ))
+
+    for _ in range(4):
+        style, _ = await call_structured(None, _request((64, 64)), ImageStyle, stage="evaluator.low")
+        assert style.mood == "미니멀"
+
+    # 처음 3회: openai 503 → anthropic으로 failover, 이후 openai는 오류율 초과로 후순위
+    assert len(openai.requests) == 3 and len(anthropic.requests) == 4
+    assert openai.requests[0]["model"] == "gpt-4o-mini"   # 모델 미지정 라우트는 스테이지 모델 유지
+    assert router.stats()["openai"]["error_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_router_prefers_faster_provider_and_times_out(use_router):
+    slow, fast = OpenAIStandIn(delay=0.05), AnthropicStandIn()
+    router = use_router(ProviderRouter(
+        {"openai": slow.provider(), "anthropic": fast.provider()},
+        {"architect": ["openai:gpt-4o", "anthropic:claude-test"]},
+        min_samples=2,
+    ))
+
+    for _ in range(6):
+        await call_structured(None, _request((64, 64)), ImageStyle, stage="architect")
+
+    # 두 프로바이더 모두 표본 2개를 채운 뒤에는 빠른 쪽으로만 라우팅
+    assert len(slow.requests) == 2 and len(fast.requests) == 4
+    assert [str(r) for r in router.ranked("architect")][0] == "anthropic:claude-test"
+
+    hung = ProviderRouter(
+        {"openai": OpenAIStandIn(delay=1.0).provider(), "anthropic": AnthropicStandIn().provider()},
+        {"*": ["openai", "anthropic:claude-test"]},
+        timeout=0.05,
+    )
+    response = await hung.create(_request((64, 64)), "layout_analyzer")
+    assert response.model == "claude-test"
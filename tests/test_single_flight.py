@@ -0,0 +1,122 @@
+"""싱글 플라이트 테스트 — 동시 동일 요청 합치기, 오류 전파(캐시 안 함), 취소 처리, 모델 호출 합치기"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from da_agent.models.style_dna import ImageStyle
+from da_agent.utils import metrics
+from da_agent.utils.image_utils import load_image
+from da_agent.utils.llm import call_structured, json_schema_format
+from da_agent.utils.single_flight import SingleFlight
+
+
+class _Work:
+    """호출 횟수를 세고 release될 때까지 대기하는 작업 대역."""
+
+    def __init__(self, error: Exception | None = None):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return ["result"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution_and_errors_are_not_cached():
+    flight = SingleFlight("test")
+    work = _Work()
+    waiters = [asyncio.create_task(flight.do("k", work, share=list)) for _ in range(4)]
+    await asyncio.sleep(0)
+    work.release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert work.calls == 1 and flight.in_flight() == 0
+    assert all(result == ["result"] for result in results)
+    assert results[0] is not results[1]                      # 합류한 호출은 share 사본
+    assert metrics.counter("single_flight.test.shared") == 3
+
+    failing = _Work(ValueError("upstream 500"))
+    waiters = [asyncio.create_task(flight.do("k", failing)) for _ in range(2)]
+    await asyncio.sleep(0)
+    failing.release.set()
+    outcomes = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+    retry = _Work()
+    retry.release.set()
+    assert await flight.do("k", retry) == ["result"] and retry.calls == 1   # 실패는 재실행
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_shared_work_cancelling_all_stops_it():
+    flight = SingleFlight("test")
+    work = _Work()
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+
+    first.cancel()                                           # 시작한 호출이 취소돼도 공유 작업은 계속
+    await asyncio.sleep(0)
+    assert first.cancelled() and not work.cancelled
+    work.release.set()
+    assert await second == ["result"] and work.calls == 1
+
+    abandoned = _Work()
+    waiters = [asyncio.create_task(flight.do("k", abandoned)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert abandoned.cancelled and flight.in_flight() == 0  # 대기자 없음 → 공유 작업 취소
+
+    fresh = _Work()
+    fresh.release.set()
+    assert await flight.do("k", fresh) == ["result"]
+
+
+@pytest.mark.asyncio
+async def test_identical_model_calls_and_image_loads_are_coalesced(tmp_path):
+    calls = 0
+
+    async def create(**request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        content = '{"mood": "미니멀", "lighting": "자연광", "color_palette": ["#FFFFFF"], "aesthetic": ["clean"]}'
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=None,
+        )
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    request = {
+        "model": "gpt-4o",
+        "messages": [{"role": "user", "content": "analyze"}],
+        "response_format": json_schema_format(ImageStyle),
+    }
+    results = await asyncio.gather(*(
+        call_structured(client, request, ImageStyle, stage="image_style") for _ in range(5)
+    ))
+    assert calls == 1 and all(style.mood == "미니멀" for style, _ in results)
+
+    path = tmp_path / "logo.png"
+    Image.new("RGB", (32, 16), (200, 10, 10)).save(path)
+    images = await asyncio.gather(*(load_image(str(path)) for _ in range(3)))
+    assert metrics.counter("single_flight.load_image.shared") == 2
+    assert len({id(image) for image in images}) == 3          # 호출마다 독립 사본
+    assert images[2].getpixel((0, 0)) == (200, 10, 10, 255)